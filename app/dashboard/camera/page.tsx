@@ -148,7 +148,7 @@ export default function CameraPage() {
 
               {/* 실제 웹캠 스트림 */}
               <img
-                src={`${cameraServerUrl}/video_feed`}
+                src={`${cameraServerUrl}/video_feed?profile=medium&adaptive=1`}
                 alt="실시간 웹캠 피드"
                 className="absolute inset-0 w-full h-full object-cover"
                 onError={(e) => {
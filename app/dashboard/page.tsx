@@ -3,8 +3,8 @@
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card"
 import { Badge } from "@/components/ui/badge"
 import { Car, Users, AlertTriangle, CheckCircle, Thermometer, Droplets, Activity, Clock, Wifi, WifiOff } from "lucide-react"
-import { useState, useEffect } from "react"
-import { fetchParkingData, ParkingSystemStatus } from "@/lib/api"
+import { useState, useEffect, useRef } from "react"
+import { fetchParkingData, getRuntimeStats, buildParkingData, subscribeParkingEvents, ParkingSpotData, ParkingSystemStatus, ParkingRuntimeStats } from "@/lib/api"
 import { PageHeader } from "@/components/page-header"
 
 export default function DashboardPage() {
@@ -12,6 +12,7 @@ export default function DashboardPage() {
   const [isLoading, setIsLoading] = useState(true)
   const [isLiveData, setIsLiveData] = useState(false)
   const [systemStatus, setSystemStatus] = useState<ParkingSystemStatus | null>(null)
+  const [runtimeStats, setRuntimeStats] = useState<ParkingRuntimeStats | null>(null)
 
   // 주차 데이터 상태
   const [parkingData, setParkingData] = useState({
@@ -31,10 +32,14 @@ export default function DashboardPage() {
   const loadParkingData = async () => {
     try {
       setIsLoading(true)
-      const { parkingData: data, isLiveData: live, systemStatus: status } = await fetchParkingData()
+      const [{ parkingData: data, isLiveData: live, systemStatus: status }, runtime] = await Promise.all([
+        fetchParkingData(),
+        getRuntimeStats(),
+      ])
       setParkingData(data)
       setIsLiveData(live)
       setSystemStatus(status || null)
+      setRuntimeStats(runtime)
     } catch (error) {
       console.error('주차 데이터 로드 실패:', error)
     } finally {
@@ -47,12 +52,48 @@ export default function DashboardPage() {
     loadParkingData()
   }, [])
 
+  // 푸시 이벤트로 주차구역/경고 변화를 바로 반영
+  const spotsRef = useRef<ParkingSpotData[]>([])
+  const streamConnectedRef = useRef(false)
+  const tickRef = useRef(0)
+
+  useEffect(() => {
+    const applySpots = (spots: ParkingSpotData[]) => {
+      spotsRef.current = spots
+      setParkingData(buildParkingData(spots))
+      setIsLiveData(true)
+    }
+
+    return subscribeParkingEvents({
+      onSnapshot: (snapshot) => {
+        applySpots(snapshot.parking_status)
+        setSystemStatus((prev) => prev && { ...prev, active_warnings: snapshot.warnings.length })
+      },
+      onSpot: (event) => {
+        applySpots(spotsRef.current.map((spot) =>
+          spot.id === event.spot_id
+            ? { ...spot, occupied: event.new_state === 'occupied', vehicle_id: event.new_state === 'occupied' ? String(event.vehicle_id) : null }
+            : spot
+        ))
+      },
+      onWarnings: (delta) => {
+        setSystemStatus((prev) => prev && { ...prev, active_warnings: delta.active })
+      },
+      onConnectionChange: (connected) => {
+        streamConnectedRef.current = connected
+      },
+    })
+  }, [])
+
   // 시간 업데이트 및 자동 새로고침
   useEffect(() => {
     const timer = setInterval(() => {
       setCurrentTime(new Date().toLocaleString("ko-KR"))
-      // 주차 데이터도 자동으로 새로고침 (5초마다)
-      loadParkingData()
+      // 주차 데이터 새로고침 - 푸시 연결 중이면 프레임 수 등 나머지 정보만 30초마다, 아니면 5초마다
+      tickRef.current += 1
+      if (!streamConnectedRef.current || tickRef.current % 6 === 0) {
+        loadParkingData()
+      }
     }, 5000)
 
     return () => clearInterval(timer)
@@ -153,7 +194,7 @@ export default function DashboardPage() {
               {systemStatus?.status === 'active' ? '정상' : '대기중'}
             </div>
             <p className="text-xs text-muted-foreground mt-1">
-              {systemStatus ? `${systemStatus.frame_count}프레임 처리됨` : '모든 센서 가동 중'}
+              {runtimeStats ? `${runtimeStats.frame_count}프레임 처리됨` : '모든 센서 가동 중'}
             </p>
           </CardContent>
         </Card>
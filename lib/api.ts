@@ -46,7 +46,6 @@ export interface ParkingSystemStatus {
   status: 'active' | 'inactive'
   resolution: string
   fps: number
-  frame_count: number
   total_vehicles: number
   vehicle_counts: {
     blue: number
@@ -56,10 +55,19 @@ export interface ParkingSystemStatus {
   parking_status: ParkingSpotData[]
   active_warnings: number
   warnings: any[]
-  current_time: string
   gpio_available: boolean
 }
 
+// parking_web_server /status/runtime - 매 프레임 바뀌는 처리 통계 (/status ETag가 유지되도록 분리됨)
+export interface ParkingRuntimeStats {
+  current_time: string
+  frame_count: number
+  frame_sequence: number
+  detection_skipped: number
+  stream_clients: number
+  event_clients: number
+}
+
 // 더미 데이터 - API 호출 실패시 사용
 const dummyData: UltrasonicSensorData[] = [
   {
@@ -188,6 +196,29 @@ async function fetchParkingSystemStatus(): Promise<ParkingSystemStatus | null> {
   }
 }
 
+// parking_web_server에서 처리 통계(프레임 수, 현재 시각) 가져오기
+export async function getRuntimeStats(): Promise<ParkingRuntimeStats | null> {
+  try {
+    const response = await fetch(`${getParkingApiBaseUrl()}/status/runtime`, {
+      method: 'GET',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      signal: AbortSignal.timeout(5000),
+    })
+    
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`)
+    }
+    
+    const data = await response.json()
+    return data
+  } catch (error) {
+    console.warn('처리 통계 조회 실패:', error)
+    return null
+  }
+}
+
 // parking_web_server에서 주차구역 데이터 가져오기
 async function fetchParkingSpots(): Promise<ParkingSpotData[] | null> {
   try {
@@ -266,6 +297,35 @@ export async function fetchUltrasonicSensors(): Promise<{
   }
 }
 
+// 주차구역 목록을 구역별 형식으로 변환 (1-4는 A구역, 5-8은 B구역)
+export function buildParkingData(parkingSpots: Pick<ParkingSpotData, 'id' | 'occupied'>[]) {
+  const zoneA = {
+    total: 4,
+    occupied: 0,
+    spaces: [false, false, false, false]
+  }
+  
+  const zoneB = {
+    total: 4,
+    occupied: 0,
+    spaces: [false, false, false, false]
+  }
+  
+  parkingSpots.forEach((spot) => {
+    if (spot.id >= 1 && spot.id <= 4) {
+      // A구역
+      zoneA.spaces[spot.id - 1] = spot.occupied
+      if (spot.occupied) zoneA.occupied++
+    } else if (spot.id >= 5 && spot.id <= 8) {
+      // B구역
+      zoneB.spaces[spot.id - 5] = spot.occupied
+      if (spot.occupied) zoneB.occupied++
+    }
+  })
+  
+  return { zoneA, zoneB }
+}
+
 // 주차장 데이터 가져오기 (메인 함수)
 export async function fetchParkingData(): Promise<{
   parkingData: any,
@@ -280,34 +340,8 @@ export async function fetchParkingData(): Promise<{
     ])
     
     if (systemStatus && parkingSpots) {
-      // 실시간 데이터를 변환해서 기존 형식에 맞게 가공
-      const zoneA = {
-        total: 4,
-        occupied: 0,
-        spaces: [false, false, false, false]
-      }
-      
-      const zoneB = {
-        total: 4,
-        occupied: 0,
-        spaces: [false, false, false, false]
-      }
-      
-      // 주차구역 1-4는 A구역, 5-8은 B구역으로 매핑
-      parkingSpots.forEach((spot) => {
-        if (spot.id >= 1 && spot.id <= 4) {
-          // A구역
-          zoneA.spaces[spot.id - 1] = spot.occupied
-          if (spot.occupied) zoneA.occupied++
-        } else if (spot.id >= 5 && spot.id <= 8) {
-          // B구역
-          zoneB.spaces[spot.id - 5] = spot.occupied
-          if (spot.occupied) zoneB.occupied++
-        }
-      })
-      
       return {
-        parkingData: { zoneA, zoneB },
+        parkingData: buildParkingData(parkingSpots),
         isLiveData: true,
         systemStatus
       }
@@ -327,6 +361,52 @@ export async function fetchParkingData(): Promise<{
   }
 }
 
+// parking_web_server 푸시 이벤트 (/events, Server-Sent Events)
+export interface ParkingSpotEvent {
+  seq: number
+  spot_id: number
+  old_state: 'free' | 'occupied'
+  new_state: 'free' | 'occupied'
+  vehicle_id: number | null
+  vehicle_color: string | null
+  timestamp: number
+}
+
+export interface ParkingWarningDelta {
+  added: any[]
+  removed: string[]
+  active: number
+}
+
+export interface ParkingEventSnapshot {
+  parking_status: ParkingSpotData[]
+  warnings: any[]
+  spot_event_seq: number
+}
+
+// 주차구역 상태 변경/경고 변화를 실시간으로 받는다. 반환된 함수로 구독 해제
+export function subscribeParkingEvents(handlers: {
+  onSnapshot?: (snapshot: ParkingEventSnapshot) => void
+  onSpot?: (event: ParkingSpotEvent) => void
+  onWarnings?: (delta: ParkingWarningDelta) => void
+  onConnectionChange?: (connected: boolean) => void
+}): () => void {
+  if (typeof window === 'undefined' || typeof EventSource === 'undefined') {
+    return () => {}
+  }
+  
+  // 연결이 끊기면 브라우저가 Last-Event-ID와 함께 자동 재연결한다
+  const source = new EventSource(`${getParkingApiBaseUrl()}/events`)
+  
+  source.onopen = () => handlers.onConnectionChange?.(true)
+  source.onerror = () => handlers.onConnectionChange?.(false)
+  source.addEventListener('snapshot', (e) => handlers.onSnapshot?.(JSON.parse((e as MessageEvent).data)))
+  source.addEventListener('spot', (e) => handlers.onSpot?.(JSON.parse((e as MessageEvent).data)))
+  source.addEventListener('warnings', (e) => handlers.onWarnings?.(JSON.parse((e as MessageEvent).data)))
+  
+  return () => source.close()
+}
+
 // LED 제어
 export async function controlLed(ledIndex: number, action: 'on' | 'off'): Promise<boolean> {
   try {
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+탐지 파이프라인 벤치마크
+녹화 영상이나 이미지 폴더를 재생하면서 탐지 엔진의 단계별(탐지, 추적, 점유, 경고, 그리기, 인코딩)
+지연 시간 백분위수, 처리 FPS, 최대 메모리(RSS)를 재고, 프레임별 탐지 결과를 골든 파일과 비교해서
+결과가 달라진 프레임을 알려 준다. 카메라/GPIO/Flask 없이 실행된다
+
+    python3 benchmark.py 녹화.avi --write-golden golden.json   # 기준 결과 저장
+    python3 benchmark.py 녹화.avi --golden golden.json         # 성능 측정 + 결과 비교 (다르면 종료 코드 1)
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    resource = None     # Windows
+
+from detection_engine import DetectionEngine
+from event_hub import warning_key
+from frame_broadcaster import FrameBroadcaster, STREAM_PROFILES, DEFAULT_PROFILE
+from frame_source import ReplaySource, SPEEDS
+from site_layout import LAYOUT_PATH, load_layout
+
+STAGES = ('detect', 'track', 'occupancy', 'warnings', 'draw', 'encode')
+PERCENTILES = (50, 90, 99)
+
+# 실행 모드별 엔진 설정 (GUI 추적기 / 웹서버와 같은 설정)
+ENGINE_MODES = {
+    'web': {'merge_distance': None, 'sample_hsv': False},
+    'gui': {'merge_distance': 70, 'sample_hsv': True}
+}
+
+
+def peak_rss_mb():
+    """프로세스 최대 RSS (MB) - resource 모듈이 없으면 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # 리눅스는 KB, macOS는 바이트 단위
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def frame_summary(vehicles, spot_events, warnings, parking_spots):
+    """골든 비교용 프레임 결과 요약 (재생 시각을 엔진에 넘기면 실행할 때마다 같음)"""
+    return {
+        'vehicles': sorted([vehicle['id'], vehicle['color'], list(vehicle['bbox'])] for vehicle in vehicles),
+        'occupied': [[spot['id'], spot['vehicle_id']] for spot in parking_spots if spot['occupied']],
+        'events': [[event['spot_id'], event['new_state'], event['vehicle_id']] for event in spot_events],
+        'warnings': sorted(warning_key(warning) for warning in warnings)
+    }
+
+
+def summarize_timings(samples):
+    """지연 시간 목록(초) → 평균/백분위수/최대 (ms)"""
+    if not samples:
+        return None
+    values = np.array(samples) * 1000
+    summary = {'mean_ms': round(float(values.mean()), 3)}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        summary[f'p{percentile}_ms'] = round(float(value), 3)
+    summary['max_ms'] = round(float(values.max()), 3)
+    return summary
+
+
+def run_benchmark(source, engine, max_frames=None, warmup=5, profile=DEFAULT_PROFILE):
+    """source를 끝까지(또는 max_frames장) 처리하고 (측정 결과, 프레임별 결과 요약) 반환
+
+    단계는 DetectionEngine.process()와 같은 순서로 하나씩 불러서 따로 잰다.
+    처음 warmup장은 캐시(LUT/마스크/래스터)를 만드는 프레임이라 지연 시간 통계에서 뺀다.
+    """
+    broadcaster = FrameBroadcaster(jpeg_quality=STREAM_PROFILES[DEFAULT_PROFILE]['quality'])
+    clock = time.perf_counter
+    timings = {stage: [] for stage in STAGES + ('total',)}
+    summaries = []
+    measured_wall = 0.0
+    frame_started = clock()
+
+    while max_frames is None or len(summaries) < max_frames:
+        ret, frame = source.read()
+        if not ret:
+            break
+        timestamp = source.timestamp
+
+        marks = [clock()]
+        detections = engine.detect_cars_by_color(frame)
+        marks.append(clock())
+        vehicles = engine.track_vehicles(detections, timestamp)
+        marks.append(clock())
+        spot_events = engine.check_spot_occupancy(vehicles, timestamp)
+        marks.append(clock())
+        warnings = engine.calculate_distance_to_sensors(vehicles) + engine.check_vehicle_collisions(vehicles)
+        marks.append(clock())
+        summaries.append(frame_summary(vehicles, spot_events, warnings, engine.parking_spots))
+        engine.draw_interface(frame, vehicles, warnings, info_lines=(
+            "PARKING TRACKER BENCHMARK",
+            f"Total vehicles: {len(vehicles)}",
+            f"Active warnings: {len(warnings)}",
+            f"Frame: {len(summaries)}"))
+        marks.append(clock())
+        broadcaster.publish(frame, sequence=len(summaries))
+        broadcaster.get_jpeg(profile)
+        marks.append(clock())
+
+        if len(summaries) > warmup:
+            for stage, start, end in zip(STAGES, marks, marks[1:]):
+                timings[stage].append(end - start)
+            timings['total'].append(marks[-1] - marks[0])
+            measured_wall += marks[-1] - frame_started
+        frame_started = clock()
+
+    broadcaster.close()
+    measured = len(timings['total'])
+    processing = sum(timings['total'])
+    report = {
+        'frames': len(summaries),
+        'measured_frames': measured,
+        'fps': round(measured / processing, 1) if processing > 0 else None,
+        'wall_fps': round(measured / measured_wall, 1) if measured_wall > 0 else None,   # 소스 읽기/디코딩 포함
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': {stage: summarize_timings(timings[stage]) for stage in STAGES + ('total',)}
+    }
+    return report, summaries
+
+
+def compare_golden(golden_frames, summaries, limit=10):
+    """골든 결과와 프레임별 비교 - 다른 항목 설명 목록 (최대 limit개, 같으면 빈 목록)"""
+    mismatches = []
+    if len(golden_frames) != len(summaries):
+        mismatches.append(f"프레임 수가 다르다: 골든 {len(golden_frames)}장, 이번 실행 {len(summaries)}장")
+    for index, (expected, actual) in enumerate(zip(golden_frames, summaries)):
+        for key in expected:
+            if expected[key] != actual.get(key):
+                mismatches.append(f"프레임 {index + 1} {key}: 골든 {expected[key]} → 이번 실행 {actual.get(key)}")
+        if len(mismatches) >= limit:
+            break
+    return mismatches[:limit]
+
+
+def print_report(report):
+    print(f"{'단계':<10}{'평균':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'최대':>9}  (ms)")
+    for stage, summary in report['stages'].items():
+        if summary is None:
+            continue
+        print(f"{stage:<12}{summary['mean_ms']:>9.2f}{summary['p50_ms']:>9.2f}{summary['p90_ms']:>9.2f}"
+              f"{summary['p99_ms']:>9.2f}{summary['max_ms']:>9.2f}")
+    print(f"프레임 {report['frames']}장 (측정 {report['measured_frames']}장), "
+          f"처리 FPS {report['fps']} (소스 읽기 포함 {report['wall_fps']}), 최대 RSS {report['peak_rss_mb']}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='탐지 파이프라인 벤치마크 (녹화 영상/이미지 폴더 재생)')
+    parser.add_argument('source', help='녹화 영상 파일 또는 이미지 폴더')
+    parser.add_argument('--layout', default=LAYOUT_PATH, help='주차장 배치 파일 (기본: parking_layout.json)')
+    parser.add_argument('--mode', choices=sorted(ENGINE_MODES), default='web',
+                        help='엔진 설정 - web: 웹서버와 같음, gui: 객체 병합 + HSV 기록')
+    parser.add_argument('--speed', choices=SPEEDS, default='max', help='재생 속도 (기본: max)')
+    parser.add_argument('--fps', type=float, help='이미지 폴더 재생 FPS / 영상 FPS 덮어쓰기')
+    parser.add_argument('--frames', type=int, help='처리할 최대 프레임 수')
+    parser.add_argument('--warmup', type=int, default=5, help='통계에서 뺄 처음 프레임 수')
+    parser.add_argument('--profile', choices=sorted(STREAM_PROFILES), default=DEFAULT_PROFILE,
+                        help='인코딩 단계 스트림 프로파일')
+    parser.add_argument('--golden', help='비교할 골든 결과 파일 (다르면 종료 코드 1)')
+    parser.add_argument('--write-golden', help='이번 실행 결과를 골든 파일로 저장')
+    parser.add_argument('--json', help='측정 결과를 JSON 파일로 저장')
+    args = parser.parse_args()
+
+    if args.speed == 'native' and (args.golden or args.write_golden):
+        # 원래 속도 재생은 늦으면 프레임을 건너뛰므로 실행마다 처리하는 프레임이 달라진다
+        parser.error("골든 결과 비교/저장은 --speed max로만 할 수 있다")
+
+    source = ReplaySource(args.source, speed=args.speed, fps=args.fps)
+    if not source.isOpened():
+        parser.error(f"소스를 열 수 없다: {args.source}")
+    engine = DetectionEngine(load_layout(args.layout), fps=source.fps, **ENGINE_MODES[args.mode])
+
+    report, summaries = run_benchmark(source, engine, max_frames=args.frames, warmup=args.warmup,
+                                      profile=args.profile)
+    source.release()
+    report.update(source=args.source, mode=args.mode, speed=args.speed, profile=args.profile)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.write_golden:
+        with open(args.write_golden, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': os.path.basename(os.path.normpath(args.source)),
+                'mode': args.mode,
+                'fps': source.fps,
+                'frames': summaries
+            }, f, ensure_ascii=False)
+        print(f"골든 결과 저장: {args.write_golden} ({len(summaries)}장)")
+
+    if args.golden:
+        with open(args.golden, encoding='utf-8') as f:
+            golden = json.load(f)
+        if golden.get('mode', args.mode) != args.mode:
+            print(f"주의: 골든 결과는 --mode {golden['mode']}로 만들었다")
+        mismatches = compare_golden(golden['frames'], json.loads(json.dumps(summaries)))
+        if mismatches:
+            print("골든 결과와 다르다:")
+            for mismatch in mismatches:
+                print(f"   {mismatch}")
+            return 1
+        print(f"골든 결과와 같다 ({len(summaries)}장)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+다중 카메라 관리
+카메라마다 별도 프로세스에서 캡처 → 탐지/추적 → 주석 파이프라인을 실행하고 (프로세스마다 GIL이 따로 있음),
+카메라별 공유 메모리 프레임 링을 부모와 함께 쓴다. 자식은 링 슬롯에 캡처하고 그 위에 그린 뒤 상태 JSON과 함께 공개하고,
+부모는 공개된 슬롯을 복사 없이 카메라별 FrameBroadcaster에 넘기며 상태를 모아 주차장 전체 상태를 만든다.
+LED/부저/초음파 센서(GPIO)와 이력/세션/녹화 저장은 부모 프로세스에만 있다
+"""
+
+import json
+import time
+import signal
+import threading
+import logging
+import multiprocessing
+
+from frame_broadcaster import FrameBroadcaster
+from frame_ring import SharedFrameRing, PRODUCER, CONSUMER
+from site_layout import LAYOUT_KEYS, LAYOUT_PATH, load_layout
+
+logger = logging.getLogger(__name__)
+
+
+def layout_overrides(spec):
+    """카메라 설정에서 배치 파일 내용을 덮어쓸 배치 항목"""
+    return {key: spec[key] for key in LAYOUT_KEYS if key in spec}
+
+
+def run_camera(spec, ring_name, ring_lock, stop_event):
+    """카메라 프로세스 본체 (spawn된 자식 프로세스에서 실행)
+
+    GPIO/저장소 없이 추적기를 만들어 부모의 프레임 링에 캡처하게 하고,
+    인코딩 단계까지 끝난 슬롯을 상태 스냅샷과 함께 공개한다.
+    """
+    from parking_web_server import ParkingTrackerWebServer
+
+    # Ctrl+C는 부모 프로세스가 받아서 stop_event로 종료시킨다
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    ring = SharedFrameRing(name=ring_name, lock=ring_lock, holder=PRODUCER)
+    # 카메라별 배치 파일('layout')과 그 위에 덮어쓸 배치 항목 - 배치 파일이 바뀌면 카메라마다 다시 읽는다
+    tracker = ParkingTrackerWebServer(camera_index=spec.get('camera_index', 0),
+                                      resolution=tuple(spec.get('resolution', (1280, 720))),
+                                      fps=spec.get('fps', 20), camera_id=spec['id'], enable_io=False,
+                                      layout_path=spec.get('layout', LAYOUT_PATH),
+                                      layout_overrides=layout_overrides(spec))
+
+    def publish_result(ref, frame_id):
+        snapshot = tracker.snapshots.get('status')
+        ring.publish(ref, frame_id, snapshot.body if snapshot is not None else b'{}')
+
+    tracker.frame_ring = ring
+    tracker.result_sink = publish_result
+    try:
+        if tracker.start_processing():
+            stop_event.wait()
+        else:
+            logger.error(f"카메라 {spec['id']}: 카메라를 열 수 없다")
+    finally:
+        tracker.stop()
+        ring.close()
+
+
+class CameraHandle:
+    """부모 프로세스 쪽 카메라 하나 (자식 프로세스 + 공유 메모리 프레임 링 + 시청자용 브로드캐스터)"""
+
+    RING_SLOTS = 12             # 자식 파이프라인이 쥐는 슬롯 + 공개된 최신 슬롯 + 부모 시청자가 쥐는 슬롯
+    STATUS_CAPACITY = 256 * 1024
+
+    def __init__(self, spec, context):
+        self.id = str(spec['id'])
+        self.spec = dict(spec, id=self.id)
+        # 배치는 자식을 띄우기 전에 검사해서 잘못되었으면 바로 알린다 (LayoutError)
+        load_layout(self.spec.get('layout', LAYOUT_PATH), layout_overrides(self.spec))
+        self.context = context
+        width, height = spec.get('resolution', (1280, 720))
+        self.ring = SharedFrameRing((height, width, 3), slots=self.RING_SLOTS,
+                                    extra_capacity=self.STATUS_CAPACITY, lock=context.Lock(), holder=CONSUMER)
+        self.broadcaster = FrameBroadcaster(jpeg_quality=85)
+        self.stop_event = None
+        self.process = None
+        self.restarts = 0
+        self.exited_at = None
+
+        self.last_seq = 0
+        self.last_frame_id = None
+        self.status_body = None     # 자식이 직렬화한 상태 JSON 바이트 (그대로 응답)
+        self.status = None          # 집계용으로 한 번 파싱한 dict
+        self.last_update = 0
+
+    def start(self):
+        # 죽은 프로세스가 기다리던 Event는 set()이 멈출 수 있으므로 시작할 때마다 새로 만든다
+        self.stop_event = self.context.Event()
+        self.process = self.context.Process(
+            target=run_camera, args=(self.spec, self.ring.name, self.ring.lock, self.stop_event),
+            name=f"camera-{self.id}", daemon=True)
+        self.process.start()
+        self.exited_at = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def is_active(self):
+        """최근 5초 안에 처리된 프레임이 있는지"""
+        return self.last_update > 0 and time.time() - self.last_update < 5
+
+    def stop(self, timeout=5.0):
+        if self.stop_event is not None:
+            self.stop_event.set()
+        if self.process is not None:
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(1.0)
+        self.broadcaster.close()
+        self.ring.close()
+        self.ring.unlink()
+
+
+class CameraManager:
+    """카메라별 프로세스 관리 + 결과 수집
+
+    수집 스레드 하나가 poll_interval초마다 모든 링의 공개 횟수만 확인하고, 바뀐 링의 최신 슬롯만 읽는다.
+    그 카메라 영상을 보는 시청자가 있으면 슬롯 참조를 잡은 채로 브로드캐스터에 넘긴다 (프레임 복사 없음).
+    자식 프로세스가 죽으면 restart_delay초 뒤에 다시 띄운다 (재시작할 때마다 대기 시간을 두 배로, 최대 32배).
+    on_warnings(경고 목록)는 카메라 상태가 갱신될 때마다 모든 카메라의 현재 경고를 합쳐서 호출된다.
+    """
+
+    def __init__(self, specs, on_warnings=None, poll_interval=0.01, restart_delay=2.0):
+        # 자식에서 부모의 스레드/GPIO 상태를 물려받지 않도록 fork 대신 spawn
+        self.context = multiprocessing.get_context('spawn')
+        self.cameras = {}
+        for spec in specs:
+            camera = CameraHandle(spec, self.context)
+            if camera.id in self.cameras:
+                raise ValueError(f"카메라 ID가 중복된다: {camera.id}")
+            self.cameras[camera.id] = camera
+        self.on_warnings = on_warnings
+        self.poll_interval = poll_interval
+        self.restart_delay = restart_delay
+        self.warnings = {}      # 카메라 ID → 현재 경고 목록
+        self.running = False
+        self.collector = None
+
+    def start(self):
+        self.running = True
+        for camera in self.cameras.values():
+            camera.start()
+            logger.info(f"카메라 {camera.id} 프로세스 시작 (pid {camera.process.pid})")
+        self.collector = threading.Thread(target=self._collect_loop, name='camera-collector', daemon=True)
+        self.collector.start()
+
+    def get_camera(self, camera_id):
+        return self.cameras.get(camera_id)
+
+    def _collect_loop(self):
+        while self.running:
+            for camera in self.cameras.values():
+                if camera.ring.published != camera.last_seq:
+                    self._collect(camera)
+                elif not camera.is_alive():
+                    self._check_restart(camera)
+            time.sleep(self.poll_interval)
+
+    def _collect(self, camera):
+        camera.last_seq = camera.ring.published
+        ref = camera.ring.retain_latest()
+        if ref is None:
+            return
+        frame_id = ref.frame_id
+        if frame_id == camera.last_frame_id:
+            ref.release()
+            return
+        camera.last_frame_id = frame_id
+        status_body = ref.extra
+        if camera.broadcaster.subscribers > 0:
+            camera.broadcaster.publish(ref.array, sequence=frame_id, ref=ref)
+        else:
+            ref.release()
+
+        # 장면이 그대로면 상태 본문도 같으므로 다시 파싱하지 않는다
+        if status_body != camera.status_body:
+            camera.status_body = status_body
+            try:
+                camera.status = json.loads(status_body)
+            except ValueError:
+                camera.status = None
+        camera.last_update = time.time()
+
+        if self.on_warnings is not None:
+            self.warnings[camera.id] = [dict(warning, camera_id=camera.id)
+                                        for warning in (camera.status or {}).get('warnings', [])]
+            self.on_warnings([warning for warnings in self.warnings.values() for warning in warnings])
+
+    def _check_restart(self, camera):
+        if not self.running or camera.process is None:
+            return
+        now = time.time()
+        if camera.exited_at is None:
+            camera.exited_at = now
+            logger.warning(f"카메라 {camera.id} 프로세스 종료됨 (exit code {camera.process.exitcode})")
+            self.warnings.pop(camera.id, None)
+        elif now - camera.exited_at >= self.restart_delay * 2 ** min(camera.restarts, 5):
+            # 죽은 프로세스가 쥐고 있던 슬롯 참조 회수
+            camera.ring.reset_holder(PRODUCER)
+            camera.last_frame_id = None
+            camera.restarts += 1
+            camera.start()
+            logger.info(f"카메라 {camera.id} 프로세스 재시작 ({camera.restarts}번째)")
+
+    def get_camera_status(self, camera_id):
+        """카메라 하나의 요약 (상태 JSON 전체는 camera.status_body)"""
+        camera = self.cameras[camera_id]
+        status = camera.status or {}
+        spots = status.get('parking_status', [])
+        return {
+            'id': camera.id,
+            'status': 'active' if camera.is_active() else ('starting' if camera.is_alive() else 'offline'),
+            'process_alive': camera.is_alive(),
+            'restarts': camera.restarts,
+            'last_update': camera.last_update or None,
+            'total_vehicles': status.get('total_vehicles', 0),
+            'vehicle_counts': status.get('vehicle_counts', {}),
+            'total_spots': len(spots),
+            'occupied_spots': sum(1 for spot in spots if spot.get('occupied')),
+            'active_warnings': status.get('active_warnings', 0),
+            'stream_clients': camera.broadcaster.subscribers
+        }
+
+    def get_lot_status(self):
+        """주차장 전체 상태 (모든 카메라 합계 + 카메라별 요약)"""
+        cameras = [self.get_camera_status(camera_id) for camera_id in self.cameras]
+        vehicle_counts = {}
+        for camera in cameras:
+            for color, count in camera['vehicle_counts'].items():
+                vehicle_counts[color] = vehicle_counts.get(color, 0) + count
+        total_spots = sum(camera['total_spots'] for camera in cameras)
+        occupied_spots = sum(camera['occupied_spots'] for camera in cameras)
+        return {
+            'total_cameras': len(cameras),
+            'active_cameras': sum(1 for camera in cameras if camera['status'] == 'active'),
+            'total_vehicles': sum(camera['total_vehicles'] for camera in cameras),
+            'vehicle_counts': vehicle_counts,
+            'total_spots': total_spots,
+            'occupied_spots': occupied_spots,
+            'available_spots': total_spots - occupied_spots,
+            'active_warnings': sum(camera['active_warnings'] for camera in cameras),
+            'cameras': cameras,
+            'current_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        }
+
+    def stop(self):
+        self.running = False
+        if self.collector is not None:
+            self.collector.join(timeout=2)
+        for camera in self.cameras.values():
+            camera.stop()
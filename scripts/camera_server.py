@@ -6,10 +6,13 @@
 import cv2
 import time
 import threading
-from flask import Flask, Response, render_template_string
+import numpy as np
+from flask import Flask, Response, render_template_string, request
 from flask_cors import CORS
 import logging
 
+from frame_broadcaster import FrameBroadcaster, DEFAULT_PROFILE, mjpeg_stream, parse_stream_fps
+
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -24,9 +27,11 @@ class CameraStream:
         self.fps = fps
         self.cap = None
         self.frame = None
+        self.frame_sequence = 0  # 캡처된 프레임의 단조 증가 번호
         self.last_frame_time = 0
         self.lock = threading.Lock()
         self.running = False
+        self.broadcaster = FrameBroadcaster(jpeg_quality=85)
         
     def initialize_camera(self):
         """카메라 초기화"""
@@ -87,8 +92,13 @@ class CameraStream:
                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 1)
                 
                 with self.lock:
-                    self.frame = frame.copy()
+                    self.frame = frame
+                    self.frame_sequence += 1
                     self.last_frame_time = time.time()
+                    frame_sequence = self.frame_sequence
+                
+                # 스트림 클라이언트에 새 프레임 알림 (인코딩은 시청자가 요청할 때 한 번만)
+                self.broadcaster.publish(frame, sequence=frame_sequence)
                 
                 # FPS 제어
                 time.sleep(1.0 / self.fps)
@@ -107,6 +117,7 @@ class CameraStream:
     def stop(self):
         """카메라 중지"""
         self.running = False
+        self.broadcaster.close()
         if self.cap is not None:
             self.cap.release()
             self.cap = None
@@ -115,32 +126,15 @@ class CameraStream:
 # 전역 카메라 스트림 객체
 camera_stream = CameraStream()
 
-def generate_frames():
-    """MJPEG 스트림용 프레임 생성기"""
-    while True:
-        frame = camera_stream.get_frame()
-        
-        if frame is None:
-            # 카메라가 없을 때 기본 이미지 생성
-            frame = create_no_camera_frame()
-        
-        # JPEG로 인코딩
-        ret, buffer = cv2.imencode('.jpg', frame, 
-                                 [cv2.IMWRITE_JPEG_QUALITY, 85])
-        
-        if ret:
-            frame_data = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n')
-        
-        time.sleep(0.033)  # ~30 FPS
+def generate_frames(fps=None, profile=DEFAULT_PROFILE, adaptive=False):
+    """MJPEG 스트림용 프레임 생성기 - 새 프레임만 전송 (fps를 주면 해당 속도로 제한)"""
+    return mjpeg_stream(camera_stream.broadcaster, fps=fps, fallback_jpeg=get_no_camera_jpeg,
+                        profile=profile, adaptive=adaptive)
 
 def create_no_camera_frame():
     """카메라가 연결되지 않았을 때 표시할 프레임"""
-    frame = cv2.imread('/dev/null', cv2.IMREAD_COLOR)
-    if frame is None:
-        # 검은 화면 생성
-        frame = cv2.zeros((720, 1280, 3), dtype=cv2.uint8)
+    # 검은 화면 생성
+    frame = np.zeros((720, 1280, 3), dtype=np.uint8)
     
     # 메시지 추가
     cv2.putText(frame, "Camera not connected", (150, 200), 
@@ -150,6 +144,17 @@ def create_no_camera_frame():
     
     return frame
 
+_no_camera_jpeg = None
+
+def get_no_camera_jpeg():
+    """카메라 없음 프레임의 JPEG 바이트 (한 번만 인코딩)"""
+    global _no_camera_jpeg
+    if _no_camera_jpeg is None:
+        ret, buffer = cv2.imencode('.jpg', create_no_camera_frame(), 
+                                 [cv2.IMWRITE_JPEG_QUALITY, 85])
+        _no_camera_jpeg = buffer.tobytes()
+    return _no_camera_jpeg
+
 @app.route('/')
 def index():
     """테스트용 인덱스 페이지"""
@@ -173,8 +178,14 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    """비디오 스트리밍 엔드포인트"""
-    return Response(generate_frames(),
+    """비디오 스트리밍 엔드포인트
+
+    ?fps=5 - 전송 속도, ?profile=full|medium|thumb - 해상도 단계, ?adaptive=1 - 소켓이 밀리면 품질 자동 조절
+    """
+    fps = parse_stream_fps(request.args.get('fps'), max_fps=camera_stream.fps)
+    profile = request.args.get('profile', DEFAULT_PROFILE)
+    adaptive = request.args.get('adaptive', '0').lower() in ('1', 'true', 'yes')
+    return Response(generate_frames(fps, profile, adaptive),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/status')
@@ -190,6 +201,8 @@ def camera_status():
         'camera_index': camera_stream.camera_index,
         'resolution': camera_stream.resolution,
         'fps': camera_stream.fps,
+        'frame_sequence': camera_stream.frame_sequence,
+        'stream_clients': camera_stream.broadcaster.subscribers,
         'model': 'USB 웹캠',
         'uptime': current_time - camera_stream.last_frame_time if camera_stream.last_frame_time > 0 else 0,
         'current_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
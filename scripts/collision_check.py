@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+차량 간 충돌 위험 판정
+모든 차량 쌍의 거리와 상대 속도를 NumPy로 한 번에 계산한다
+"""
+
+import numpy as np
+
+# 이보다 느린 차량은 정지한 것으로 본다 (px/s) - 주차된 차량도 탐지 위치 떨림 때문에 칼만 추정 속도가
+# 이 정도까지 흔들린다. 충돌 판정, 탐지 건너뛰기, 상태 API가 같은 기준을 쓴다
+SPEED_DEADBAND = 25.0
+
+
+def vehicle_velocities(vehicles, fps):
+    """차량별 속도 (N, 2), px/s
+
+    추적기가 채운 'velocity'가 있으면 그대로 쓰고, 없으면 track_history의
+    첫 점과 마지막 점 차이를 프레임 간격(1/fps)으로 나눠 추정한다.
+    """
+    velocities = np.zeros((len(vehicles), 2), dtype=np.float64)
+
+    for i, vehicle in enumerate(vehicles):
+        if 'velocity' in vehicle:
+            velocities[i] = vehicle['velocity']
+            continue
+        history = vehicle.get('track_history') or []
+        if len(history) > 1:
+            steps = len(history) - 1
+            velocities[i] = ((history[-1][0] - history[0][0]) / steps * fps,
+                             (history[-1][1] - history[0][1]) / steps * fps)
+
+    return velocities
+
+
+def _pair_indices(count):
+    """i < j 인 모든 쌍의 인덱스"""
+    return np.triu_indices(count, k=1)
+
+
+def find_close_pairs(positions, collision_distance):
+    """거리가 collision_distance 미만인 쌍 (i, j, 거리) 목록"""
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    if len(positions) < 2:
+        return []
+
+    rows, cols = _pair_indices(len(positions))
+    distances = np.linalg.norm(positions[cols] - positions[rows], axis=1)
+    hit = np.nonzero(distances < collision_distance)[0]
+
+    return [(int(rows[k]), int(cols[k]), float(distances[k])) for k in hit]
+
+
+def find_closing_pairs(positions, velocities, collision_distance, ttc_threshold,
+                       min_closing_speed=20.0, speed_deadband=0.0):
+    """서로 다가오고 있고 ttc_threshold초 안에 collision_distance 이내로 들어올 쌍
+
+    (i, j, 현재 거리, 충돌 예상 시간(초), 접근 속도(px/s)) 목록을 반환한다.
+    나란히 서 있는 차량처럼 가깝더라도 상대 속도가 없거나 멀어지는 쌍은 제외한다.
+    속력이 speed_deadband(px/s) 미만인 차량은 정지한 것으로 본다 (탐지 위치 떨림으로 생긴 속도 무시).
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+    velocities = np.array(velocities, dtype=np.float64).reshape(-1, 2)
+    if len(positions) < 2:
+        return []
+
+    if speed_deadband > 0:
+        velocities[np.linalg.norm(velocities, axis=1) < speed_deadband] = 0.0
+
+    rows, cols = _pair_indices(len(positions))
+    dp = positions[cols] - positions[rows]      # 상대 위치
+    dv = velocities[cols] - velocities[rows]    # 상대 속도
+
+    distances = np.linalg.norm(dp, axis=1)
+    dot = (dp * dv).sum(axis=1)
+    speed_sq = (dv * dv).sum(axis=1)
+
+    # 거리 변화율 = dot / 거리 (음수면 접근 중)
+    closing_speed = -dot / np.maximum(distances, 1e-6)
+    closing = closing_speed >= min_closing_speed
+
+    # |dp + dv·t| = collision_distance 의 가장 이른 해
+    r_sq = collision_distance ** 2
+    discriminant = dot * dot - speed_sq * (distances ** 2 - r_sq)
+    reaches = closing & (discriminant >= 0) & (speed_sq > 0)
+
+    ttc = np.full(len(distances), np.inf)
+    ttc[reaches] = (-dot[reaches] - np.sqrt(discriminant[reaches])) / speed_sq[reaches]
+    # 이미 충돌 거리 안에 있으면서 계속 다가오는 경우
+    inside = closing & (distances < collision_distance)
+    ttc[inside] = 0.0
+
+    hit = np.nonzero((ttc >= 0) & (ttc <= ttc_threshold))[0]
+
+    return [(int(rows[k]), int(cols[k]), float(distances[k]), float(ttc[k]), float(closing_speed[k]))
+            for k in hit]
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+HSV 룩업 테이블 기반 단일 패스 색상 분류기
+모든 픽셀에 색상 클래스 비트를 한 번에 매기고 클래스별로 컨투어를 추출한다
+"""
+
+import cv2
+import numpy as np
+
+
+class ColorClassifier:
+    """색상 범위(HSV)를 채널별 비트마스크 룩업 테이블로 변환해 분류"""
+
+    # 채널 LUT 한 장에 담을 수 있는 최대 색상 수 (uint16 비트 수)
+    MAX_COLORS = 16
+
+    def __init__(self, color_ranges, open_kernel_size=5, close_kernel_size=8):
+        if len(color_ranges) > self.MAX_COLORS:
+            raise ValueError(f"색상은 최대 {self.MAX_COLORS}개까지 지원한다: {len(color_ranges)}개")
+
+        self.signature = self.make_signature(color_ranges)
+        self.color_names = list(color_ranges.keys())
+        self.dtype = np.uint8 if len(self.color_names) <= 8 else np.uint16
+
+        self.open_kernel = np.ones((open_kernel_size, open_kernel_size), np.uint8)
+        self.close_kernel = np.ones((close_kernel_size, close_kernel_size), np.uint8)
+        # 모폴로지 결과가 잘린 영역 밖의 영향을 받지 않도록 여유 폭 확보
+        self.padding = 2 * max(open_kernel_size, close_kernel_size)
+
+        self.lut = self._build_lut(color_ranges)
+
+    @staticmethod
+    def make_signature(color_ranges):
+        """색상 범위 변경 여부 비교용 시그니처"""
+        return tuple((name, tuple(lower), tuple(upper))
+                     for name, (lower, upper) in color_ranges.items())
+
+    def _build_lut(self, color_ranges):
+        """채널별 값 → 해당 값을 허용하는 색상 비트 집합 테이블 (H, S, V 순) 생성"""
+        luts = [np.zeros(256, dtype=self.dtype) for _ in range(3)]
+
+        for bit, (lower, upper) in enumerate(color_ranges.values()):
+            for channel, lut in enumerate(luts):
+                lo = max(int(lower[channel]), 0)
+                hi = min(int(upper[channel]), 255)
+                if lo <= hi:
+                    lut[lo:hi + 1] |= self.dtype(1 << bit)
+
+        return luts
+
+    def classify(self, hsv, mask_polygon=None):
+        """HSV 이미지의 모든 픽셀을 한 번에 색상 비트마스크로 변환
+
+        결과 픽셀의 k번째 비트가 켜져 있으면 k번째 색상 범위에 속한다.
+        세 채널 조건의 교집합이므로 색상별 cv2.inRange 결과와 동일하고,
+        색상 수와 무관하게 LUT 3번과 AND 2번으로 끝난다.
+        """
+        h, s, v = cv2.split(hsv)
+        lut_h, lut_s, lut_v = self.lut
+
+        labels = cv2.LUT(h, lut_h)
+        cv2.bitwise_and(labels, cv2.LUT(s, lut_s), dst=labels)
+        cv2.bitwise_and(labels, cv2.LUT(v, lut_v), dst=labels)
+
+        if mask_polygon is not None:
+            labels = cv2.bitwise_and(labels, labels, mask=mask_polygon)
+
+        return labels
+
+    def iter_class_masks(self, labels):
+        """색상별 노이즈 제거된 마스크를 (색상명, 마스크, 오프셋) 형태로 반환
+
+        각 색상 픽셀이 존재하는 영역(+여유 폭)만 잘라서 모폴로지를 수행하므로
+        마스크는 프레임 일부이며, 오프셋 (x, y)로 원래 좌표를 복원한다.
+        """
+        frame_h, frame_w = labels.shape[:2]
+
+        for bit, color_name in enumerate(self.color_names):
+            class_mask = np.bitwise_and(labels, self.dtype(1 << bit))
+            if class_mask.dtype != np.uint8:
+                class_mask = (class_mask != 0).astype(np.uint8)
+
+            x, y, w, h = cv2.boundingRect(class_mask)
+            if w == 0 or h == 0:
+                continue
+
+            x0 = max(x - self.padding, 0)
+            y0 = max(y - self.padding, 0)
+            x1 = min(x + w + self.padding, frame_w)
+            y1 = min(y + h + self.padding, frame_h)
+
+            mask = cv2.threshold(class_mask[y0:y1, x0:x1], 0, 255, cv2.THRESH_BINARY)[1]
+            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.open_kernel)
+            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, self.close_kernel)
+
+            yield color_name, mask, (x0, y0)
@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+차량 탐지 엔진
+색상 기반 차량 탐지 → 병합 → 추적 → 주차구역 점유 → 센서/충돌 경고 계산과 결과 그리기를 한곳에 모은다.
+GUI 추적기(parking_tracker.py)와 웹서버(parking_web_server.py)가 같은 엔진을 쓰고,
+GPIO/Flask/카메라 없이 프레임만 넣으면 결과가 나오므로 녹화 영상으로 시험하거나 성능을 잴 수 있다
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from color_classifier import ColorClassifier
+from parking_roi import ParkingAreaROI
+from hazard_map import HazardMap
+from spot_map import SpotMap, NO_SPOT
+from spot_state import SpotStateMachine
+from vehicle_tracker import VehicleTracker
+from collision_check import vehicle_velocities, find_close_pairs, find_closing_pairs, SPEED_DEADBAND
+from sensor_fusion import SensorCoverage
+from site_layout import SPOT_GEOMETRY_KEYS
+
+# 차량 표시 색상 (BGR)
+VEHICLE_DRAW_COLORS = {
+    'blue': (255, 0, 0),
+    'orange': (0, 165, 255),
+    'yellow': (0, 255, 255),
+    'white': (200, 200, 200)   # 하얀색 (회색으로 표시)
+}
+
+
+class DetectionEngine:
+    """프레임 → 차량/점유/경고 결과 (배치, 배치별 캐시, 추적/점유 상태를 가짐)
+
+    layout은 site_layout.parse_layout() 결과다. 색상 LUT, 주차장 마스크, 구역 래스터 같은 캐시는
+    첫 프레임에서 필요할 때 만들고 배치가 바뀌면 시그니처로 알아서 다시 만든다.
+    감시 스레드가 미리 만든 캐시로 바꿔 끼울 때는 PreparedLayout.apply(engine)를 쓴다.
+    추적/점유 상태를 프레임마다 이어 가므로 한 스레드에서만 호출해야 한다.
+
+    merge_distance를 주면 그 거리(픽셀) 안의 같은 색상 객체를 한 차량으로 합치고,
+    sample_hsv=True면 차량마다 실제 HSV 평균값('hsv_values')을 기록한다 (색상 범위 조정용).
+    """
+
+    def __init__(self, layout, fps=20, merge_distance=None, sample_hsv=False):
+        self.fps = fps  # 속도 추정용 프레임 속도
+        self.merge_distance = merge_distance
+        self.sample_hsv = sample_hsv
+
+        # 배치별 캐시 (get_*()가 필요할 때 만들고 배치가 바뀌면 다시 만듦)
+        self.color_classifier = None
+        self.hazard_map = None
+        self.parking_roi = None
+        self.spot_map = None
+        self.sensor_coverage = None
+        self.sensor_coverage_px = 300  # 센서 위치에서 이 거리 안의 구역을 그 센서가 담당
+        self.roi_crop = True  # False면 전체 프레임을 변환한 뒤 다각형 마스크만 적용
+        self.frame_shape = None
+
+        self.parking_spots = []
+        self.set_layout(layout)
+
+        # 점유 판정 방식 - 'center': 차량 중심점이 들어 있는 구역
+        # 'overlap': 차량 색상 픽셀이 구역 면적의 spot_overlap_threshold 이상을 덮은 구역
+        self.occupancy_mode = 'center'
+        self.spot_overlap_threshold = 0.2
+        self.spot_color_pixels = {}  # 색상 → 구역별 색상 픽셀 수 (overlap 모드에서 탐지 시 갱신)
+
+        # 구역별 점유 상태 안정화 - 연속 enter_frames 프레임 탐지되어야 점유, exit_frames 프레임 비어야 해제
+        self.spot_states = SpotStateMachine(enter_frames=3, exit_frames=5)
+
+        # 칼만 필터 예측 + 전역 최적 할당 추적기 (5프레임까지 미탐지 트랙 유지)
+        self.vehicle_tracker = VehicleTracker(tracking_distance=100, max_missed=5)
+
+        # 경고 설정
+        self.warning_distance = 80  # 센서와의 경고 거리 (픽셀)
+        self.vehicle_collision_distance = 100  # 차량 간 충돌 경고 거리 (픽셀)
+        # 충돌 경고 방식: 'ttc' = 서로 다가오는 궤적만 경고, 'distance' = 거리만으로 경고
+        self.collision_mode = 'ttc'
+        self.ttc_threshold = 2.0  # 충돌 예상 시간 경고 기준 (초)
+        self.min_closing_speed = 20.0  # 이보다 느리게 다가오면 무시 (px/s)
+        self.speed_deadband = SPEED_DEADBAND  # 이보다 느린 차량은 정지로 봄 (px/s, 주차 차량의 위치 떨림 제거)
+        self.ttc_min_hits = 5  # 이만큼 탐지된 트랙만 판정 (새 트랙은 속도 추정이 아직 불안정)
+        self.ttc_confirm_frames = 3  # 이만큼 연속으로 다가와야 경고
+        self.closing_streaks = {}  # (차량 ID, 차량 ID) → 연속으로 다가온 프레임 수
+
+    def set_layout(self, layout):
+        """배치 교체 (같은 ID 구역의 점유 상태는 이어받음) - 프레임 사이에서 호출"""
+        previous = {spot['id']: spot for spot in self.parking_spots}
+        spots = []
+        for spot in layout['parking_spots']:
+            spot = dict(spot)
+            old = previous.get(spot['id'])
+            if old is not None:
+                spot.update((key, value) for key, value in old.items() if key not in SPOT_GEOMETRY_KEYS)
+            spots.append(spot)
+
+        self.layout = layout
+        self.parking_area = list(layout['parking_area'])
+        self.ultrasonic_positions = list(layout['ultrasonic_positions'])
+        self.barrier_positions = list(layout['barrier_positions'])
+        self.color_ranges = dict(layout['color_ranges'])
+        self.parking_spots = spots
+
+    def get_color_classifier(self):
+        """현재 color_ranges에 맞는 색상 분류기 반환 (범위가 바뀌면 LUT 재생성)"""
+        signature = ColorClassifier.make_signature(self.color_ranges)
+        if self.color_classifier is None or self.color_classifier.signature != signature:
+            self.color_classifier = ColorClassifier(self.color_ranges)
+        return self.color_classifier
+
+    def get_hazard_map(self):
+        """현재 센서/차단기 배치에 맞는 위치 배열 반환 (배치가 바뀌면 재생성)"""
+        signature = HazardMap.make_signature(self.ultrasonic_positions, self.barrier_positions)
+        if self.hazard_map is None or self.hazard_map.signature != signature:
+            self.hazard_map = HazardMap(self.ultrasonic_positions, self.barrier_positions)
+        return self.hazard_map
+
+    def get_sensor_coverage(self):
+        """현재 센서/구역 배치에 맞는 센서 → 담당 구역 매핑 반환 (배치가 바뀌면 재생성)"""
+        signature = SensorCoverage.make_signature(self.ultrasonic_positions, self.parking_spots,
+                                                  self.sensor_coverage_px)
+        if self.sensor_coverage is None or self.sensor_coverage.signature != signature:
+            self.sensor_coverage = SensorCoverage(self.ultrasonic_positions, self.parking_spots,
+                                                  self.sensor_coverage_px)
+        return self.sensor_coverage
+
+    def get_spot_map(self, frame_shape):
+        """현재 parking_spots 배치에 맞는 구역 인덱스 래스터 반환 (배치가 바뀌면 재생성)"""
+        signature = SpotMap.make_signature(self.parking_spots, frame_shape)
+        if self.spot_map is None or self.spot_map.signature != signature:
+            self.spot_map = SpotMap(self.parking_spots, frame_shape)
+        return self.spot_map
+
+    def get_parking_roi(self, frame_shape):
+        """현재 parking_area에 맞는 ROI 반환 (영역이 바뀌면 마스크 재생성)"""
+        signature = ParkingAreaROI.make_signature(self.parking_area, frame_shape)
+        if self.parking_roi is None or self.parking_roi.signature != signature:
+            self.parking_roi = ParkingAreaROI(self.parking_area, frame_shape)
+        return self.parking_roi
+
+    def process(self, frame, timestamp=None):
+        """프레임 한 장 처리 - 탐지 → 추적 → 주차구역 점유 → 경고
+
+        반환 dict: vehicles(추적 ID가 붙은 차량), new_vehicles(이번 프레임에 처음 나온 차량),
+        spot_events(점유 상태 변경 이벤트), warnings(센서/차단기 경고 + 충돌 경고).
+        구역별 점유 상태는 parking_spots에 바로 기록되므로 다른 스레드에 넘기려면 사본을 만든다.
+        timestamp(초)를 주면 현재 시각 대신 그 시각으로 추적/점유를 갱신한다 (녹화 재생을 같은 결과로 반복).
+        """
+        first_new_id = self.vehicle_tracker.next_id
+        vehicles = self.track_vehicles(self.detect_cars_by_color(frame), timestamp)
+        spot_events = self.check_spot_occupancy(vehicles, timestamp)
+        warnings = self.calculate_distance_to_sensors(vehicles) + self.check_vehicle_collisions(vehicles)
+        return {
+            'vehicles': vehicles,
+            'new_vehicles': [vehicle for vehicle in vehicles if vehicle['id'] >= first_new_id],
+            'spot_events': spot_events,
+            'warnings': warnings
+        }
+
+    def detect_cars_by_color(self, frame):
+        """색상 기반 차량 탐지 (주차장 영역 내에서만, 추적 전 결과)"""
+        detected_cars = []
+        self.frame_shape = frame.shape
+        self.spot_color_pixels = {}
+
+        # 주차장 영역 마스크 (parking_area가 바뀔 때만 재생성)
+        roi = self.get_parking_roi(frame.shape)
+        if roi.is_empty:
+            return detected_cars
+
+        if self.roi_crop:
+            # 주차장 바운딩 사각형만 잘라서 처리 (영역 밖 픽셀은 변환하지 않음)
+            hsv = cv2.cvtColor(roi.crop(frame), cv2.COLOR_BGR2HSV)
+            mask_polygon = roi.mask
+            roi_x, roi_y = roi.offset
+        else:
+            hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+            mask_polygon = roi.full_frame_mask(frame.shape)
+            roi_x, roi_y = 0, 0
+
+        # 모든 픽셀을 한 번에 색상 클래스로 분류 (주차장 영역과 교집합 포함)
+        labels = self.get_color_classifier().classify(hsv, mask_polygon)
+
+        # 색상별 노이즈 제거 (LED 필터링) 후 마스크 반환
+        for color_name, mask, (offset_x, offset_y) in self.color_classifier.iter_class_masks(labels):
+            offset_x += roi_x
+            offset_y += roi_y
+
+            if self.occupancy_mode == 'overlap':
+                # 구역별로 이 색상 픽셀이 얼마나 덮였는지 집계
+                spot_map = self.get_spot_map(frame.shape)
+                self.spot_color_pixels[color_name] = spot_map.overlap_counts(mask, (offset_x, offset_y))
+
+            # 컨투어 찾기 (오프셋으로 프레임 좌표 복원)
+            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                           offset=(offset_x, offset_y))
+
+            for contour in contours:
+                area = cv2.contourArea(contour)
+
+                # 면적 필터링 (LED 제외)
+                if area < 1200:
+                    continue
+
+                x, y, w, h = cv2.boundingRect(contour)
+                aspect_ratio = w / float(h)
+
+                # 크기 필터링 (LED 제외)
+                if w < 50 or h < 30 or w > 300 or h > 200:
+                    continue
+
+                # 너무 가늘거나 긴 형태 제외
+                if aspect_ratio < 0.3 or aspect_ratio > 4.0:
+                    continue
+
+                # 컨투어의 면적과 바운딩 박스 면적 비율 - 너무 불규칙한 형태 제외 (LED 같은 점 형태)
+                rect_area = w * h
+                extent = area / rect_area
+                if extent < 0.3:
+                    continue
+
+                # 둘레 확인 (LED는 보통 작은 둘레)
+                perimeter = cv2.arcLength(contour, True)
+                if perimeter < 60:
+                    continue
+
+                center_x = x + w // 2
+                center_y = y + h // 2
+
+                # 중심점이 주차장 영역 내부에 있는지 확인
+                if len(self.parking_area) == 4:
+                    if not self.point_in_polygon((center_x, center_y), self.parking_area):
+                        continue
+
+                car = {
+                    'color': color_name,
+                    'center': (center_x, center_y),
+                    'bbox': (x, y, w, h),
+                    'area': area,
+                    'aspect_ratio': aspect_ratio,
+                    'extent': extent,
+                    'perimeter': perimeter
+                }
+
+                if self.sample_hsv:
+                    # 실제 HSV 색상 값 추출
+                    roi_hsv = hsv[y - roi_y:y - roi_y + h, x - roi_x:x - roi_x + w]
+                    mean_hsv = cv2.mean(roi_hsv, mask[y - offset_y:y - offset_y + h,
+                                                      x - offset_x:x - offset_x + w])
+                    car['hsv_values'] = {
+                        'h': round(mean_hsv[0], 1),
+                        's': round(mean_hsv[1], 1),
+                        'v': round(mean_hsv[2], 1)
+                    }
+
+                detected_cars.append(car)
+
+        if self.merge_distance is not None:
+            # 가까운 객체들 병합
+            detected_cars = self.merge_nearby_vehicles(detected_cars)
+
+        return detected_cars
+
+    def merge_nearby_vehicles(self, vehicles):
+        """가까운 차량 객체들을 병합"""
+        if len(vehicles) <= 1:
+            return vehicles
+
+        merged = []
+        used = set()
+
+        for i, vehicle1 in enumerate(vehicles):
+            if i in used:
+                continue
+
+            group = [vehicle1]
+            used.add(i)
+
+            for j, vehicle2 in enumerate(vehicles):
+                if j in used or i == j:
+                    continue
+
+                # 같은 색상이고 가까우면 병합
+                if (vehicle1['color'] == vehicle2['color'] and
+                        self.calculate_distance(vehicle1['center'], vehicle2['center']) < self.merge_distance):
+                    group.append(vehicle2)
+                    used.add(j)
+
+            if len(group) == 1:
+                merged.append(vehicle1)
+            else:
+                merged.append(self.create_merged_vehicle(group))
+
+        return merged
+
+    def create_merged_vehicle(self, vehicle_group):
+        """여러 차량 객체를 하나로 병합"""
+        min_x = min(v['bbox'][0] for v in vehicle_group)
+        min_y = min(v['bbox'][1] for v in vehicle_group)
+        max_x = max(v['bbox'][0] + v['bbox'][2] for v in vehicle_group)
+        max_y = max(v['bbox'][1] + v['bbox'][3] for v in vehicle_group)
+
+        w = max_x - min_x
+        h = max_y - min_y
+        center = (min_x + w // 2, min_y + h // 2)
+        area = sum(v['area'] for v in vehicle_group)
+
+        return {
+            'color': vehicle_group[0]['color'],
+            'center': center,
+            'bbox': (min_x, min_y, w, h),
+            'area': area,
+            'aspect_ratio': w / float(h),
+            'extent': area / (w * h),
+            'merged_count': len(vehicle_group)
+        }
+
+    def track_vehicles(self, current_vehicles, timestamp=None):
+        """차량 추적 및 ID 할당 (예측 위치 기준 색상별 전역 최적 할당)"""
+        # 같은 색상의 이전 트랙과 거리 행렬을 만들어 한 번에 매칭
+        # 이전 트랙 하나를 두 차량이 나눠 갖지 않으므로 ID가 뒤바뀌지 않는다
+        return self.vehicle_tracker.update(current_vehicles, timestamp)
+
+    def check_spot_occupancy(self, vehicles, timestamp=None):
+        """주차 구역 점유 상태 확인 - 이번 프레임 탐지 결과를 상태 머신으로 안정화하고 변경 이벤트 반환"""
+        self._detect_spot_occupancy(vehicles)
+        return self.spot_states.update(self.parking_spots, timestamp)
+
+    def _detect_spot_occupancy(self, vehicles):
+        """이번 프레임 기준 점유 여부 (구역 인덱스 래스터로 차량마다 한 번에 조회)"""
+        for spot in self.parking_spots:
+            spot['occupied'] = False
+            spot['vehicle_id'] = None
+            spot['vehicle_color'] = None
+            spot.pop('overlap', None)
+
+        if self.frame_shape is None:
+            return
+        spot_map = self.get_spot_map(self.frame_shape)
+
+        # 차량 중심점이 들어 있는 구역 (같은 구역이면 나중 차량이 기록됨)
+        spot_indices = spot_map.lookup([vehicle['center'] for vehicle in vehicles])
+        for vehicle, spot_index in zip(vehicles, spot_indices):
+            if spot_index == NO_SPOT:
+                continue
+            spot = self.parking_spots[spot_index]
+            spot['occupied'] = True
+            spot['vehicle_id'] = vehicle.get('id', 'unknown')
+            spot['vehicle_color'] = vehicle.get('color', 'unknown')
+
+        if self.occupancy_mode != 'overlap' or not self.spot_color_pixels:
+            return
+
+        # 겹침 비율 모드 - 색상 픽셀이 구역을 충분히 덮었는지로 점유 판정
+        colors = list(self.spot_color_pixels)
+        counts = np.stack([self.spot_color_pixels[color] for color in colors])
+        fractions = spot_map.overlap_fractions(counts.sum(axis=0))
+        dominant = counts.argmax(axis=0)
+
+        for index, spot in enumerate(self.parking_spots):
+            spot['overlap'] = round(float(fractions[index]), 3)
+            spot['occupied'] = bool(fractions[index] >= self.spot_overlap_threshold)
+            if not spot['occupied']:
+                spot['vehicle_id'] = None
+                spot['vehicle_color'] = None
+            elif spot['vehicle_color'] is None:
+                # 중심점이 구역 밖인 차량 (걸쳐 주차 등) - 가장 많이 덮은 색상으로 표시
+                spot['vehicle_color'] = colors[dominant[index]]
+
+    def calculate_distance_to_sensors(self, vehicles):
+        """차량과 센서들 간의 거리 계산 및 경고 생성 (모든 차량 × 센서/차단기를 한 번에 계산)"""
+        warnings = []
+        hazard_map = self.get_hazard_map()
+
+        near = hazard_map.find_near([v['center'] for v in vehicles], self.warning_distance)
+        for vehicle_idx, hazard_idx, distance in near:
+            vehicle = vehicles[vehicle_idx]
+            hazard_type = hazard_map.types[hazard_idx]
+            id_key = 'sensor_id' if hazard_type == 'ultrasonic' else 'barrier_id'
+            warnings.append({
+                'type': hazard_type,
+                id_key: hazard_map.numbers[hazard_idx],
+                'vehicle_id': vehicle.get('id', 'unknown'),
+                'vehicle_color': vehicle.get('color', 'unknown'),
+                'distance': distance,
+                'vehicle_pos': vehicle['center'],
+                'sensor_pos': hazard_map.points[hazard_idx]
+            })
+        return warnings
+
+    def check_vehicle_collisions(self, vehicles):
+        """차량 간 충돌 경고 확인 (모든 쌍을 한 번에 계산)"""
+        collision_warnings = []
+        positions = [v['center'] for v in vehicles]
+
+        if self.collision_mode == 'ttc':
+            # 서로 다가오면서 ttc_threshold초 안에 충돌 거리로 들어오는 쌍만 경고
+            # (충분히 추적된 차량끼리, ttc_confirm_frames 프레임 연속으로 다가올 때만)
+            velocities = vehicle_velocities(vehicles, self.fps)
+            pairs = find_closing_pairs(positions, velocities, self.vehicle_collision_distance,
+                                       self.ttc_threshold, self.min_closing_speed, self.speed_deadband)
+            pairs = self.confirm_closing_pairs(vehicles, pairs)
+        else:
+            pairs = [(i, j, distance, None, None)
+                     for i, j, distance in find_close_pairs(positions, self.vehicle_collision_distance)]
+
+        for i, j, distance, ttc, closing_speed in pairs:
+            vehicle1 = vehicles[i]
+            vehicle2 = vehicles[j]
+            warning = {
+                'type': 'collision',
+                'vehicle1_id': vehicle1.get('id', 'unknown'),
+                'vehicle1_color': vehicle1.get('color', 'unknown'),
+                'vehicle1_pos': vehicle1['center'],
+                'vehicle2_id': vehicle2.get('id', 'unknown'),
+                'vehicle2_color': vehicle2.get('color', 'unknown'),
+                'vehicle2_pos': vehicle2['center'],
+                'distance': distance
+            }
+            if ttc is not None:
+                warning['ttc'] = round(ttc, 2)
+                warning['closing_speed'] = round(closing_speed, 1)
+            collision_warnings.append(warning)
+
+        return collision_warnings
+
+    def confirm_closing_pairs(self, vehicles, pairs):
+        """연속 접근 프레임 수를 갱신하고 ttc_confirm_frames 이상 이어진 쌍만 반환
+
+        한쪽이라도 ttc_min_hits 프레임 미만으로 탐지된 트랙이면 세지 않는다.
+        이번 프레임에 다가오지 않은 쌍은 처음부터 다시 센다.
+        """
+        streaks = {}
+        confirmed = []
+        for pair in pairs:
+            vehicle1, vehicle2 = vehicles[pair[0]], vehicles[pair[1]]
+            hits = min(vehicle1.get('hits', self.ttc_min_hits), vehicle2.get('hits', self.ttc_min_hits))
+            if hits < self.ttc_min_hits:
+                continue
+            key = tuple(sorted((vehicle1.get('id'), vehicle2.get('id')), key=str))
+            streaks[key] = self.closing_streaks.get(key, 0) + 1
+            if streaks[key] >= self.ttc_confirm_frames:
+                confirmed.append(pair)
+        self.closing_streaks = streaks
+        return confirmed
+
+    def calculate_distance(self, pos1, pos2):
+        """두 점 사이의 유클리드 거리 계산"""
+        return math.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
+
+    def point_in_polygon(self, point, polygon):
+        """점이 다각형 내부에 있는지 확인"""
+        x, y = point
+        n = len(polygon)
+        inside = False
+
+        p1x, p1y = polygon[0]
+        for i in range(1, n + 1):
+            p2x, p2y = polygon[i % n]
+            if y > min(p1y, p2y):
+                if y <= max(p1y, p2y):
+                    if x <= max(p1x, p2x):
+                        if p1y != p2y:
+                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                        if p1x == p2x or x <= xinters:
+                            inside = not inside
+            p1x, p1y = p2x, p2y
+
+        return inside
+
+    def draw_interface(self, frame, detected_cars, all_warnings, parking_spots=None, info_lines=(),
+                       panel_size=(500, 200), line_height=22):
+        """프레임 위에 바로 결과 그리기 (parking_spots를 주면 해당 시점의 점유 상태로 그림)
+
+        info_lines는 왼쪽 위 상태 패널에 표시할 줄 목록 (첫 줄은 제목)이다.
+        """
+        if parking_spots is None:
+            parking_spots = self.parking_spots
+
+        # 주차장 영역 그리기
+        if len(self.parking_area) == 4:
+            pts = np.array(self.parking_area, np.int32)
+            pts = pts.reshape((-1, 1, 2))
+            cv2.polylines(frame, [pts], True, (255, 255, 0), 3)  # 두꺼운 노란색 선
+
+            # 반투명 채우기 - 프레임 전체 사본 대신 다각형 영역만 섞음
+            self.get_parking_roi(frame.shape).tint(frame, (255, 255, 0), 0.1)
+
+        # 주차구역 그리기
+        for spot in parking_spots:
+            x, y, w, h = spot['bbox']
+            color = (0, 255, 0) if not spot['occupied'] else (0, 0, 255)  # 비어있으면 초록, 점유되면 빨강
+            thickness = 2 if not spot['occupied'] else 4
+
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, thickness)
+
+            # 주차구역 번호 표시
+            label_pos = (x + 5, y + 20)
+            cv2.putText(frame, f"P{spot['id']}", label_pos,
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+            # 점유 상태 표시
+            if spot['occupied']:
+                status_text = "Occupied"
+                if spot['vehicle_color']:
+                    status_text += f" ({spot['vehicle_color']})"
+                cv2.putText(frame, status_text, (x + 5, y + h - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+        # 센서 위치 그리기
+        for i, sensor_pos in enumerate(self.ultrasonic_positions):
+            cv2.circle(frame, sensor_pos, 12, (0, 255, 255), 3)  # 노란색 원
+            cv2.putText(frame, f"U{i+1}", (sensor_pos[0] - 12, sensor_pos[1] + 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
+
+        for i, barrier_pos in enumerate(self.barrier_positions):
+            cv2.circle(frame, barrier_pos, 12, (255, 255, 0), 3)  # 시안색 원
+            cv2.putText(frame, f"B{i+1}", (barrier_pos[0] - 12, barrier_pos[1] + 5),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
+
+        # 탐지된 차량 표시
+        for car in detected_cars:
+            center = car['center']
+            color_name = car['color']
+            vehicle_id = car.get('id', '?')
+
+            x, y, w, h = car['bbox']
+            color = VEHICLE_DRAW_COLORS.get(color_name, (0, 255, 0))
+
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 3)
+            cv2.circle(frame, center, 8, color, -1)
+
+            # 차량 색상/ID/좌표 표시
+            cv2.putText(frame, f"{color_name.upper()}",
+                        (x, y - 35), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+            cv2.putText(frame, f"ID:{vehicle_id}",
+                        (x, y - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            cv2.putText(frame, f"({center[0]}, {center[1]})",
+                        (x, y + h + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+            # HSV 값 표시 (sample_hsv)
+            if 'hsv_values' in car:
+                hsv_text = f"H:{car['hsv_values']['h']} S:{car['hsv_values']['s']} V:{car['hsv_values']['v']}"
+                cv2.putText(frame, hsv_text, (x, y + h + 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.3, color, 1)
+
+            # 병합된 객체 표시 (merge_distance)
+            if car.get('merged_count', 1) > 1:
+                cv2.putText(frame, f"MERGED({car['merged_count']})",
+                            (x, y - 50), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+
+            # 추적 히스토리 그리기
+            if 'track_history' in car and len(car['track_history']) > 1:
+                history = car['track_history']
+                for i in range(1, len(history)):
+                    cv2.line(frame, history[i-1], history[i], color, 2)
+
+        # 경고 상황 표시
+        for warning in all_warnings:
+            if warning['type'] != 'collision':
+                vehicle_pos = warning['vehicle_pos']
+                sensor_pos = warning['sensor_pos']
+
+                # 경고 선 그리기 (빨간색, 굵게)
+                cv2.line(frame, vehicle_pos, sensor_pos, (0, 0, 255), 4)
+
+                # 거리 표시
+                mid_point = ((vehicle_pos[0] + sensor_pos[0])//2,
+                             (vehicle_pos[1] + sensor_pos[1])//2)
+                cv2.putText(frame, f"{warning['distance']:.0f}px", mid_point,
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+
+        # 상태 정보 패널 (검은 배경 + 흰 테두리)
+        panel_width, panel_height = panel_size
+        if info_lines:
+            cv2.rectangle(frame, (5, 5), (panel_width, panel_height), (0, 0, 0), -1)
+            cv2.rectangle(frame, (5, 5), (panel_width, panel_height), (255, 255, 255), 2)
+            for i, line in enumerate(info_lines):
+                color = (255, 255, 255) if i == 0 else (200, 200, 200)
+                cv2.putText(frame, line, (10, 25 + i * line_height),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+
+        # 경고 상황이 있으면 화면 상단에 경고 메시지
+        if all_warnings:
+            banner_x = panel_width + 20
+            cv2.rectangle(frame, (banner_x, 5), (frame.shape[1] - 5, 60), (0, 0, 255), -1)
+            cv2.putText(frame, "⚠️  WARNING ZONE  ⚠️", (banner_x + 10, 35),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
+
+        return frame
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+푸시 이벤트 허브
+주차구역 상태 변경과 경고 변화를 시퀀스 번호와 함께 링 버퍼에 기록하고,
+Server-Sent Events(SSE) 스트림으로 연결된 클라이언트에게 바로 전달한다
+"""
+
+import json
+import threading
+from collections import deque
+
+
+class EventHub:
+    """이벤트 링 버퍼 + 새 이벤트 대기
+
+    구독자는 마지막으로 받은 seq를 들고 wait_for_events()에서 잠들어 있다가
+    새 이벤트가 들어올 때만 깨어나므로, 변화가 없으면 연결된 클라이언트 비용이 없다.
+    """
+
+    def __init__(self, capacity=1000):
+        self.condition = threading.Condition()
+        self.events = deque(maxlen=capacity)
+        self.last_seq = 0
+        self.closed = False
+        self.subscribers = 0
+
+    def publish(self, event_type, data):
+        """이벤트 기록 후 대기 중인 구독자를 깨운다 (부여된 seq 반환)"""
+        with self.condition:
+            self.last_seq += 1
+            self.events.append((self.last_seq, event_type, data))
+            self.condition.notify_all()
+            return self.last_seq
+
+    def has_events_after(self, seq):
+        """seq 이후 이벤트가 버퍼에 모두 남아 있는지 (재연결 시 이어받기 가능 여부)"""
+        with self.condition:
+            if seq > self.last_seq:
+                return False
+            oldest = self.events[0][0] if self.events else self.last_seq + 1
+            return seq >= oldest - 1
+
+    def wait_for_events(self, last_seq, timeout=None):
+        """last_seq 이후 이벤트 목록 (시간 초과/종료면 빈 목록)"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_seq > last_seq or self.closed, timeout)
+            return [event for event in self.events if event[0] > last_seq]
+
+    def close(self):
+        """대기 중인 구독자를 모두 깨우고 스트림을 끝낸다"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+def format_sse(event_type, data, event_id=None):
+    """SSE 메시지 한 건 (bytes)"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+def sse_stream(hub, snapshot, last_event_id=None, heartbeat=15.0):
+    """SSE 스트림 생성기
+
+    처음 연결하거나 Last-Event-ID 이후 이벤트가 이미 버퍼에서 밀려났으면 snapshot()의 결과를
+    'snapshot' 이벤트로 먼저 보내고, 이후에는 새 이벤트만 보낸다.
+    heartbeat초 동안 이벤트가 없으면 프록시가 연결을 끊지 않도록 주석 한 줄을 보낸다.
+    """
+    with hub.condition:
+        hub.subscribers += 1
+
+    try:
+        if last_event_id is not None and hub.has_events_after(last_event_id):
+            last_seq = last_event_id
+        else:
+            last_seq = hub.last_seq
+            yield format_sse('snapshot', snapshot(), event_id=last_seq)
+
+        while not hub.closed:
+            events = hub.wait_for_events(last_seq, timeout=heartbeat)
+            if not events:
+                yield b': keepalive\n\n'
+                continue
+            for seq, event_type, data in events:
+                yield format_sse(event_type, data, event_id=seq)
+            last_seq = events[-1][0]
+    finally:
+        with hub.condition:
+            hub.subscribers -= 1
+
+
+def warning_key(warning):
+    """프레임이 바뀌어도 같은 경고를 가리키는 키 (경고 종류 + 센서/차량 ID)"""
+    if warning['type'] == 'ultrasonic':
+        return f"ultrasonic:{warning['sensor_id']}:{warning['vehicle_id']}"
+    if warning['type'] == 'barrier':
+        return f"barrier:{warning['barrier_id']}:{warning['vehicle_id']}"
+    if warning['type'] == 'collision':
+        # 탐지 순서에 따라 vehicle1/vehicle2가 바뀌어도 같은 키
+        pair = sorted((str(warning['vehicle1_id']), str(warning['vehicle2_id'])))
+        return f"collision:{pair[0]}:{pair[1]}"
+    return f"{warning['type']}:{warning.get('vehicle_id')}"
+
+
+def diff_warnings(previous, warnings):
+    """이전 프레임 경고(키 → 경고)와 비교한 (현재 키 → 경고, 새로 생긴 경고 목록, 사라진 키 목록)
+
+    새로 생긴 경고에는 'key'를 붙여서 반환한다. 거리 등 값만 바뀐 경고는 변화로 보지 않는다.
+    """
+    current = {}
+    for warning in warnings:
+        current.setdefault(warning_key(warning), warning)
+
+    added = [dict(warning, key=key) for key, warning in current.items() if key not in previous]
+    removed = sorted(key for key in previous if key not in current)
+    return current, added, removed
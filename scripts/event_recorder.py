@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+경고 이벤트 녹화
+최근 몇 초 분량의 JPEG 프레임을 메모리 링 버퍼에 보관하다가 충돌/차단기 경고가 새로 생기면
+경고 전 pre_seconds초 + 경고 후 post_seconds초를 하나의 영상 클립으로 만든다.
+파일 쓰기(영상/정지 이미지)는 모두 백그라운드 스레드에서 처리하므로 캡처 루프는 디스크를 기다리지 않는다
+"""
+
+import os
+import json
+import time
+import queue
+import threading
+from collections import deque
+import logging
+
+import cv2
+import numpy as np
+
+from event_hub import diff_warnings
+
+logger = logging.getLogger(__name__)
+
+# 녹화를 시작하는 경고 종류 (초음파 센서 근접 경고는 녹화하지 않음)
+RECORD_WARNING_TYPES = ('collision', 'barrier')
+
+
+class EventRecorder:
+    """이벤트 전후 녹화기
+
+    프레임은 record_fps 간격으로만 받아 JPEG 바이트로 보관하며, 링 버퍼는 pre_seconds초와
+    max_buffer_bytes 중 먼저 닿는 한도까지만 유지한다. 녹화 중에 경고가 다시 발생하면
+    종료 시각을 뒤로 미루되 클립 길이는 max_clip_seconds를 넘지 않는다.
+    경고 목록은 trigger_warnings()로 넘기면 새로 생긴 경고에서만 녹화하고, 같은 경고(키)는
+    trigger_cooldown초 안에 다시 생겨도 녹화하지 않는다 (계속 유지되는 경고가 클립을 이어 만들지 않도록).
+    저장된 클립은 최대 max_clips개, max_clip_age초까지만 보관하고 오래된 것부터 지운다 (목록과 파일 모두).
+    """
+
+    def __init__(self, clip_dir, pre_seconds=5.0, post_seconds=5.0, record_fps=10,
+                 record_size=(640, 360), jpeg_quality=75, max_buffer_bytes=32 * 1024 * 1024,
+                 max_clip_seconds=60.0, max_pending_jobs=8, trigger_cooldown=60.0,
+                 max_clips=200, max_clip_age=7 * 24 * 3600):
+        self.clip_dir = clip_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.record_interval = 1.0 / record_fps
+        self.record_size = record_size
+        self.jpeg_quality = jpeg_quality
+        self.max_buffer_bytes = max_buffer_bytes
+        self.max_clip_seconds = max_clip_seconds
+        self.trigger_cooldown = trigger_cooldown
+        self.max_clips = max_clips
+        self.max_clip_age = max_clip_age
+
+        os.makedirs(clip_dir, exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.buffer = deque()      # (시각, JPEG 바이트)
+        self.buffer_bytes = 0
+        self.next_frame_time = 0
+        self.recording = None      # 녹화 중인 클립 정보
+        self.clips = self._load_clips()
+        self._prune_clips()
+        self.clip_counter = 0
+        self.dropped_jobs = 0
+        self.active_warnings = {}   # 경고 키 → 직전 프레임의 녹화 대상 경고
+        self.last_triggered = {}    # 경고 키 → 그 경고로 마지막으로 녹화를 시작/연장한 시각
+
+        self.jobs = queue.Queue(maxsize=max_pending_jobs)
+        self.running = True
+        self.writer = threading.Thread(target=self._writer_loop, name='event-recorder', daemon=True)
+        self.writer.start()
+
+    def _load_clips(self):
+        """이전에 저장된 클립 메타데이터 (최신 순)"""
+        clips = []
+        for name in os.listdir(self.clip_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.clip_dir, name), encoding='utf-8') as f:
+                    clips.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        clips.sort(key=lambda clip: clip['started'], reverse=True)
+        return clips
+
+    def wants_frame(self, timestamp=None):
+        """record_fps 간격상 지금 프레임을 받아야 하는지 (필요할 때만 인코딩하도록)
+
+        프레임 도착 시각이 조금 흔들려도 간격이 밀리지 않도록 간격의 10%는 일찍 와도 받는다.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        return timestamp >= self.next_frame_time - self.record_interval * 0.1
+
+    def add_frame(self, frame, timestamp=None):
+        """BGR 프레임을 축소/인코딩해서 추가 (record_fps 간격이 안 됐으면 무시)"""
+        if timestamp is None:
+            timestamp = time.time()
+        if not self.wants_frame(timestamp):
+            return
+        if self.record_size is not None and (frame.shape[1], frame.shape[0]) != tuple(self.record_size):
+            frame = cv2.resize(frame, tuple(self.record_size), interpolation=cv2.INTER_AREA)
+        ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ret:
+            self.add_jpeg(buffer.tobytes(), timestamp)
+
+    def add_jpeg(self, jpeg, timestamp=None):
+        """이미 인코딩된 JPEG 프레임 추가"""
+        if timestamp is None:
+            timestamp = time.time()
+        if not self.wants_frame(timestamp):
+            return
+        self.next_frame_time = max(self.next_frame_time + self.record_interval, timestamp)
+
+        finished = None
+        with self.lock:
+            self.buffer.append((timestamp, jpeg))
+            self.buffer_bytes += len(jpeg)
+            # 시간/용량 한도를 넘은 오래된 프레임 제거
+            while self.buffer and (timestamp - self.buffer[0][0] > self.pre_seconds or
+                                   self.buffer_bytes > self.max_buffer_bytes):
+                _, old = self.buffer.popleft()
+                self.buffer_bytes -= len(old)
+
+            if self.recording is not None:
+                self.recording['frames'].append((timestamp, jpeg))
+                if timestamp >= self.recording['stop_at']:
+                    finished, self.recording = self.recording, None
+
+        if finished is not None:
+            self._submit(('clip', finished))
+
+    def trigger_warnings(self, warnings, timestamp=None):
+        """프레임의 경고 목록으로 녹화 - 새로 생긴 충돌/차단기 경고가 있을 때만 trigger()
+
+        녹화를 시작/연장했으면 사유(경고 종류)를, 아니면 None을 반환한다.
+        처리 스레드 하나에서만 호출한다.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        events = [w for w in warnings if w.get('type') in RECORD_WARNING_TYPES]
+        self.active_warnings, added, _ = diff_warnings(self.active_warnings, events)
+
+        # 쿨다운이 지난 기록은 지움 (경고 키가 쌓이지 않도록)
+        self.last_triggered = {key: at for key, at in self.last_triggered.items()
+                               if timestamp - at < self.trigger_cooldown}
+        added = [w for w in added if w['key'] not in self.last_triggered]
+        if not added:
+            return None
+
+        for warning in added:
+            self.last_triggered[warning['key']] = timestamp
+        self.trigger(added[0]['type'], details=[{
+            'type': w['type'],
+            'vehicle_id': w.get('vehicle_id', w.get('vehicle1_id')),
+            'other_id': w.get('barrier_id', w.get('vehicle2_id'))
+        } for w in added], timestamp=timestamp)
+        return added[0]['type']
+
+    def trigger(self, reason, details=None, timestamp=None):
+        """경고 발생 - 녹화를 시작하거나, 녹화 중이면 종료 시각을 연장"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            if self.recording is None:
+                self.clip_counter += 1
+                self.recording = {
+                    'id': f"{time.strftime('%Y%m%d_%H%M%S', time.localtime(timestamp))}_{self.clip_counter:03d}_{reason}",
+                    'reason': reason,
+                    'details': details,
+                    'triggered': timestamp,
+                    'frames': list(self.buffer),
+                    'stop_at': timestamp + self.post_seconds
+                }
+            else:
+                limit = self.recording['triggered'] + self.max_clip_seconds
+                self.recording['stop_at'] = min(timestamp + self.post_seconds, limit)
+
+    def save_image(self, path, frame):
+        """정지 이미지를 백그라운드에서 저장 (호출 후 frame을 수정하지 않아야 함)"""
+        self._submit(('image', path, frame))
+
+    def _submit(self, job):
+        try:
+            self.jobs.put_nowait(job)
+        except queue.Full:
+            self.dropped_jobs += 1
+            logger.warning("녹화 저장 대기열이 가득 차서 작업을 버린다")
+
+    def _writer_loop(self):
+        while self.running or not self.jobs.empty():
+            try:
+                job = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                if job[0] == 'clip':
+                    self._write_clip(job[1])
+                else:
+                    cv2.imwrite(job[1], job[2])
+            except Exception as e:
+                logger.error(f"녹화 저장 에러: {e}")
+
+    def _write_clip(self, recording):
+        """JPEG 프레임들을 영상 파일 + 메타데이터(JSON)로 저장"""
+        frames = recording['frames']
+        if not frames:
+            return
+        first = cv2.imdecode(np.frombuffer(frames[0][1], np.uint8), cv2.IMREAD_COLOR)
+        height, width = first.shape[:2]
+        duration = frames[-1][0] - frames[0][0]
+        fps = (len(frames) - 1) / duration if duration > 0 else 1.0 / self.record_interval
+
+        # mp4v를 쓸 수 없는 OpenCV 빌드면 MJPG AVI로 저장
+        for extension, codec in (('.mp4', 'mp4v'), ('.avi', 'MJPG')):
+            filename = recording['id'] + extension
+            path = os.path.join(self.clip_dir, filename)
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+            if writer.isOpened():
+                break
+        else:
+            logger.error(f"클립 영상을 만들 수 없다: {recording['id']}")
+            return
+
+        for _, jpeg in frames:
+            frame = cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR)
+            if frame.shape[:2] != (height, width):
+                frame = cv2.resize(frame, (width, height))
+            writer.write(frame)
+        writer.release()
+
+        clip = {
+            'id': recording['id'],
+            'reason': recording['reason'],
+            'details': recording['details'],
+            'triggered': recording['triggered'],
+            'started': frames[0][0],
+            'ended': frames[-1][0],
+            'frames': len(frames),
+            'fps': round(fps, 2),
+            'file': filename,
+            'size': os.path.getsize(path)
+        }
+        with open(os.path.join(self.clip_dir, recording['id'] + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(clip, f, ensure_ascii=False)
+
+        with self.lock:
+            self.clips.insert(0, clip)
+        logger.info(f"경고 클립 저장: {filename} ({len(frames)}프레임)")
+        self._prune_clips()
+
+    def _prune_clips(self, now=None):
+        """max_clips개를 넘거나 max_clip_age초보다 오래된 클립을 목록과 디스크에서 지움 (오래된 것부터)"""
+        if now is None:
+            now = time.time()
+        with self.lock:
+            # clips는 최신 순이므로 앞에서부터 한도 안의 클립만 남긴다
+            keep = [clip for clip in self.clips[:self.max_clips]
+                    if now - clip['started'] <= self.max_clip_age]
+            kept_ids = {clip['id'] for clip in keep}
+            expired = [clip for clip in self.clips if clip['id'] not in kept_ids]
+            self.clips = keep
+
+        for clip in expired:
+            for name in (clip.get('file'), clip['id'] + '.json'):
+                if not name:
+                    continue
+                try:
+                    os.remove(os.path.join(self.clip_dir, name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.warning(f"오래된 클립을 지울 수 없다: {name} ({e})")
+        if expired:
+            logger.info(f"오래된 경고 클립 {len(expired)}개 삭제")
+
+    def list_clips(self, limit=None):
+        """저장된 클립 메타데이터 (최신 순)"""
+        with self.lock:
+            clips = list(self.clips)
+        return clips[:limit] if limit is not None else clips
+
+    def get_clip(self, clip_id):
+        with self.lock:
+            for clip in self.clips:
+                if clip['id'] == clip_id:
+                    return clip
+        return None
+
+    def is_recording(self):
+        with self.lock:
+            return self.recording is not None
+
+    def close(self):
+        """녹화 중인 클립을 지금까지 분량으로 저장하고 기록 스레드 종료"""
+        with self.lock:
+            finished, self.recording = self.recording, None
+        if finished is not None:
+            self._submit(('clip', finished))
+        self.running = False
+        self.writer.join(timeout=10)
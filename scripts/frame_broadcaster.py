@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+MJPEG 프레임 브로드캐스터
+새 프레임을 시퀀스 번호와 함께 공개하고, JPEG 인코딩은 프레임당 한 번만 수행해서
+모든 스트림 클라이언트가 같은 바이트를 공유한다
+"""
+
+import time
+import threading
+
+import cv2
+
+
+# 스트림 프로파일 - size가 None이면 원본 해상도
+STREAM_PROFILES = {
+    'full': {'size': None, 'quality': 85},
+    'medium': {'size': (640, 360), 'quality': 80},
+    'thumb': {'size': (320, 180), 'quality': 70}
+}
+DEFAULT_PROFILE = 'full'
+
+
+class FrameBroadcaster:
+    """최신 프레임을 보관하고 새 프레임이 올 때까지 구독자를 대기시킨다
+
+    인코딩은 (프로파일, 품질) 조합마다 처음 요청될 때 한 번만 수행하므로
+    시청자가 없으면 인코딩하지 않고, 같은 조합의 시청자는 같은 바이트를 공유한다.
+    프레임이 프레임 링 슬롯이면 publish()에 그 참조(FrameRef)를 넘긴다. 다음 프레임이 공개될 때 놓고,
+    인코딩하는 동안에는 참조를 하나 더 잡아서 슬롯이 재사용되지 않게 한다.
+    """
+
+    def __init__(self, jpeg_quality=85, profiles=None):
+        self.profiles = dict(profiles or STREAM_PROFILES)
+        self.profiles[DEFAULT_PROFILE] = dict(self.profiles.get(DEFAULT_PROFILE, {'size': None}),
+                                              quality=jpeg_quality)
+        self.condition = threading.Condition()
+        self.encode_locks = {}
+        self.frame = None
+        self.frame_ref = None
+        self.resized = {}   # 프로파일 → 현재 프레임의 축소본
+        self.encoded = {}   # (프로파일, 품질) → 현재 프레임의 JPEG 바이트
+        self.encode_counts = {}
+        self.sequence = 0
+        self.closed = False
+        self.subscribers = 0
+        self.profile_subscribers = {}
+
+    def publish(self, frame, sequence=None, ref=None):
+        """새 프레임 공개 (sequence를 주지 않으면 1씩 증가) 후 대기 중인 구독자를 깨운다
+
+        ref는 frame이 있는 프레임 링 슬롯 참조로, 브로드캐스터가 넘겨받아 다음 프레임이 공개될 때 놓는다.
+        """
+        with self.condition:
+            previous = self.frame_ref
+            self.frame = frame
+            self.frame_ref = ref
+            self.resized = {}
+            self.encoded = {}
+            self.sequence = sequence if sequence is not None else self.sequence + 1
+            self.condition.notify_all()
+        if previous is not None:
+            previous.release()
+
+    def resolve_profile(self, profile):
+        """알 수 없는 프로파일 이름은 기본 프로파일로"""
+        return profile if profile in self.profiles else DEFAULT_PROFILE
+
+    def get_jpeg(self, profile=DEFAULT_PROFILE, quality=None):
+        """(시퀀스 번호, JPEG 바이트) 반환
+
+        현재 프레임이 해당 (프로파일, 품질)로 아직 인코딩되지 않았으면 한 번만 인코딩한다.
+        quality를 주지 않으면 프로파일 기본 품질을 사용한다.
+        """
+        profile = self.resolve_profile(profile)
+        if quality is None:
+            quality = self.profiles[profile]['quality']
+        key = (profile, quality)
+
+        with self.condition:
+            encode_lock = self.encode_locks.setdefault(key, threading.Lock())
+
+        # 여러 클라이언트가 동시에 요청해도 같은 조합의 인코딩은 한 번만 수행
+        with encode_lock:
+            with self.condition:
+                sequence, frame = self.sequence, self.frame
+                jpeg = self.encoded.get(key)
+                resized = self.resized.get(profile)
+                # 인코딩 중에 다음 프레임이 공개되어도 슬롯이 재사용되지 않도록 참조를 잡아 둔다
+                held = self.frame_ref.retain() if jpeg is None and self.frame_ref is not None else None
+            if frame is None:
+                return sequence, None
+            if jpeg is not None:
+                return sequence, jpeg
+
+            try:
+                if resized is None:
+                    resized = self._resize(frame, self.profiles[profile]['size'])
+                ret, buffer = cv2.imencode('.jpg', resized, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+            finally:
+                if held is not None:
+                    held.release()
+            if not ret:
+                return sequence, None
+            jpeg = buffer.tobytes()
+
+            with self.condition:
+                self.encode_counts[key] = self.encode_counts.get(key, 0) + 1
+                # 인코딩하는 동안 새 프레임이 들어왔으면 캐시하지 않는다
+                if self.sequence == sequence:
+                    self.resized[profile] = resized
+                    self.encoded[key] = jpeg
+            return sequence, jpeg
+
+    @staticmethod
+    def _resize(frame, size):
+        if size is None or (frame.shape[1], frame.shape[0]) == tuple(size):
+            return frame
+        return cv2.resize(frame, tuple(size), interpolation=cv2.INTER_AREA)
+
+    def wait_for_sequence(self, last_sequence, timeout=None):
+        """last_sequence 이후의 새 프레임이 공개될 때까지 대기
+
+        새 프레임이 있으면 그 시퀀스 번호, 시간 초과/종료면 None
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: self.sequence != last_sequence or self.closed, timeout)
+            if self.sequence == last_sequence or self.frame is None:
+                return None
+            return self.sequence
+
+    def has_frame(self):
+        with self.condition:
+            return self.frame is not None
+
+    def copy_frame(self):
+        """현재 프레임 사본 (프레임 링 슬롯은 재사용되므로 오래 쓸 프레임은 복사해서 가져감)"""
+        with self.condition:
+            frame = self.frame
+            held = self.frame_ref.retain() if self.frame_ref is not None else None
+        try:
+            return frame.copy() if frame is not None else None
+        finally:
+            if held is not None:
+                held.release()
+
+    def subscribe(self, profile=DEFAULT_PROFILE):
+        """스트림 클라이언트 연결 수 증가"""
+        with self.condition:
+            self.subscribers += 1
+            self.profile_subscribers[profile] = self.profile_subscribers.get(profile, 0) + 1
+
+    def unsubscribe(self, profile=DEFAULT_PROFILE):
+        """스트림 클라이언트 연결 수 감소"""
+        with self.condition:
+            self.subscribers -= 1
+            self.profile_subscribers[profile] -= 1
+            if self.profile_subscribers[profile] <= 0:
+                del self.profile_subscribers[profile]
+
+    def active_profiles(self):
+        """시청자가 있는 프로파일 목록"""
+        with self.condition:
+            return list(self.profile_subscribers)
+
+    def get_encode_counts(self):
+        """(프로파일/품질)별 누적 인코딩 횟수"""
+        with self.condition:
+            return {f"{profile}@{quality}": count
+                    for (profile, quality), count in self.encode_counts.items()}
+
+    def close(self):
+        """대기 중인 구독자를 모두 깨우고 쥐고 있던 프레임 링 참조를 놓음"""
+        with self.condition:
+            self.closed = True
+            previous, self.frame_ref = self.frame_ref, None
+            if previous is not None:
+                self.frame = None
+                self.resized = {}
+            self.condition.notify_all()
+        if previous is not None:
+            previous.release()
+
+
+def parse_stream_fps(value, max_fps=None):
+    """요청 파라미터 fps 해석 - 잘못된 값이면 None (제한 없음)"""
+    try:
+        fps = float(value)
+    except (TypeError, ValueError):
+        return None
+    if fps <= 0:
+        return None
+    if max_fps is not None:
+        fps = min(fps, max_fps)
+    return fps
+
+
+class AdaptiveQuality:
+    """클라이언트 소켓 쓰기 지연에 따라 JPEG 품질을 단계적으로 조절
+
+    한 프레임을 쓰는 데 slow_write초 이상 걸리면(소켓 버퍼가 밀리면) 품질을 한 단계 낮추고,
+    recover_after 프레임 연속으로 빠르게 써지면 한 단계 올린다.
+    단계가 정해져 있으므로 같은 단계의 클라이언트끼리는 인코딩 결과를 공유한다.
+    """
+
+    QUALITY_STEPS = (0, 15, 30, 45)  # 프로파일 기본 품질에서 뺄 값
+    MIN_QUALITY = 30
+
+    def __init__(self, base_quality, slow_write=0.1, recover_after=40):
+        self.qualities = sorted({max(base_quality - step, self.MIN_QUALITY)
+                                 for step in self.QUALITY_STEPS}, reverse=True)
+        self.slow_write = slow_write
+        self.recover_after = recover_after
+        self.level = 0
+        self.fast_writes = 0
+
+    @property
+    def quality(self):
+        return self.qualities[self.level]
+
+    def record_write(self, duration):
+        """한 프레임 전송에 걸린 시간 기록"""
+        if duration >= self.slow_write:
+            self.level = min(self.level + 1, len(self.qualities) - 1)
+            self.fast_writes = 0
+        else:
+            self.fast_writes += 1
+            if self.fast_writes >= self.recover_after and self.level > 0:
+                self.level -= 1
+                self.fast_writes = 0
+
+
+def mjpeg_stream(broadcaster, fps=None, fallback_jpeg=None, profile=DEFAULT_PROFILE, adaptive=False):
+    """MJPEG 스트림 생성기 - 새 프레임만 전송하고 fps를 주면 그 간격 이상으로 전송
+
+    profile은 STREAM_PROFILES의 해상도 단계, adaptive를 켜면 소켓이 밀릴 때 품질을 낮춘다.
+    fallback_jpeg는 아직 프레임이 하나도 없을 때 1초마다 보낼 JPEG 바이트를 반환하는 함수
+    """
+    interval = 1.0 / fps if fps else 0
+    next_send_time = time.monotonic()
+    last_sequence = 0
+    profile = broadcaster.resolve_profile(profile)
+    quality_control = None
+    if adaptive:
+        quality_control = AdaptiveQuality(broadcaster.profiles[profile]['quality'])
+    broadcaster.subscribe(profile)
+
+    try:
+        while not broadcaster.closed:
+            # 요청한 전송 간격까지 대기 (그 사이의 프레임은 인코딩하지 않고 건너뜀)
+            now = time.monotonic()
+            if now < next_send_time:
+                time.sleep(next_send_time - now)
+
+            sequence = broadcaster.wait_for_sequence(last_sequence, timeout=1.0)
+
+            if sequence is None:
+                if broadcaster.has_frame() or fallback_jpeg is None:
+                    continue
+                frame_data = fallback_jpeg()
+            else:
+                quality = quality_control.quality if quality_control is not None else None
+                last_sequence, frame_data = broadcaster.get_jpeg(profile, quality)
+                if frame_data is None:
+                    continue
+
+            if interval:
+                next_send_time = max(next_send_time + interval, time.monotonic())
+
+            # yield에서 돌아올 때까지가 WSGI 서버가 소켓에 쓰는 시간
+            write_start = time.monotonic()
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n')
+            if quality_control is not None:
+                quality_control.record_write(time.monotonic() - write_start)
+    finally:
+        broadcaster.unsubscribe(profile)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+프레임 처리 파이프라인
+캡처 → 탐지/추적 → 주석 → 인코딩 단계를 각각 별도 스레드로 실행하고
+단계 사이에는 가장 최신 프레임 하나만 보관하는 슬롯을 둔다.
+release를 주면 다음 단계로 넘어가지 못한 항목(슬롯에서 버려짐, 처리 에러, 마지막 단계 완료)마다 호출해서
+항목이 쥐고 있던 프레임 링 참조 같은 자원을 돌려준다
+"""
+
+import time
+import threading
+from collections import deque
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class LatestSlot:
+    """크기 1짜리 큐 - 새 항목이 들어오면 아직 가져가지 않은 이전 항목은 버린다 (on_drop(항목) 호출)"""
+
+    def __init__(self, on_drop=None):
+        self.condition = threading.Condition()
+        self.on_drop = on_drop
+        self.item = None
+        self.has_item = False
+        self.closed = False
+        self.dropped = 0
+
+    def put(self, item):
+        """항목 저장 (이전 항목이 남아 있으면 폐기, 닫힌 뒤에 들어온 항목도 폐기)"""
+        with self.condition:
+            if self.closed:
+                dropped = item
+            else:
+                dropped = self.item if self.has_item else None
+                if self.has_item:
+                    self.dropped += 1
+                self.item = item
+                self.has_item = True
+                self.condition.notify()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+    def get(self, timeout=None):
+        """새 항목이 들어올 때까지 대기 후 반환 (닫혔거나 시간 초과면 None)"""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.has_item or self.closed, timeout):
+                return None
+            if not self.has_item:
+                return None
+            item = self.item
+            self.item = None
+            self.has_item = False
+            return item
+
+    def close(self):
+        """대기 중인 소비자를 깨우고 더 이상 항목을 받지 않음 (남아 있던 항목은 폐기)"""
+        with self.condition:
+            self.closed = True
+            dropped = self.item if self.has_item else None
+            self.item = None
+            self.has_item = False
+            self.condition.notify_all()
+        if dropped is not None and self.on_drop is not None:
+            self.on_drop(dropped)
+
+
+class StageStats:
+    """단계별 처리 시간 통계 (최근 window개 기준)"""
+
+    def __init__(self, window=100):
+        self.lock = threading.Lock()
+        self.durations = deque(maxlen=window)
+        self.timestamps = deque(maxlen=window)
+        self.processed = 0
+        self.errors = 0
+
+    def record(self, duration):
+        with self.lock:
+            self.durations.append(duration)
+            self.timestamps.append(time.time())
+            self.processed += 1
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        """평균/최대 처리 시간(ms)과 실제 처리 FPS"""
+        with self.lock:
+            durations = list(self.durations)
+            timestamps = list(self.timestamps)
+            processed = self.processed
+            errors = self.errors
+
+        fps = 0.0
+        if len(timestamps) > 1 and timestamps[-1] > timestamps[0]:
+            fps = (len(timestamps) - 1) / (timestamps[-1] - timestamps[0])
+
+        return {
+            'avg_ms': round(sum(durations) / len(durations) * 1000, 2) if durations else 0.0,
+            'max_ms': round(max(durations) * 1000, 2) if durations else 0.0,
+            'fps': round(fps, 2),
+            'processed': processed,
+            'errors': errors
+        }
+
+
+class PipelineStage(threading.Thread):
+    """입력 슬롯에서 항목을 받아 처리하고 출력 슬롯으로 넘기는 작업 스레드
+
+    input_slot이 None이면 생산자 단계로 동작해 process()를 반복 호출한다.
+    생산자 단계에 interval(초)을 주면 처리 시간을 포함한 호출 간격을 그 값에 맞춘다.
+    process()가 None을 반환하면 다음 단계로 넘기지 않는다. 이때나 process()가 에러를 내면
+    입력 항목을 release(항목)으로 돌려준다 (결과를 반환하면 항목은 결과와 함께 다음 단계 소유가 됨).
+    """
+
+    def __init__(self, name, process, input_slot=None, output_slot=None, interval=None, release=None):
+        super().__init__(name=name, daemon=True)
+        self.process = process
+        self.release = release
+        self.input_slot = input_slot
+        self.output_slot = output_slot
+        self.interval = interval
+        self.next_run_time = 0
+        self.stats = StageStats()
+        self.running = False
+
+    def run(self):
+        self.running = True
+        while self.running:
+            if self.input_slot is not None:
+                item = self.input_slot.get(timeout=0.5)
+                if item is None:
+                    if self.input_slot.closed:
+                        break
+                    continue
+            else:
+                item = None
+                self._wait_for_next_run()
+
+            start = time.perf_counter()
+            try:
+                result = self.process(item) if self.input_slot is not None else self.process()
+            except Exception as e:
+                logger.error(f"{self.name} 단계 에러: {e}")
+                self.stats.record_error()
+                self._release(item)
+                continue
+            self.stats.record(time.perf_counter() - start)
+
+            if result is None:
+                self._release(item)
+            elif self.output_slot is not None:
+                self.output_slot.put(result)
+            else:
+                self._release(result)
+
+        if self.output_slot is not None:
+            self.output_slot.close()
+
+    def _release(self, item):
+        if item is not None and self.release is not None:
+            self.release(item)
+
+    def _wait_for_next_run(self):
+        """생산자 단계 - 다음 실행 시각까지 남은 시간만 대기 (처리 시간은 간격에 포함)"""
+        if not self.interval:
+            return
+        now = time.perf_counter()
+        if now < self.next_run_time:
+            time.sleep(self.next_run_time - now)
+        self.next_run_time = max(self.next_run_time + self.interval, time.perf_counter())
+
+    def stop(self):
+        self.running = False
+
+
+class FramePipeline:
+    """여러 단계를 슬롯으로 연결한 파이프라인 (release는 모든 단계/슬롯이 버리는 항목에 호출)"""
+
+    def __init__(self, release=None):
+        self.release = release
+        self.stages = []
+        self.slots = []
+
+    def add_stage(self, name, process, interval=None):
+        """단계 추가 - 첫 단계는 생산자, 이후 단계는 이전 단계의 출력을 입력으로 받는다"""
+        input_slot = None
+        if self.stages:
+            input_slot = LatestSlot(on_drop=self.release)
+            self.slots.append(input_slot)
+            self.stages[-1].output_slot = input_slot
+
+        stage = PipelineStage(name, process, input_slot=input_slot, interval=interval, release=self.release)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout=2.0):
+        """모든 단계를 멈추고 끝날 때까지 대기 (카메라 해제 전에 캡처 스레드가 끝나 있도록)"""
+        for stage in self.stages:
+            stage.stop()
+        for slot in self.slots:
+            slot.close()
+        for stage in self.stages:
+            # 단계 안에서 stop()을 부른 경우 자기 자신은 기다리지 않는다
+            if stage.is_alive() and stage is not threading.current_thread():
+                stage.join(timeout)
+
+    def get_stats(self):
+        """단계별 처리 시간 및 슬롯에서 버려진 프레임 수"""
+        stats = {}
+        for stage in self.stages:
+            stage_stats = stage.stats.snapshot()
+            stage_stats['dropped'] = stage.output_slot.dropped if stage.output_slot is not None else 0
+            stats[stage.name] = stage_stats
+        return stats
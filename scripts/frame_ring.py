@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+공유 메모리 프레임 링
+미리 할당한 프레임 슬롯들을 캡처 → 탐지 → 주석 → 인코딩 단계와 다른 프로세스의 소비자가 복사 없이 함께 쓴다.
+슬롯마다 참조 수와 세대 번호를 두어, 누군가 아직 보고 있는 슬롯은 캡처가 덮어쓰지 않고
+이미 재사용된 슬롯을 가리키는 오래된 참조는 세대 번호로 알아낸다
+"""
+
+import time
+import threading
+import logging
+from multiprocessing import shared_memory
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 참조 수를 따로 세는 쪽 - 한쪽 프로세스가 죽으면 그쪽이 쥐고 있던 참조만 정리할 수 있게 나눈다
+PRODUCER = 0    # 프레임을 쓰는 프로세스 (캡처/탐지/주석/인코딩 단계)
+CONSUMER = 1    # 공개된 프레임을 읽는 다른 프로세스
+
+# 헤더: 공개 횟수, 최신 슬롯(-1이면 없음), 슬롯 수, 높이, 너비, 채널 수, 슬롯별 부가 데이터 용량, 예비
+HEADER_SIZE = 64
+_PUBLISHED, _LATEST, _SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _EXTRA_CAPACITY = range(7)
+# 슬롯 표: 세대, 생산자 참조 수, 소비자 참조 수, 프레임 번호, 공개 시각(us), 부가 데이터 길이
+_GENERATION, _REFS, _FRAME_ID, _TIMESTAMP, _EXTRA_LEN = 0, 1, 3, 4, 5
+_SLOT_FIELDS = 6
+
+
+class FrameRef:
+    """링 슬롯 하나에 대한 참조 (FrameRef 객체 하나가 참조 수 1을 가짐)
+
+    array는 슬롯 메모리를 그대로 가리키는 뷰다. release() 뒤에는 슬롯이 다른 프레임에 재사용될 수 있으므로
+    array를 더 쓰면 안 된다. 다른 스레드에 넘겨 따로 쥐고 있게 하려면 retain()으로 참조를 하나 더 만든다.
+    """
+
+    __slots__ = ('ring', 'index', 'generation', 'holder', 'array', 'released')
+
+    def __init__(self, ring, index, generation, holder):
+        self.ring = ring
+        self.index = index
+        self.generation = generation
+        self.holder = holder
+        self.array = ring.frames[index]
+        self.released = False
+
+    def retain(self):
+        """같은 슬롯에 대한 새 참조"""
+        if self.released:
+            raise ValueError("이미 놓은 프레임 참조는 다시 잡을 수 없다")
+        return self.ring._retain(self.index, self.generation, self.holder)
+
+    def release(self):
+        """참조 놓기 (같은 객체로 두 번 불러도 한 번만 센다)"""
+        if not self.released:
+            self.released = True
+            self.ring._release(self)
+
+    def is_current(self):
+        """슬롯이 아직 이 참조의 세대인지 (참조를 쥐고 있는 동안에는 항상 True)"""
+        return int(self.ring.table[self.index, _GENERATION]) == self.generation
+
+    @property
+    def frame_id(self):
+        return int(self.ring.table[self.index, _FRAME_ID])
+
+    @property
+    def timestamp(self):
+        return int(self.ring.table[self.index, _TIMESTAMP]) / 1e6
+
+    @property
+    def extra(self):
+        """공개할 때 같이 기록한 부가 데이터 바이트 (다중 카메라 모드의 상태 JSON)"""
+        return self.ring.extras[self.index, :int(self.ring.table[self.index, _EXTRA_LEN])].tobytes()
+
+
+class SharedFrameRing:
+    """미리 할당한 프레임 슬롯 링 (공유 메모리)
+
+    구성: 헤더 + 슬롯 표(세대, 쪽별 참조 수, 프레임 번호, 시각, 부가 데이터 길이) + 슬롯별 부가 데이터 영역
+    + 프레임 영역. name을 주지 않으면 새로 만들고, 주면 다른 프로세스가 만든 링에 붙는다 (크기는 헤더에서 읽음).
+
+    생산자는 acquire()로 참조 수가 0이고 최신 공개 슬롯이 아닌 슬롯을 받아 그 위에 직접 캡처/그리기를 하고,
+    publish()로 최신 슬롯으로 공개한다. 다른 프로세스의 소비자는 retain_latest()로 최신 슬롯 참조를 받는다.
+    참조 수 변경만 lock 안에서 하고 프레임 데이터는 잠금 없이 읽고 쓴다 (참조가 있는 슬롯은 재사용되지 않으므로).
+    프로세스 사이에 링을 나눠 쓸 때는 lock으로 multiprocessing.Lock을 같이 넘겨야 한다.
+    """
+
+    def __init__(self, frame_shape=(720, 1280, 3), slots=10, extra_capacity=0, name=None, lock=None,
+                 holder=PRODUCER):
+        self.lock = lock if lock is not None else threading.Lock()
+        self.holder = holder
+
+        if name is None:
+            height, width, channels = frame_shape
+            size = self._layout_size(slots, height * width * channels, extra_capacity)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.header = np.ndarray((HEADER_SIZE // 8,), dtype=np.int64, buffer=self.shm.buf)
+            self.header[:] = 0
+            self.header[_LATEST] = -1
+            self.header[[_SLOTS, _HEIGHT, _WIDTH, _CHANNELS, _EXTRA_CAPACITY]] = (
+                slots, height, width, channels, extra_capacity)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.header = np.ndarray((HEADER_SIZE // 8,), dtype=np.int64, buffer=self.shm.buf)
+        self.name = self.shm.name
+
+        self.slots = int(self.header[_SLOTS])
+        self.frame_shape = (int(self.header[_HEIGHT]), int(self.header[_WIDTH]), int(self.header[_CHANNELS]))
+        self.extra_capacity = int(self.header[_EXTRA_CAPACITY])
+        frame_bytes = int(np.prod(self.frame_shape))
+
+        offset = HEADER_SIZE
+        self.table = np.ndarray((self.slots, _SLOT_FIELDS), dtype=np.int64, buffer=self.shm.buf, offset=offset)
+        offset += self.table.nbytes
+        self.extras = np.ndarray((self.slots, self.extra_capacity), dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=offset)
+        offset = self._align(offset + self.extras.nbytes)
+        self.frames = np.ndarray((self.slots,) + self.frame_shape, dtype=np.uint8, buffer=self.shm.buf,
+                                 offset=offset)
+        if name is None:
+            self.table[:] = 0
+
+        self.next_index = 0
+        self.exhausted = 0          # 빈 슬롯이 없어서 acquire()가 실패한 횟수
+        self.stale_releases = 0     # 이미 재사용된 슬롯이나 참조 수 0인 슬롯을 놓으려 한 횟수 (버그 표시)
+
+    @staticmethod
+    def _align(offset, alignment=64):
+        return (offset + alignment - 1) // alignment * alignment
+
+    @classmethod
+    def _layout_size(cls, slots, frame_bytes, extra_capacity):
+        offset = HEADER_SIZE + slots * _SLOT_FIELDS * 8 + slots * extra_capacity
+        return cls._align(offset) + slots * frame_bytes
+
+    @property
+    def published(self):
+        """지금까지 공개한 프레임 수 (바뀌었는지만 확인할 때 잠금 없이 읽음)"""
+        return int(self.header[_PUBLISHED])
+
+    def acquire(self):
+        """쓸 수 있는 빈 슬롯 참조 (세대 번호 증가). 모든 슬롯이 사용 중이면 None"""
+        with self.lock:
+            latest = int(self.header[_LATEST])
+            for step in range(self.slots):
+                index = (self.next_index + step) % self.slots
+                if index != latest and not self.table[index, _REFS:_REFS + 2].any():
+                    self.table[index, _GENERATION] += 1
+                    self.table[index, _REFS + self.holder] = 1
+                    self.table[index, _EXTRA_LEN] = 0
+                    self.next_index = (index + 1) % self.slots
+                    return FrameRef(self, index, int(self.table[index, _GENERATION]), self.holder)
+            self.exhausted += 1
+        return None
+
+    def publish(self, ref, frame_id, extra=b''):
+        """acquire()로 받은 슬롯을 최신 프레임으로 공개 (참조는 호출한 쪽이 계속 쥐고 있음)
+
+        최신 슬롯은 다음 공개 전까지 acquire()가 건너뛰므로 소비자가 retain_latest()할 때까지 남아 있다.
+        """
+        if len(extra) > self.extra_capacity:
+            raise ValueError(f"부가 데이터가 너무 크다: {len(extra)}바이트")
+        # 아직 공개 전인 슬롯이라 다른 쪽이 볼 수 없으므로 잠금 없이 기록
+        self.extras[ref.index, :len(extra)] = np.frombuffer(extra, dtype=np.uint8)
+        with self.lock:
+            self.table[ref.index, [_FRAME_ID, _TIMESTAMP, _EXTRA_LEN]] = (
+                frame_id, int(time.time() * 1e6), len(extra))
+            self.header[_LATEST] = ref.index
+            self.header[_PUBLISHED] += 1
+
+    def retain_latest(self):
+        """최신 공개 슬롯 참조 (아직 공개된 프레임이 없으면 None)"""
+        with self.lock:
+            index = int(self.header[_LATEST])
+            if index < 0:
+                return None
+            self.table[index, _REFS + self.holder] += 1
+            return FrameRef(self, index, int(self.table[index, _GENERATION]), self.holder)
+
+    def _retain(self, index, generation, holder):
+        with self.lock:
+            self.table[index, _REFS + holder] += 1
+        return FrameRef(self, index, generation, holder)
+
+    def _release(self, ref):
+        with self.lock:
+            column = _REFS + ref.holder
+            if int(self.table[ref.index, _GENERATION]) != ref.generation or self.table[ref.index, column] <= 0:
+                self.stale_releases += 1
+                logger.error(f"프레임 링 슬롯 {ref.index}: 오래된 참조 해제 (세대 {ref.generation})")
+                return
+            self.table[ref.index, column] -= 1
+
+    def reset_holder(self, holder):
+        """holder 쪽 참조를 모두 0으로 (그쪽 프로세스가 참조를 쥔 채 죽었을 때 슬롯 회수)"""
+        with self.lock:
+            self.table[:, _REFS + holder] = 0
+
+    def get_stats(self):
+        with self.lock:
+            in_use = int(np.count_nonzero(self.table[:, _REFS:_REFS + 2].any(axis=1)))
+        return {
+            'slots': self.slots,
+            'in_use': in_use,
+            'published': self.published,
+            'exhausted': self.exhausted,
+            'stale_releases': self.stale_releases
+        }
+
+    def close(self):
+        # 공유 메모리를 닫기 전에 버퍼를 참조하는 배열을 먼저 해제해야 한다
+        del self.header, self.table, self.extras, self.frames
+        try:
+            self.shm.close()
+        except BufferError:
+            # 아직 놓지 않은 FrameRef 뷰가 남아 있으면 그 뷰가 사라질 때 매핑이 해제된다
+            logger.debug(f"프레임 링 {self.name}: 남은 참조가 있어 매핑 해제를 미룬다")
+
+    def unlink(self):
+        self.shm.unlink()
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+프레임 소스
+카메라 대신 녹화 영상 파일이나 이미지 폴더를 같은 인터페이스(cv2.VideoCapture의 read/get/set/isOpened/release)로
+재생한다. 라즈베리파이나 카메라 없이 같은 장면을 반복해서 돌려 보며 성능을 재거나 탐지 결과를 비교할 수 있다
+"""
+
+import os
+import time
+
+import cv2
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# 재생 속도 - 'native': 원래 프레임 속도 (늦으면 실시간 카메라처럼 밀린 프레임을 건너뜀), 'max': 기다리지 않고 최대 속도
+SPEEDS = ('native', 'max')
+
+
+class ReplaySource:
+    """녹화 영상 파일 또는 이미지 폴더(파일 이름 순서) 재생
+
+    폴더는 fps(기본 20)를, 영상 파일은 파일에 기록된 FPS를 원래 속도로 본다.
+    timestamp는 마지막으로 읽은 프레임의 재생 시각(프레임 번호 / fps, 초)이라
+    재생 속도와 관계없이 같은 값이므로 탐지 엔진에 넘기면 추적/점유 결과가 매번 같다.
+    loop=True면 끝에서 처음으로 돌아간다 (재생 시각은 계속 증가).
+    """
+
+    def __init__(self, path, speed='native', fps=None, loop=False):
+        if speed not in SPEEDS:
+            raise ValueError(f"재생 속도는 {SPEEDS} 중 하나여야 한다: {speed}")
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.capture = None
+        self.files = None
+        self.index = 0          # 다음에 읽을 파일/영상 안 프레임 번호
+        self.position = 0       # 지금까지 재생한 프레임 수 (반복 포함, 건너뛴 프레임 포함)
+        self.timestamp = None
+        self.started_at = None
+        self.width = self.height = 0
+
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                                if name.lower().endswith(IMAGE_EXTENSIONS))
+            self.frame_count = len(self.files)
+            self.fps = float(fps or 20)
+            if self.files:
+                first = cv2.imread(self.files[0])
+                if first is not None:
+                    self.height, self.width = first.shape[:2]
+        else:
+            self.capture = cv2.VideoCapture(path)
+            self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+            self.fps = float(fps or self.capture.get(cv2.CAP_PROP_FPS) or 20)
+            self.width = int(self.capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+            self.height = int(self.capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    def isOpened(self):
+        if self.files is not None:
+            return bool(self.files) and self.width > 0
+        return self.capture is not None and self.capture.isOpened()
+
+    def read(self, image=None):
+        """다음 프레임 (ret, frame). image를 주면 크기가 같을 때 그 배열에 바로 읽어 넣는다"""
+        if not self.isOpened():
+            return False, None
+        if self.speed == 'native':
+            self._pace()
+
+        ret, frame = self._read_next(image)
+        if not ret and self.loop and self.position > 0:
+            self._rewind()
+            ret, frame = self._read_next(image)
+        if not ret:
+            return False, None
+        self.timestamp = self.position / self.fps
+        self.position += 1
+        return True, frame
+
+    def _pace(self):
+        """원래 속도 맞추기 - 이를수록 기다리고, 늦으면 밀린 프레임을 건너뛴다"""
+        now = time.monotonic()
+        if self.started_at is None:
+            self.started_at = now - self.position / self.fps
+        due_at = self.started_at + self.position / self.fps
+        if now < due_at:
+            time.sleep(due_at - now)
+        else:
+            behind = int((now - self.started_at) * self.fps) - self.position
+            if behind > 0:
+                self._skip(behind)
+
+    def _skip(self, count):
+        for _ in range(count):
+            if self.files is not None:
+                if self.index >= len(self.files):
+                    break
+            elif not self.capture.grab():
+                break
+            self.index += 1
+            self.position += 1
+
+    def _read_next(self, image):
+        if self.files is None:
+            ret, frame = self.capture.read(image) if image is not None else self.capture.read()
+            if ret:
+                self.index += 1
+            return ret, frame
+
+        while self.index < len(self.files):
+            frame = cv2.imread(self.files[self.index])
+            self.index += 1
+            if frame is None:
+                continue    # 이미지로 읽을 수 없는 파일은 건너뛴다
+            if image is not None and image.shape == frame.shape:
+                image[...] = frame
+                return True, image
+            return True, frame
+        return False, None
+
+    def _rewind(self):
+        self.index = 0
+        if self.capture is not None:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.width)
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.height)
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(self.frame_count)
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.index)
+        return 0.0
+
+    def set(self, prop, value):
+        """카메라 설정(해상도/FPS/버퍼 크기)은 재생에 적용되지 않는다"""
+        return False
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+        self.files = [] if self.files is not None else None
+
+
+def parse_source(value):
+    """명령줄/설정 파일의 소스 값 - 숫자면 카메라 번호, 아니면 영상 파일/이미지 폴더 경로"""
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return value
+
+
+def open_frame_source(source, speed='native', fps=None, loop=False, backend=cv2.CAP_ANY):
+    """카메라 번호면 cv2.VideoCapture, 경로면 ReplaySource"""
+    source = parse_source(source)
+    if isinstance(source, int):
+        return cv2.VideoCapture(source, backend)
+    return ReplaySource(source, speed=speed, fps=fps, loop=loop)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+경고 LED/부저 + 초음파 센서 하드웨어 작업자
+GPIO 제어를 전용 스레드 하나가 명령 큐로 처리해서 영상 처리 루프가 GPIO를 기다리지 않게 한다.
+초음파 센서들은 같은 스레드가 정해진 주기로 돌아가며 측정하고(Echo는 폴링 대신 상승/하강 에지 콜백 시각으로 잼),
+필터링된 최신 값은 get_reading()으로 메모리에서 바로 가져간다.
+라즈베리파이가 아니면 SimulatedBackend로 같은 동작을 흉내 낸다
+"""
+
+import time
+import queue
+import functools
+import threading
+import logging
+
+from ultrasonic_scheduler import RangingScheduler, DistanceFilter
+
+logger = logging.getLogger(__name__)
+
+# RPi.GPIO 임포트 (라즈베리파이에서만 작동)
+try:
+    import RPi.GPIO as GPIO
+    GPIO_AVAILABLE = True
+except ImportError:
+    print("RPi.GPIO를 사용할 수 없다. 시뮬레이션 모드로 실행한다.")
+    GPIO_AVAILABLE = False
+
+SOUND_SPEED_HALF = 17150  # cm/s - 왕복 시간 × 17150 = 거리(cm)
+
+
+class GpioBackend:
+    """RPi.GPIO 백엔드 - Echo 핀의 양쪽 에지를 이벤트로 감지"""
+
+    name = 'gpio'
+
+    def __init__(self):
+        GPIO.setmode(GPIO.BCM)
+
+    def setup_output(self, pin):
+        GPIO.setup(pin, GPIO.OUT)
+        GPIO.output(pin, GPIO.LOW)
+
+    def setup_ranger(self, trig_pin, echo_pin, on_edge):
+        """초음파 센서 핀 설정 (on_edge(시각)는 Echo 에지마다 GPIO 이벤트 스레드에서 호출됨)"""
+        self.setup_output(trig_pin)
+        GPIO.setup(echo_pin, GPIO.IN)
+        GPIO.add_event_detect(echo_pin, GPIO.BOTH, callback=lambda channel: on_edge(time.monotonic()))
+
+    def output(self, pin, value):
+        GPIO.output(pin, GPIO.HIGH if value else GPIO.LOW)
+
+    def cleanup(self):
+        GPIO.cleanup()
+
+
+class SimulatedBackend:
+    """GPIO 없이 테스트하기 위한 백엔드
+
+    핀 출력은 pins에 기록하고, Trig 펄스가 끝나면 그 센서의 가상 거리에 해당하는 길이의 Echo 에지를
+    바로 만들어 준다. 가상 거리는 distances[Trig 핀]이 있으면 그 값, 없으면 distance_cm
+    (None이면 Echo 없음 → 측정 시간 초과).
+    """
+
+    name = 'simulation'
+
+    def __init__(self, distance_cm=None):
+        self.distance_cm = distance_cm
+        self.distances = {}
+        self.pins = {}
+        self.rangers = {}   # Trig 핀 → Echo 에지 콜백
+
+    def setup_output(self, pin):
+        self.pins[pin] = False
+
+    def setup_ranger(self, trig_pin, echo_pin, on_edge):
+        self.setup_output(trig_pin)
+        self.rangers[trig_pin] = on_edge
+
+    def output(self, pin, value):
+        previous = self.pins.get(pin)
+        self.pins[pin] = bool(value)
+        # Trig 하강 에지 → Echo 펄스 생성
+        if pin in self.rangers and previous and not value:
+            distance = self.distances.get(pin, self.distance_cm)
+            if distance is not None:
+                rise = time.monotonic() + 0.0005
+                self.rangers[pin](rise)
+                self.rangers[pin](rise + distance / SOUND_SPEED_HALF)
+
+    def cleanup(self):
+        self.pins.clear()
+
+
+def create_backend():
+    """라즈베리파이면 GpioBackend, 아니면 SimulatedBackend"""
+    if GPIO_AVAILABLE:
+        return GpioBackend()
+    return SimulatedBackend()
+
+
+class HardwareWorker:
+    """LED/부저/초음파 센서 전용 작업 스레드
+
+    alert()/clear()는 큐에 명령만 넣고 바로 반환한다 (큐가 가득 차면 버림).
+    경고 LED/부저는 alert_duration초 뒤에 작업 스레드가 직접 끄므로 경고마다 타이머 스레드를 만들지 않는다.
+    sensors의 (Trig 핀, Echo 핀) 쌍들은 RangingScheduler 순서대로 한 번에 하나씩 측정한다.
+    측정은 Trig 펄스 후 Echo 에지 두 개(상승/하강)가 올 때까지 이벤트를 기다리며,
+    echo_timeout초 안에 오지 않으면 실패로 기록한다. 결과는 센서별 DistanceFilter를 거쳐
+    readings[센서 번호]에 참조 교체로 공개되므로 읽는 쪽은 잠금 없이 최신 값을 본다.
+    """
+
+    def __init__(self, backend, led_pin=18, buzzer_pin=19, sensors=((24, 23),),
+                 alert_duration=0.8, echo_timeout=0.04, min_ping_interval=0.06, poll_interval=0.5,
+                 filter_window=5, max_pending=32):
+        self.backend = backend
+        self.led_pin = led_pin
+        self.buzzer_pin = buzzer_pin
+        self.sensors = list(sensors)
+        self.alert_duration = alert_duration
+        self.echo_timeout = echo_timeout
+        self.min_ping_interval = min_ping_interval
+
+        self.edges = []
+        self.echo_sensor = None     # 지금 Echo를 기다리는 센서 번호
+        self.echo_done = threading.Event()
+        self.last_ping = 0
+        self.scheduler = RangingScheduler(len(self.sensors), poll_interval, min_ping_interval)
+        self.filters = [DistanceFilter(index, window=filter_window) for index in range(len(self.sensors))]
+        self.readings = [None] * len(self.sensors)
+        self.alert_on = False
+        self.alert_until = None
+        self.dropped = 0
+        self.measurements = 0
+        self.timeouts = 0
+
+        backend.setup_output(led_pin)
+        backend.setup_output(buzzer_pin)
+        for index, (trig_pin, echo_pin) in enumerate(self.sensors):
+            backend.setup_ranger(trig_pin, echo_pin, functools.partial(self._on_echo_edge, index))
+
+        self.commands = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, name='hardware-worker', daemon=True)
+        self.thread.start()
+
+    def _submit(self, command):
+        try:
+            self.commands.put_nowait(command)
+        except queue.Full:
+            self.dropped += 1
+
+    def alert(self, duration=None):
+        """경고 LED/부저 켜기 (duration초 뒤 자동으로 꺼짐, 켜져 있으면 연장)"""
+        self._submit(('alert', duration if duration is not None else self.alert_duration))
+
+    def clear(self):
+        """경고 LED/부저 끄기 (이미 꺼져 있고 대기 중인 명령이 없으면 아무것도 하지 않음)"""
+        if self.alert_on or not self.commands.empty():
+            self._submit(('clear',))
+
+    def get_reading(self, index=0):
+        """센서의 필터링된 최신 측정값 dict (측정 전이거나 없는 센서면 None). 측정을 새로 하지 않는다"""
+        if 0 <= index < len(self.readings):
+            return self.readings[index]
+        return None
+
+    def get_readings(self):
+        return list(self.readings)
+
+    def get_stats(self):
+        return {
+            'backend': self.backend.name,
+            'alert_on': self.alert_on,
+            'sensors': len(self.sensors),
+            'ping_interval': self.scheduler.slot,
+            'measurements': self.measurements,
+            'timeouts': self.timeouts,
+            'dropped_commands': self.dropped
+        }
+
+    def _on_echo_edge(self, index, timestamp):
+        if self.echo_sensor == index:
+            self.edges.append(timestamp)
+            if len(self.edges) >= 2:
+                self.echo_done.set()
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            waits = [self.scheduler.due_in(now)]
+            if self.alert_until is not None:
+                waits.append(self.alert_until - now)
+            waits = [wait for wait in waits if wait is not None]
+            timeout = max(min(waits), 0) if waits else None
+            try:
+                command = self.commands.get(timeout=timeout)
+            except queue.Empty:
+                command = None
+
+            # 명령(경고 켜기/끄기)을 측정보다 먼저 처리해서 측정 대기 시간만큼 늦어지지 않게 한다
+            if command is not None:
+                if command[0] == 'stop':
+                    break
+                try:
+                    if command[0] == 'alert':
+                        self._set_alert(True, command[1])
+                    elif command[0] == 'clear':
+                        self._set_alert(False)
+                except Exception as e:
+                    logger.error(f"하드웨어 명령 처리 에러: {e}")
+
+            now = time.monotonic()
+            if self.alert_until is not None and now >= self.alert_until:
+                self._set_alert(False)
+            due_in = self.scheduler.due_in(now)
+            if due_in is not None and due_in <= 0:
+                index = self.scheduler.take(now)
+                try:
+                    self._measure(index)
+                except Exception as e:
+                    logger.error(f"초음파 센서 {index} 측정 에러: {e}")
+
+        self._set_alert(False)
+
+    def _set_alert(self, on, duration=None):
+        if on != self.alert_on:
+            self.backend.output(self.led_pin, on)
+            self.backend.output(self.buzzer_pin, on)
+            self.alert_on = on
+        self.alert_until = time.monotonic() + duration if on else None
+
+    def _measure(self, index):
+        # 센서들이 이전 초음파의 반사를 받지 않도록 최소 간격 유지
+        wait = self.last_ping + self.min_ping_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        trig_pin = self.sensors[index][0]
+        self.edges = []
+        self.echo_done.clear()
+        self.echo_sensor = index
+        self.backend.output(trig_pin, True)
+        time.sleep(0.00001)
+        self.backend.output(trig_pin, False)
+        self.last_ping = time.monotonic()
+
+        received = self.echo_done.wait(self.echo_timeout)
+        self.echo_sensor = None
+
+        distance = None
+        self.measurements += 1
+        if received:
+            distance = round((self.edges[1] - self.edges[0]) * SOUND_SPEED_HALF, 2)
+        else:
+            self.timeouts += 1
+
+        self.readings[index] = self.filters[index].add(distance, time.time())
+
+    def close(self):
+        """남은 명령 처리 후 LED/부저를 끄고 GPIO 정리"""
+        try:
+            self.commands.put(('stop',), timeout=1)
+        except queue.Full:
+            pass
+        self.thread.join(timeout=2)
+        self.backend.cleanup()
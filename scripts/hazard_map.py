@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+센서/차단기 근접 판정
+초음파 센서와 차단기 좌표를 하나의 NumPy 배열로 보관하고,
+모든 차량 × 모든 지점 거리를 브로드캐스팅으로 한 번에 계산한다
+"""
+
+import numpy as np
+
+
+class HazardMap:
+    """초음파 센서 + 차단기 위치 배열 (배치가 바뀔 때만 다시 생성)
+
+    지점 순서는 초음파 센서 다음 차단기 순이며, 각 지점의 종류와 종류 안에서의 번호(1부터)를 함께 보관한다.
+    """
+
+    def __init__(self, ultrasonic_positions, barrier_positions):
+        self.signature = self.make_signature(ultrasonic_positions, barrier_positions)
+
+        self.points = [tuple(p) for p in ultrasonic_positions] + [tuple(p) for p in barrier_positions]
+        self.positions = np.array(self.points, dtype=np.float64).reshape(-1, 2)
+        self.types = ['ultrasonic'] * len(ultrasonic_positions) + ['barrier'] * len(barrier_positions)
+        self.numbers = (list(range(1, len(ultrasonic_positions) + 1)) +
+                        list(range(1, len(barrier_positions) + 1)))
+
+    @staticmethod
+    def make_signature(ultrasonic_positions, barrier_positions):
+        """센서 배치 변경 여부 비교용 시그니처"""
+        return (tuple(tuple(p) for p in ultrasonic_positions),
+                tuple(tuple(p) for p in barrier_positions))
+
+    def __len__(self):
+        return len(self.points)
+
+    def find_near(self, vehicle_positions, warning_distance):
+        """warning_distance 미만으로 가까운 (차량 인덱스, 지점 인덱스, 거리) 목록
+
+        차량 순서대로, 한 차량 안에서는 초음파 센서 → 차단기 순으로 반환한다.
+        """
+        vehicle_positions = np.asarray(vehicle_positions, dtype=np.float64).reshape(-1, 2)
+        if len(vehicle_positions) == 0 or len(self.points) == 0:
+            return []
+
+        # (차량 수, 지점 수) 거리 행렬
+        diff = vehicle_positions[:, None, :] - self.positions[None, :, :]
+        distances = np.sqrt((diff ** 2).sum(axis=2))
+
+        rows, cols = np.nonzero(distances < warning_distance)
+        return [(int(r), int(c), float(distances[r, c])) for r, c in zip(rows, cols)]
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+주차 이력 저장소 (SQLite)
+주차구역 상태 변경과 주기적인 점유 샘플을 백그라운드 스레드가 모아서 일괄 기록하고,
+분/시간/일 단위 집계를 기록 시점에 미리 누적해서 범위 조회가 집계 행만 읽도록 한다
+"""
+
+import time
+import queue
+import sqlite3
+import threading
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = ('minute', 'hour', 'day')
+LOT = 0  # 집계 행의 spot_id - 주차장 전체 (배치 파일의 구역 ID는 1 이상이라 겹치지 않음)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    ts REAL NOT NULL,
+    spot_id INTEGER NOT NULL,
+    old_state TEXT NOT NULL,
+    new_state TEXT NOT NULL,
+    vehicle_id INTEGER,
+    vehicle_color TEXT
+);
+CREATE INDEX IF NOT EXISTS transitions_ts ON transitions (ts);
+CREATE INDEX IF NOT EXISTS transitions_spot_ts ON transitions (spot_id, ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    resolution TEXT NOT NULL,
+    spot_id INTEGER NOT NULL,
+    bucket INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    occupied_sum INTEGER NOT NULL,
+    occupied_max INTEGER NOT NULL,
+    vehicles_sum INTEGER NOT NULL,
+    vehicles_max INTEGER NOT NULL,
+    entries INTEGER NOT NULL,
+    exits INTEGER NOT NULL,
+    PRIMARY KEY (resolution, spot_id, bucket)
+) WITHOUT ROWID;
+"""
+
+_UPSERT_ROLLUP = """
+INSERT INTO rollups (resolution, spot_id, bucket, samples, occupied_sum, occupied_max,
+                     vehicles_sum, vehicles_max, entries, exits)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (resolution, spot_id, bucket) DO UPDATE SET
+    samples = samples + excluded.samples,
+    occupied_sum = occupied_sum + excluded.occupied_sum,
+    occupied_max = MAX(occupied_max, excluded.occupied_max),
+    vehicles_sum = vehicles_sum + excluded.vehicles_sum,
+    vehicles_max = MAX(vehicles_max, excluded.vehicles_max),
+    entries = entries + excluded.entries,
+    exits = exits + excluded.exits
+"""
+
+
+def bucket_start(timestamp, resolution):
+    """timestamp가 속한 집계 구간의 시작 시각 (일 단위는 현지 자정 기준)"""
+    if resolution == 'minute':
+        return int(timestamp // 60 * 60)
+    if resolution == 'hour':
+        return int(timestamp // 3600 * 3600)
+    if resolution == 'day':
+        local = datetime.fromtimestamp(timestamp)
+        return int(local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    raise ValueError(f"알 수 없는 집계 단위: {resolution}")
+
+
+class HistoryStore:
+    """이력 기록/조회
+
+    record_*()는 큐에 넣기만 하므로 프레임 루프를 막지 않는다 (큐가 가득 차면 버리고 dropped 증가).
+    백그라운드 스레드가 flush_interval초마다 또는 batch_size개가 모이면 한 트랜잭션으로 기록한다.
+    조회는 요청 스레드별 읽기 연결을 사용하고, WAL 모드라서 기록 중에도 막히지 않는다.
+    """
+
+    def __init__(self, db_path, flush_interval=1.0, batch_size=500, max_pending=10000):
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.dropped = 0
+        self.written = 0
+        self.local = threading.local()
+
+        connection = sqlite3.connect(db_path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(_SCHEMA)
+        connection.close()
+
+        self.running = True
+        self.writer = threading.Thread(target=self._writer_loop, name='history-writer', daemon=True)
+        self.writer.start()
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_transition(self, event):
+        """주차구역 상태 변경 이벤트 (SpotStateMachine 이벤트) 기록"""
+        self._put(('transition', event['timestamp'], event['spot_id'], event['old_state'],
+                   event['new_state'], event['vehicle_id'], event['vehicle_color']))
+
+    def record_sample(self, timestamp, parking_spots, vehicle_count):
+        """현재 점유 상태 샘플 기록 (주차장 전체 점유 수 + 구역별 점유 여부)"""
+        occupancy = tuple((spot['id'], 1 if spot['occupied'] else 0) for spot in parking_spots)
+        self._put(('sample', timestamp, occupancy, vehicle_count))
+
+    def _writer_loop(self):
+        connection = sqlite3.connect(self.db_path)
+        connection.execute('PRAGMA synchronous=NORMAL')
+        pending = []
+        next_flush = time.monotonic() + self.flush_interval
+
+        while self.running or not self.queue.empty():
+            timeout = max(next_flush - time.monotonic(), 0)
+            try:
+                pending.append(self.queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+
+            if len(pending) >= self.batch_size or time.monotonic() >= next_flush:
+                if pending:
+                    try:
+                        self._flush(connection, pending)
+                    except sqlite3.Error as e:
+                        logger.error(f"이력 기록 에러: {e}")
+                    pending = []
+                next_flush = time.monotonic() + self.flush_interval
+
+        if pending:
+            self._flush(connection, pending)
+        connection.close()
+
+    def _flush(self, connection, items):
+        """모아 둔 항목을 한 트랜잭션으로 기록 (집계는 먼저 메모리에서 합친 뒤 구간별로 한 번씩 upsert)"""
+        transitions = []
+        rollups = {}    # (단위, spot_id, 구간) → [samples, occ_sum, occ_max, veh_sum, veh_max, entries, exits]
+
+        def add(resolution, spot_id, bucket, samples=0, occupied=0, vehicles=0, entries=0, exits=0):
+            row = rollups.get((resolution, spot_id, bucket))
+            if row is None:
+                row = rollups[(resolution, spot_id, bucket)] = [0, 0, 0, 0, 0, 0, 0]
+            row[0] += samples
+            if samples:
+                row[1] += occupied
+                row[2] = max(row[2], occupied)
+                row[3] += vehicles
+                row[4] = max(row[4], vehicles)
+            row[5] += entries
+            row[6] += exits
+
+        for item in items:
+            kind, timestamp = item[0], item[1]
+            buckets = [(resolution, bucket_start(timestamp, resolution)) for resolution in RESOLUTIONS]
+
+            if kind == 'transition':
+                transitions.append(item[1:])
+                entry = 1 if item[4] == 'occupied' else 0
+                for resolution, bucket in buckets:
+                    for spot_id in (LOT, item[2]):
+                        add(resolution, spot_id, bucket, entries=entry, exits=1 - entry)
+            else:
+                occupancy, vehicle_count = item[2], item[3]
+                occupied_total = sum(occupied for _, occupied in occupancy)
+                for resolution, bucket in buckets:
+                    add(resolution, LOT, bucket, samples=1, occupied=occupied_total, vehicles=vehicle_count)
+                    for spot_id, occupied in occupancy:
+                        add(resolution, spot_id, bucket, samples=1, occupied=occupied)
+
+        with connection:
+            if transitions:
+                connection.executemany(
+                    'INSERT INTO transitions (ts, spot_id, old_state, new_state, vehicle_id, vehicle_color) '
+                    'VALUES (?, ?, ?, ?, ?, ?)', transitions)
+            connection.executemany(_UPSERT_ROLLUP,
+                                   [key + tuple(row) for key, row in rollups.items()])
+        self.written += len(items)
+
+    def _reader(self):
+        """요청 스레드별 읽기 전용 연결"""
+        connection = getattr(self.local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            self.local.connection = connection
+        return connection
+
+    def query(self, start, end, resolution='hour', spot_id=LOT):
+        """[start, end) 구간의 집계 목록 (단위: minute/hour/day)
+
+        시작 시각이 걸친 구간도 포함한다. spot_id가 LOT(0)이면 주차장 전체.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"알 수 없는 집계 단위: {resolution}")
+
+        rows = self._reader().execute(
+            'SELECT bucket, samples, occupied_sum, occupied_max, vehicles_sum, vehicles_max, entries, exits '
+            'FROM rollups WHERE resolution = ? AND spot_id = ? AND bucket >= ? AND bucket < ? '
+            'ORDER BY bucket',
+            (resolution, spot_id, bucket_start(start, resolution), end)).fetchall()
+
+        return [{
+            'bucket': bucket,
+            'samples': samples,
+            'avg_occupied': round(occupied_sum / samples, 3) if samples else None,
+            'max_occupied': occupied_max if samples else None,
+            'avg_vehicles': round(vehicles_sum / samples, 3) if samples else None,
+            'max_vehicles': vehicles_max if samples else None,
+            'entries': entries,
+            'exits': exits
+        } for bucket, samples, occupied_sum, occupied_max, vehicles_sum, vehicles_max, entries, exits in rows]
+
+    def query_transitions(self, start, end, spot_id=None, limit=1000):
+        """[start, end) 구간의 상태 변경 원본 목록 (오래된 순)"""
+        sql = ('SELECT ts, spot_id, old_state, new_state, vehicle_id, vehicle_color FROM transitions '
+               'WHERE ts >= ? AND ts < ?')
+        params = [start, end]
+        if spot_id is not None:
+            sql += ' AND spot_id = ?'
+            params.append(spot_id)
+        sql += ' ORDER BY ts LIMIT ?'
+        params.append(limit)
+
+        return [{
+            'timestamp': ts,
+            'spot_id': spot,
+            'old_state': old_state,
+            'new_state': new_state,
+            'vehicle_id': vehicle_id,
+            'vehicle_color': vehicle_color
+        } for ts, spot, old_state, new_state, vehicle_id, vehicle_color
+            in self._reader().execute(sql, params)]
+
+    def close(self):
+        """남은 항목을 기록하고 기록 스레드 종료"""
+        self.running = False
+        self.writer.join(timeout=5)
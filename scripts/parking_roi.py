@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+주차장 영역(ROI) 캐시
+parking_area 다각형의 바운딩 사각형과 잘린 좌표계 기준 다각형 마스크를 보관한다
+"""
+
+import cv2
+import numpy as np
+
+
+class ParkingAreaROI:
+    """주차장 다각형을 감싸는 사각형 영역과 그 안의 다각형 마스크"""
+
+    def __init__(self, parking_area, frame_shape):
+        self.signature = self.make_signature(parking_area, frame_shape)
+        frame_h, frame_w = frame_shape[:2]
+
+        if len(parking_area) == 4:
+            pts = np.array(parking_area, np.int32)
+            x, y, w, h = cv2.boundingRect(pts)
+
+            # 프레임 밖으로 나간 좌표는 잘라낸다
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + w, frame_w), min(y + h, frame_h)
+            self.bbox = (x0, y0, max(x1 - x0, 0), max(y1 - y0, 0))
+
+            # 잘린 영역 좌표계로 옮긴 다각형 마스크
+            self.mask = np.zeros((self.bbox[3], self.bbox[2]), dtype=np.uint8)
+            cv2.fillPoly(self.mask, [pts - np.array([x0, y0], np.int32)], 255)
+        else:
+            # 영역이 설정되지 않았으면 전체 화면
+            self.bbox = (0, 0, frame_w, frame_h)
+            self.mask = None
+
+        self._full_frame_mask = None
+        self._tint_key = None       # (색, 비율) - tint()용 단색 이미지/임시 버퍼는 이 값이 바뀔 때만 다시 만든다
+        self._tint_fill = None
+        self._tint_buffer = None
+
+    @staticmethod
+    def make_signature(parking_area, frame_shape):
+        """parking_area / 프레임 크기 변경 여부 비교용 시그니처"""
+        return (tuple(tuple(p) for p in parking_area), tuple(frame_shape[:2]))
+
+    @property
+    def offset(self):
+        """잘린 영역 좌상단의 프레임 좌표"""
+        return self.bbox[0], self.bbox[1]
+
+    def crop(self, frame):
+        """프레임에서 ROI 부분만 잘라낸 뷰 반환 (복사 없음)"""
+        x, y, w, h = self.bbox
+        return frame[y:y + h, x:x + w]
+
+    @property
+    def is_empty(self):
+        """다각형이 프레임과 겹치지 않는 경우"""
+        return self.bbox[2] == 0 or self.bbox[3] == 0
+
+    def full_frame_mask(self, frame_shape):
+        """프레임 전체 크기의 다각형 마스크 (ROI 잘라내기를 끈 경우용, 한 번만 생성)"""
+        if self.mask is None:
+            return None
+        if self._full_frame_mask is None:
+            x, y, w, h = self.bbox
+            self._full_frame_mask = np.zeros(frame_shape[:2], dtype=np.uint8)
+            self._full_frame_mask[y:y + h, x:x + w] = self.mask
+        return self._full_frame_mask
+
+    def tint(self, frame, color, alpha):
+        """프레임의 다각형 안쪽에 color를 alpha 비율로 섞음 (제자리에서, ROI 크기 임시 버퍼만 사용)"""
+        if self.is_empty:
+            return
+        x, y, w, h = self.bbox
+        if self._tint_key != (tuple(color), alpha):
+            self._tint_key = (tuple(color), alpha)
+            self._tint_fill = np.empty((h, w, frame.shape[2]), dtype=np.uint8)
+            self._tint_fill[:] = color
+            self._tint_buffer = np.empty_like(self._tint_fill)
+
+        region = self.crop(frame)
+        cv2.addWeighted(region, 1.0 - alpha, self._tint_fill, alpha, 0, dst=self._tint_buffer)
+        if self.mask is None:
+            region[...] = self._tint_buffer
+        else:
+            cv2.copyTo(self._tint_buffer, self.mask, region)
@@ -9,24 +9,39 @@ import time
 import threading
 import numpy as np
 import os
-import math
-from collections import deque
-from flask import Flask, Response, render_template_string, jsonify
+from flask import Flask, Response, render_template_string, jsonify, request, send_from_directory
 from flask_cors import CORS
+import json
 import logging
+import sqlite3
+import argparse
+import multiprocessing
 
-# RPi.GPIO 임포트 (라즈베리파이에서만 작동)
-try:
-    import RPi.GPIO as GPIO
-    GPIO_AVAILABLE = True
-except ImportError:
-    print("RPi.GPIO를 사용할 수 없다. 시뮬레이션 모드로 실행한다.")
-    GPIO_AVAILABLE = False
+from frame_pipeline import FramePipeline
+from frame_ring import SharedFrameRing
+from frame_source import open_frame_source, parse_source
+from frame_broadcaster import FrameBroadcaster, DEFAULT_PROFILE, mjpeg_stream, parse_stream_fps
+from event_hub import EventHub, sse_stream, diff_warnings
+from status_snapshot import SnapshotStore, StatusSmoother
+from history_store import HistoryStore, RESOLUTIONS, LOT
+from session_ledger import SessionLedger
+from event_recorder import EventRecorder
+from hardware_worker import HardwareWorker, SimulatedBackend, create_backend, GPIO_AVAILABLE
+from sensor_fusion import OccupancyFusion
+from camera_manager import CameraManager
+from site_layout import LayoutWatcher, PreparedLayout, LAYOUT_PATH
 
 # 로깅 설정
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# 점유 이력 DB 파일 (스크립트와 같은 폴더)
+HISTORY_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parking_history.db')
+# 주차 세션 장부 (덧붙이기 전용 로그)
+SESSION_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parking_sessions.log')
+# 경고 전후 녹화 클립 폴더
+CLIP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'clips')
+
 app = Flask(__name__)
 # CORS 설정 - 모든 origin에서 접근 허용
 CORS(app, resources={
@@ -39,85 +54,109 @@ CORS(app, resources={
         "origins": "*",
         "methods": ["GET", "OPTIONS"],
         "allow_headers": ["Content-Type"]
+    },
+    r"/sensor/*": {
+        "origins": "*",
+        "methods": ["GET", "OPTIONS"],
+        "allow_headers": ["Content-Type"]
+    },
+    r"/cameras/*": {
+        "origins": "*",
+        "methods": ["GET", "OPTIONS"],
+        "allow_headers": ["Content-Type"]
+    },
+    r"/events": {
+        "origins": "*",
+        "methods": ["GET", "OPTIONS"],
+        "allow_headers": ["Content-Type", "Last-Event-ID"]
     }
 })
 
 class ParkingTrackerWebServer:
-    def __init__(self, camera_index=0, resolution=(1280, 720), fps=20):
+    def __init__(self, camera_index=0, resolution=(1280, 720), fps=20, camera_id=None, enable_io=True,
+                 layout_path=LAYOUT_PATH, layout_overrides=None):
+        """enable_io=False면 GPIO/이력/세션/녹화 없이 탐지만 한다 (다중 카메라 모드의 카메라 프로세스용)
+
+        layout_overrides의 배치 항목은 배치 파일 내용을 덮어쓴다 (카메라별 배치).
+        """
+        self.camera_id = camera_id
         self.camera_index = camera_index
         self.resolution = resolution
         self.fps = fps
         self.cap = None
-        self.frame = None
-        self.processed_frame = None
+        # 캡처가 직접 써 넣는 미리 할당된 프레임 슬롯들 - 탐지/주석/인코딩 단계가 복사 없이 같은 버퍼를 쓴다
+        # (카메라 프로세스에서는 부모가 만든 링을 넘겨받는다)
+        self.frame_ring = None
+        self.frame_ring_slots = 10
+        self.frame_ring_owned = False
+        self.frame_sequence = 0  # 공개된 처리 프레임의 단조 증가 번호
+        self.broadcaster = FrameBroadcaster(jpeg_quality=85)
+        self.event_hub = EventHub()  # /events SSE 구독자에게 보낼 구역 상태 변경/경고 변화
+        self.active_warnings = {}  # 경고 키 → 현재 경고 (프레임 간 경고 변화 비교용)
+        self.snapshots = SnapshotStore()  # 프레임마다 미리 직렬화한 /status, /api/* 응답
+        self.status_smoother = StatusSmoother()  # /status의 차량 위치/속도/경고 거리 떨림 제거 (ETag 유지)
+        
+        self.result_sink = None  # 주석이 끝난 프레임을 받을 함수 (프레임 링 참조, 프레임 번호) - 카메라 프로세스용
+        
+        # 점유 이력 저장소 (상태 변경 + history_sample_interval초마다 점유 샘플)
+        self.history = None
+        self.history_sample_interval = 1.0
+        self.last_history_sample = 0
+        if enable_io:
+            try:
+                self.history = HistoryStore(HISTORY_DB_PATH)
+            except sqlite3.Error as e:
+                logger.error(f"이력 저장소를 열 수 없다: {e}")
+        
+        # 차량별 주차 세션 (점유 확정 시 시작, 해제 시 종료)
+        self.sessions = None
+        if enable_io:
+            try:
+                self.sessions = SessionLedger(SESSION_LOG_PATH)
+            except OSError as e:
+                logger.error(f"세션 장부를 열 수 없다: {e}")
+        
+        # 충돌/차단기 경고 전후 녹화 (medium 프로파일 JPEG를 링 버퍼에 보관, 저장은 백그라운드)
+        self.recorder = None
+        self.recording_profile = 'medium'
+        if enable_io:
+            try:
+                self.recorder = EventRecorder(CLIP_DIR)
+            except OSError as e:
+                logger.error(f"녹화 폴더를 만들 수 없다: {e}")
         self.last_frame_time = 0
         self.lock = threading.Lock()
         self.running = False
-        
-        # GPIO 설정 (라즈베리파이에서만)
-        if GPIO_AVAILABLE:
-            self.LED_PIN = 18
-            self.BUZZER_PIN = 19
-            self.TRIG_PIN = 24
-            self.ECHO_PIN = 23
-            
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self.LED_PIN, GPIO.OUT)
-            GPIO.setup(self.BUZZER_PIN, GPIO.OUT)
-            GPIO.setup(self.TRIG_PIN, GPIO.OUT)
-            GPIO.setup(self.ECHO_PIN, GPIO.IN)
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            GPIO.output(self.BUZZER_PIN, GPIO.LOW)
-            GPIO.output(self.TRIG_PIN, GPIO.LOW)
-        
-        # 주차장 영역 좌표 (1280x720 해상도에 맞게 조정)
-        self.parking_area = [
-            (205, 17),   # 좌상단
-            (997, 13),   # 우상단
-            (1031, 695), # 우하단
-            (209, 717)   # 좌하단
-        ]
-        
-        # 센서 위치
-        self.ultrasonic_positions = [
-            (237, 671),  # 1번 초음파
-            (267, 60),   # 2번 초음파  
-            (1025, 109), # 3번 초음파
-            (940, 54)    # 4번 초음파
-        ]
-        
-        self.barrier_positions = [
-            (1062, 654), # 1번 차단기
-            (959, 386)   # 2번 차단기
-        ]
-        
-        # 색상 범위 설정 (HSV)
-        self.color_ranges = {
-            'blue': ([100, 135, 190], [118, 255, 255]),
-            'yellow': ([25, 50, 50], [40, 255, 255]),
-            'white': ([0, 0, 180], [180, 25, 255])
-        }
-        
-        # 주차구역 8개 정의
-        self.parking_spots = [
-            {'id': 1, 'bbox': (366, 125, 114, 126), 'center': (423, 188), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 2, 'bbox': (480, 125, 141, 126), 'center': (550, 188), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 3, 'bbox': (621, 125, 112, 126), 'center': (677, 188), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 4, 'bbox': (733, 125, 118, 126), 'center': (792, 188), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 5, 'bbox': (372, 389, 121, 148), 'center': (432, 463), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 6, 'bbox': (493, 389, 125, 148), 'center': (555, 463), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 7, 'bbox': (618, 389, 115, 148), 'center': (675, 463), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None},
-            {'id': 8, 'bbox': (733, 389, 126, 148), 'center': (796, 463), 'occupied': False, 'vehicle_id': None, 'vehicle_color': None}
-        ]
-        
-        # 탐지된 차량 추적
-        self.tracked_cars = deque(maxlen=15)
-        self.next_vehicle_id = 1
-        self.previous_vehicles = []
-        
-        # 경고 설정
-        self.warning_distance = 80
-        self.vehicle_collision_distance = 100
+        self.pipeline = None
+        
+        # GPIO 설정 - LED/부저/초음파 센서는 전용 작업 스레드가 처리 (라즈베리파이가 아니면 시뮬레이션)
+        self.LED_PIN = 18
+        self.BUZZER_PIN = 19
+        self.TRIG_PIN = 24
+        self.ECHO_PIN = 23
+        # 초음파 센서 (TRIG, ECHO) 쌍 목록 - 센서를 더 연결하면 여기에 추가 (목록 순서 = /sensor/<번호>)
+        self.ULTRASONIC_SENSORS = [(self.TRIG_PIN, self.ECHO_PIN)] if enable_io else []
+        self.hardware = HardwareWorker(create_backend() if enable_io else SimulatedBackend(),
+                                       led_pin=self.LED_PIN, buzzer_pin=self.BUZZER_PIN,
+                                       sensors=self.ULTRASONIC_SENSORS, poll_interval=0.5)
+        
+        # 카메라 + 초음파 점유 신뢰도 (센서 위치에서 engine.sensor_coverage_px 이내 구역을 그 센서가 담당)
+        # 모든 구역이 안정적이면 탐지를 최대 4프레임에 한 번만 실행 (센서 거리가 바뀌면 바로 복귀)
+        self.fusion = OccupancyFusion(occupied_cm=50.0, idle_interval=4)
+        self.last_detection = None  # 탐지를 생략한 프레임에서 재사용할 (차량, 경고)
+        
+        # 주차장 배치 (영역, 센서/차단기 위치, 색상 범위, 주차구역) - 배치 파일에서 읽고 파일이 바뀌면 다시 읽는다
+        self.layout_watcher = LayoutWatcher(layout_path, self.on_layout_change, overrides=layout_overrides)
+        
+        # 탐지/추적/점유/경고 계산과 결과 그리기 (GUI 추적기와 같은 엔진)
+        # 엔진 모듈(추적기/충돌 판정 등)은 추적기를 만들 때 처음 읽는다 (이 모듈을 임포트만 할 때는 읽지 않음)
+        from detection_engine import DetectionEngine
+        self.engine = DetectionEngine(self.layout_watcher.load(), fps=self.fps)
+        # 감시 스레드가 새 배치로 마스크/래스터 등을 미리 만들어 두면 탐지 단계가 프레임 사이에서 한 번에 교체
+        self.pending_layout = None
+        self.applied_layout = None
+        
+        # 경고 LED/부저 쿨다운
         self.last_warning_time = 0
         self.warning_cooldown = 1.5
         
@@ -131,7 +170,8 @@ class ParkingTrackerWebServer:
     def initialize_camera(self):
         """카메라 초기화"""
         try:
-            self.cap = cv2.VideoCapture(self.camera_index)
+            # 카메라 번호면 카메라, 경로면 녹화 영상/이미지 폴더 재생 (원래 속도, 끝나면 처음부터 반복)
+            self.cap = open_frame_source(self.camera_index, loop=True)
             
             if not self.cap.isOpened():
                 logger.error(f"카메라 {self.camera_index}를 열 수 없다")
@@ -156,501 +196,367 @@ class ParkingTrackerWebServer:
             return False
         
         self.running = True
-        processing_thread = threading.Thread(target=self._process_frames)
-        processing_thread.daemon = True
-        processing_thread.start()
+        
+        if self.frame_ring is None:
+            width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)) or self.resolution[0]
+            height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)) or self.resolution[1]
+            self.frame_ring = SharedFrameRing((height, width, 3), slots=self.frame_ring_slots)
+            self.frame_ring_owned = True
+        
+        # 캡처 → 탐지/추적 → 주석 → 인코딩 단계를 각각 별도 스레드로 실행
+        # 단계 사이에는 최신 프레임 하나만 보관하므로 느린 단계가 있으면 중간 프레임은 버려진다
+        # 캡처 간격은 처리 시간을 포함해 1/fps로 맞춘다 (처리 시간 위에 sleep을 더하지 않음)
+        # 버려지거나 끝난 프레임은 _release_packet이 링 슬롯 참조를 놓는다
+        self.pipeline = FramePipeline(release=self._release_packet)
+        self.pipeline.add_stage('capture', self._capture_stage, interval=1.0 / self.fps)
+        self.pipeline.add_stage('detect', self._detect_stage)
+        self.pipeline.add_stage('annotate', self._annotate_stage)
+        self.pipeline.add_stage('encode', self._encode_stage)
+        self.pipeline.start()
+        self.layout_watcher.start()
         
         return True
     
-    def _process_frames(self):
-        """프레임 처리 스레드"""
-        while self.running and self.cap is not None:
-            try:
-                ret, frame = self.cap.read()
-                
-                if not ret:
-                    logger.warning("프레임을 읽을 수 없다")
-                    continue
-                
-                self.frame_count += 1
-                
-                # 차량 탐지 및 분석
-                detected_cars = self.detect_cars_by_color(frame)
-                self.check_spot_occupancy(detected_cars)
-                
-                # 경고 확인
-                sensor_warnings = self.calculate_distance_to_sensors(detected_cars)
-                collision_warnings = self.check_vehicle_collisions(detected_cars)
-                all_warnings = sensor_warnings + collision_warnings
-                
-                # 처리된 프레임 생성
-                processed_frame = self.draw_interface(frame.copy(), detected_cars, all_warnings)
-                
-                # 경고 처리
-                if GPIO_AVAILABLE:
-                    self.handle_warning(all_warnings)
-                
-                # 타임스탬프 추가
-                timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-                cv2.putText(processed_frame, timestamp, (10, processed_frame.shape[0] - 30), 
-                           cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-                
-                with self.lock:
-                    self.frame = frame.copy()
-                    self.processed_frame = processed_frame
-                    self.detected_vehicles = detected_cars
-                    self.current_warnings = all_warnings
-                    self.last_frame_time = time.time()
-                
-                # FPS 제어
-                time.sleep(1.0 / self.fps)
-                
-            except Exception as e:
-                logger.error(f"프레임 처리 에러: {e}")
-                break
-    
-    def detect_cars_by_color(self, frame):
-        """색상 기반 차량 탐지"""
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-        detected_cars = []
-        
-        # 주차장 영역 마스크 생성
-        if len(self.parking_area) == 4:
-            mask_polygon = np.zeros(hsv.shape[:2], dtype=np.uint8)
-            pts = np.array(self.parking_area, np.int32)
-            cv2.fillPoly(mask_polygon, [pts], 255)
-        else:
-            mask_polygon = np.ones(hsv.shape[:2], dtype=np.uint8) * 255
+    def _capture_stage(self):
+        """캡처 단계 - 프레임 링의 빈 슬롯에 카메라 프레임을 바로 읽어 넣기"""
+        if not self.running or self.cap is None:
+            self.pipeline.stop()
+            return None
         
-        for color_name, (lower, upper) in self.color_ranges.items():
-            lower = np.array(lower)
-            upper = np.array(upper)
-            
-            mask = cv2.inRange(hsv, lower, upper)
-            mask = cv2.bitwise_and(mask, mask_polygon)
-            
-            # 노이즈 제거
-            kernel = np.ones((5,5), np.uint8)  
-            mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
-            kernel = np.ones((8,8), np.uint8)
-            mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
-            
-            # 컨투어 찾기
-            contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours:
-                area = cv2.contourArea(contour)
-                
-                if area < 1200:
-                    continue
-                    
-                x, y, w, h = cv2.boundingRect(contour)
-                aspect_ratio = w / float(h)
-                
-                if w < 50 or h < 30 or w > 300 or h > 200:
-                    continue
-                
-                if aspect_ratio < 0.3 or aspect_ratio > 4.0:
-                    continue
-                
-                rect_area = w * h
-                extent = area / rect_area
-                
-                if extent < 0.3:
-                    continue
-                
-                perimeter = cv2.arcLength(contour, True)
-                if perimeter < 60:
-                    continue
-                
-                center_x = x + w // 2
-                center_y = y + h // 2
-                
-                if len(self.parking_area) == 4:
-                    if not self.point_in_polygon((center_x, center_y), self.parking_area):
-                        continue
-                
-                detected_cars.append({
-                    'color': color_name,
-                    'center': (center_x, center_y),
-                    'bbox': (x, y, w, h),
-                    'area': area,
-                    'aspect_ratio': aspect_ratio,
-                    'extent': extent,
-                    'perimeter': perimeter
-                })
-        
-        # 차량 추적 및 ID 할당
-        detected_cars = self.track_vehicles(detected_cars)
-        
-        return detected_cars
-    
-    def track_vehicles(self, current_vehicles):
-        """차량 추적 및 ID 할당"""
-        tracking_distance = 100
-        tracked = []
-        
-        for vehicle in current_vehicles:
-            best_match = None
-            min_distance = float('inf')
-            
-            for prev_vehicle in self.previous_vehicles:
-                if vehicle['color'] == prev_vehicle['color']:
-                    dist = self.calculate_distance(vehicle['center'], prev_vehicle['center'])
-                    if dist < tracking_distance and dist < min_distance:
-                        min_distance = dist
-                        best_match = prev_vehicle
-            
-            if best_match:
-                vehicle['id'] = best_match['id']
-                vehicle['track_history'] = best_match.get('track_history', []) + [vehicle['center']]
-                if len(vehicle['track_history']) > 10:
-                    vehicle['track_history'] = vehicle['track_history'][-10:]
+        ref = self.frame_ring.acquire()
+        if ref is None:
+            # 모든 슬롯을 아직 누군가 보고 있음 - 이번 프레임은 건너뛴다 (frame_ring.exhausted로 집계)
+            return None
+        
+        ret, frame = self.cap.read(ref.array)
+        
+        if not ret:
+            ref.release()
+            logger.warning("프레임을 읽을 수 없다")
+            return None
+        if not np.shares_memory(frame, ref.array):
+            # 백엔드가 버퍼를 새로 만들었거나 카메라 해상도가 슬롯과 다르면 슬롯으로 옮긴다
+            if frame.shape == ref.array.shape:
+                ref.array[...] = frame
             else:
-                vehicle['id'] = self.next_vehicle_id
-                vehicle['track_history'] = [vehicle['center']]
-                self.next_vehicle_id += 1
-            
-            tracked.append(vehicle)
+                cv2.resize(frame, (ref.array.shape[1], ref.array.shape[0]), dst=ref.array)
+        
+        with self.lock:
+            self.frame_count += 1
+            frame_id = self.frame_count
         
-        self.previous_vehicles = tracked.copy()
-        return tracked
+        return {'frame_id': frame_id, 'frame': ref.array, 'frame_ref': ref}
     
-    def check_spot_occupancy(self, vehicles):
-        """주차 구역 점유 상태 확인"""
-        for spot in self.parking_spots:
-            spot['occupied'] = False
-            spot['vehicle_id'] = None
-            spot['vehicle_color'] = None
-        
-        for vehicle in vehicles:
-            vehicle_center = vehicle['center']
-            
-            for spot in self.parking_spots:
-                spot_x, spot_y, spot_w, spot_h = spot['bbox']
-                
-                if (spot_x <= vehicle_center[0] <= spot_x + spot_w and
-                    spot_y <= vehicle_center[1] <= spot_y + spot_h):
-                    spot['occupied'] = True
-                    spot['vehicle_id'] = vehicle.get('id', 'unknown')
-                    spot['vehicle_color'] = vehicle.get('color', 'unknown')
-                    break
+    @staticmethod
+    def _release_packet(packet):
+        """파이프라인에서 빠져나간 프레임의 링 슬롯 참조 놓기"""
+        ref = packet.get('frame_ref')
+        if ref is not None:
+            ref.release()
     
-    def calculate_distance_to_sensors(self, vehicles):
-        """차량과 센서들 간의 거리 계산"""
-        warnings = []
-        
-        for vehicle in vehicles:
-            vehicle_pos = vehicle['center']
-            vehicle_id = vehicle.get('id', 'unknown')
-            vehicle_color = vehicle.get('color', 'unknown')
-            
-            for i, sensor_pos in enumerate(self.ultrasonic_positions):
-                distance = self.calculate_distance(vehicle_pos, sensor_pos)
-                
-                if distance < self.warning_distance:
-                    warnings.append({
-                        'type': 'ultrasonic',
-                        'sensor_id': i + 1,
-                        'vehicle_id': vehicle_id,
-                        'vehicle_color': vehicle_color,
-                        'distance': distance,
-                        'vehicle_pos': vehicle_pos,
-                        'sensor_pos': sensor_pos
-                    })
-            
-            for i, barrier_pos in enumerate(self.barrier_positions):
-                distance = self.calculate_distance(vehicle_pos, barrier_pos)
-                
-                if distance < self.warning_distance:
-                    warnings.append({
-                        'type': 'barrier',
-                        'barrier_id': i + 1,
-                        'vehicle_id': vehicle_id,
-                        'vehicle_color': vehicle_color,
-                        'distance': distance,
-                        'vehicle_pos': vehicle_pos,
-                        'sensor_pos': barrier_pos
-                    })
-        return warnings
+    def on_layout_change(self, layout):
+        """배치 파일이 바뀜 (감시 스레드) - 파생 데이터를 여기서 만들어 두고 교체는 탐지 단계에 맡긴다"""
+        self.pending_layout = PreparedLayout(layout, self.engine.frame_shape, self.engine.sensor_coverage_px)
     
-    def check_vehicle_collisions(self, vehicles):
-        """차량 간 충돌 경고 확인"""
-        collision_warnings = []
-        
-        for i, vehicle1 in enumerate(vehicles):
-            for j, vehicle2 in enumerate(vehicles):
-                if i >= j:
-                    continue
-                
-                distance = self.calculate_distance(vehicle1['center'], vehicle2['center'])
-                
-                if distance < self.vehicle_collision_distance:
-                    collision_warnings.append({
-                        'type': 'collision',
-                        'vehicle1_id': vehicle1.get('id', 'unknown'),
-                        'vehicle1_color': vehicle1.get('color', 'unknown'),
-                        'vehicle1_pos': vehicle1['center'],
-                        'vehicle2_id': vehicle2.get('id', 'unknown'),
-                        'vehicle2_color': vehicle2.get('color', 'unknown'),
-                        'vehicle2_pos': vehicle2['center'],
-                        'distance': distance
-                    })
-        
-        return collision_warnings
+    def apply_pending_layout(self):
+        """새 배치가 준비되어 있으면 교체 (탐지 단계에서 프레임 사이에 호출)"""
+        prepared = self.pending_layout
+        if prepared is None or prepared is self.applied_layout:
+            return False
+        with self.lock:
+            prepared.apply(self.engine)
+        self.applied_layout = prepared
+        # 이전 배치 기준의 탐지 결과는 재사용하지 않는다
+        self.last_detection = None
+        self.fusion.idle = False
+        return True
+    
+    def _detect_stage(self, packet):
+        """탐지/추적 단계 - 차량 탐지, 주차구역 점유, 경고 계산"""
+        engine = self.engine
+        if self.apply_pending_layout():
+            logger.info(f"새 배치 적용: 주차구역 {len(engine.parking_spots)}개")
+        readings = self.hardware.get_readings()
+        if self.last_detection is not None and self.fusion.skip_detection(readings):
+            # 모든 구역이 높은 신뢰도로 안정 + 움직이는 차량/경고 없음 → 직전 탐지 결과 재사용
+            packet['detected_cars'], packet['warnings'] = self.last_detection
+            packet['parking_spots'] = [dict(spot) for spot in engine.parking_spots]
+            packet['spot_event_seq'] = engine.spot_states.last_seq
+            packet['detection_skipped'] = True
+            return packet
+        
+        results = engine.process(packet['frame'])
+        detected_cars = results['vehicles']
+        for event in results['spot_events']:
+            logger.info(f"주차구역 {event['spot_id']}: {event['old_state']} → {event['new_state']} "
+                        f"(차량 ID: {event['vehicle_id']})")
+            self.event_hub.publish('spot', event)
+            if self.history is not None:
+                self.history.record_transition(event)
+            if self.sessions is not None:
+                self.sessions.apply_event(event)
+        self.record_history_sample(len(detected_cars))
+        self.fusion.update(engine.parking_spots, readings, engine.get_sensor_coverage(), time.time())
+        
+        # 경고 확인 (센서/차단기 + 충돌)
+        all_warnings = results['warnings']
+        self.publish_warning_changes(all_warnings)
+        if self.recorder is not None:
+            # 새로 생긴 충돌/차단기 경고만 녹화 (계속 유지되는 경고는 다시 녹화하지 않음)
+            self.recorder.trigger_warnings(all_warnings)
+        self.fusion.note_detection(detected_cars, all_warnings, readings)
+        self.last_detection = (detected_cars, all_warnings)
+        
+        packet['detected_cars'] = detected_cars
+        packet['warnings'] = all_warnings
+        # 다음 프레임 탐지가 진행되는 동안 그리기 단계가 볼 점유 상태 사본
+        packet['parking_spots'] = [dict(spot) for spot in engine.parking_spots]
+        packet['spot_event_seq'] = engine.spot_states.last_seq
+        return packet
+    
+    def record_history_sample(self, vehicle_count):
+        """history_sample_interval초마다 점유 상태 샘플을 이력 저장소 큐에 넣음"""
+        now = time.time()
+        if self.history is None or now - self.last_history_sample < self.history_sample_interval:
+            return
+        self.last_history_sample = now
+        self.history.record_sample(now, self.engine.parking_spots, vehicle_count)
+    
+    def publish_warning_changes(self, warnings):
+        """직전 프레임과 비교해서 새로 생기거나 사라진 경고가 있을 때만 'warnings' 이벤트 발행"""
+        current, added, removed = diff_warnings(self.active_warnings, warnings)
+        self.active_warnings = current
+        if added or removed:
+            self.event_hub.publish('warnings', {
+                'added': added,
+                'removed': removed,
+                'active': len(current)
+            })
+    
+    def publish_snapshots(self, packet):
+        """이번 프레임 상태를 한 번만 직렬화해서 공개 (API 요청은 참조만 읽음)
+
+        패킷에 실린 값만 쓰므로 처리 스레드 잠금을 잡지 않는다.
+        """
+        self.snapshots.publish('status', self.build_status(packet['detected_cars'], packet['warnings'],
+                                                           packet['parking_spots'], packet['spot_event_seq']))
+        self.snapshots.publish('parking_spots', packet['parking_spots'])
+        self.snapshots.publish('warnings', packet['warnings'])
     
-    def calculate_distance(self, pos1, pos2):
-        """두 점 사이의 유클리드 거리 계산"""
-        return math.sqrt((pos1[0] - pos2[0])**2 + (pos1[1] - pos2[1])**2)
+    def is_active(self):
+        """최근 5초 안에 처리된 프레임이 있는지"""
+        return self.last_frame_time > 0 and time.time() - self.last_frame_time < 5
     
-    def point_in_polygon(self, point, polygon):
-        """점이 다각형 내부에 있는지 확인"""
-        x, y = point
-        n = len(polygon)
-        inside = False
-        
-        p1x, p1y = polygon[0]
-        for i in range(1, n + 1):
-            p2x, p2y = polygon[i % n]
-            if y > min(p1y, p2y):
-                if y <= max(p1y, p2y):
-                    if x <= max(p1x, p2x):
-                        if p1y != p2y:
-                            xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
-                        if p1x == p2x or x <= xinters:
-                            inside = not inside
-            p1x, p1y = p2x, p2y
-        
-        return inside
+    def get_event_snapshot(self):
+        """SSE 첫 연결 시 보내는 현재 상태 (주차구역 + 현재 경고)"""
+        return {
+            'parking_status': [{
+                'id': spot['id'],
+                'occupied': spot['occupied'],
+                'vehicle_id': spot['vehicle_id'],
+                'vehicle_color': spot['vehicle_color'],
+                'since': spot.get('since')
+            } for spot in list(self.engine.parking_spots)],
+            'warnings': [dict(warning, key=key) for key, warning in list(self.active_warnings.items())],
+            'spot_event_seq': self.engine.spot_states.last_seq
+        }
+    
+    def _annotate_stage(self, packet):
+        """주석 단계 - 결과 그리기, 경고 처리, 결과 공개"""
+        detected_cars = packet['detected_cars']
+        all_warnings = packet['warnings']
+        
+        # 처리된 프레임 생성 - 탐지가 끝난 캡처 슬롯 위에 바로 그린다 (원본은 더 쓰지 않음)
+        processed_frame = self.draw_interface(packet['frame'], detected_cars, all_warnings,
+                                              parking_spots=packet['parking_spots'],
+                                              frame_id=packet['frame_id'])
+        
+        # 경고 처리 (하드웨어 작업 스레드에 명령만 전달)
+        self.handle_warning(all_warnings)
+        
+        # 타임스탬프 추가
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        cv2.putText(processed_frame, timestamp, (10, processed_frame.shape[0] - 30), 
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+        
+        with self.lock:
+            self.frame_sequence = packet['frame_id']
+            self.detected_vehicles = detected_cars
+            self.current_warnings = all_warnings
+            self.last_frame_time = time.time()
+        
+        self.publish_snapshots(packet)
+        
+        packet['processed_frame'] = processed_frame
+        return packet
+    
+    def _encode_stage(self, packet):
+        """인코딩 단계 - 처리된 프레임을 공개하고 시청자가 있는 프로파일만 JPEG로 한 번씩 인코딩"""
+        self.broadcaster.publish(packet['processed_frame'], sequence=packet['frame_id'],
+                                 ref=packet['frame_ref'].retain())
+        for profile in self.broadcaster.active_profiles():
+            self.broadcaster.get_jpeg(profile)
+        
+        # 녹화 링 버퍼 - 같은 프로파일 시청자가 있으면 그 인코딩 결과를 그대로 공유
+        if self.recorder is not None and self.recorder.wants_frame():
+            _, jpeg = self.broadcaster.get_jpeg(self.recording_profile)
+            if jpeg is not None:
+                self.recorder.add_jpeg(jpeg)
+        
+        if self.result_sink is not None:
+            self.result_sink(packet['frame_ref'], packet['frame_id'])
+        return None
     
     def handle_warning(self, all_warnings):
-        """경고 처리 (GPIO 사용)"""
-        if not GPIO_AVAILABLE:
-            return
-            
+        """경고 처리 - LED/부저 켜기 (0.8초 후 작업 스레드가 끔)"""
         current_time = time.time()
         
         if all_warnings and (current_time - self.last_warning_time) > self.warning_cooldown:
-            GPIO.output(self.LED_PIN, GPIO.HIGH)
-            GPIO.output(self.BUZZER_PIN, GPIO.HIGH)
+            self.hardware.alert()
             self.last_warning_time = current_time
-            
-            # LED/부저를 0.8초 후 끄기
-            threading.Timer(0.8, self.turn_off_warnings).start()
         
         elif not all_warnings:
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            GPIO.output(self.BUZZER_PIN, GPIO.LOW)
+            self.hardware.clear()
     
     def turn_off_warnings(self):
         """경고 LED/부저 끄기"""
-        if GPIO_AVAILABLE:
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            GPIO.output(self.BUZZER_PIN, GPIO.LOW)
+        self.hardware.clear()
     
-    def draw_interface(self, frame, detected_cars, all_warnings):
-        """인터페이스 그리기"""
-        # 주차장 영역 그리기
-        if len(self.parking_area) == 4:
-            pts = np.array(self.parking_area, np.int32)
-            pts = pts.reshape((-1, 1, 2))
-            cv2.polylines(frame, [pts], True, (255, 255, 0), 3)
-            
-            overlay = frame.copy()
-            cv2.fillPoly(overlay, [pts], (255, 255, 0))
-            cv2.addWeighted(overlay, 0.1, frame, 0.9, 0, frame)
-        
-        # 주차구역 그리기
-        for spot in self.parking_spots:
-            x, y, w, h = spot['bbox']
-            color = (0, 255, 0) if not spot['occupied'] else (0, 0, 255)
-            thickness = 2 if not spot['occupied'] else 4
-            
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, thickness)
-            
-            label_pos = (x + 5, y + 20)
-            cv2.putText(frame, f"P{spot['id']}", label_pos, 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            
-            if spot['occupied']:
-                status_text = f"Occupied"
-                if spot['vehicle_color']:
-                    status_text += f" ({spot['vehicle_color']})"
-                cv2.putText(frame, status_text, (x + 5, y + h - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-        
-        # 센서 위치 그리기
-        for i, sensor_pos in enumerate(self.ultrasonic_positions):
-            cv2.circle(frame, sensor_pos, 12, (0, 255, 255), 3)
-            cv2.putText(frame, f"U{i+1}", (sensor_pos[0] - 12, sensor_pos[1] + 5), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1)
-        
-        for i, barrier_pos in enumerate(self.barrier_positions):
-            cv2.circle(frame, barrier_pos, 12, (255, 255, 0), 3)
-            cv2.putText(frame, f"B{i+1}", (barrier_pos[0] - 12, barrier_pos[1] + 5), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (255, 255, 0), 1)
-        
-        # 탐지된 차량 표시
-        for car in detected_cars:
-            center = car['center']
-            bbox = car['bbox']
-            color_name = car['color']
-            vehicle_id = car.get('id', '?')
-            
-            x, y, w, h = bbox
-            color_map = {
-                'blue': (255, 0, 0), 
-                'yellow': (0, 255, 255),
-                'white': (200, 200, 200)
-            }
-            color = color_map.get(color_name, (0, 255, 0))
-            
-            cv2.rectangle(frame, (x, y), (x + w, y + h), color, 3)
-            cv2.circle(frame, center, 8, color, -1)
-            
-            cv2.putText(frame, f"{color_name.upper()}", 
-                    (x, y - 35), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
-            cv2.putText(frame, f"ID:{vehicle_id}", 
-                    (x, y - 15), cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-            cv2.putText(frame, f"({center[0]}, {center[1]})", 
-                    (x, y + h + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
-            
-            # 추적 히스토리 그리기
-            if 'track_history' in car and len(car['track_history']) > 1:
-                history = car['track_history']
-                for i in range(1, len(history)):
-                    cv2.line(frame, history[i-1], history[i], color, 2)
-        
-        # 경고 상황 표시
-        for warning in all_warnings:
-            if warning['type'] != 'collision':
-                vehicle_pos = warning['vehicle_pos']
-                sensor_pos = warning['sensor_pos']
-                
-                cv2.line(frame, vehicle_pos, sensor_pos, (0, 0, 255), 4)
-                
-                mid_point = ((vehicle_pos[0] + sensor_pos[0])//2, 
-                            (vehicle_pos[1] + sensor_pos[1])//2)
-                cv2.putText(frame, f"{warning['distance']:.0f}px", mid_point, 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-        
-        # 상태 정보 패널
-        panel_height = 200
-        cv2.rectangle(frame, (5, 5), (500, panel_height), (0, 0, 0), -1)
-        cv2.rectangle(frame, (5, 5), (500, panel_height), (255, 255, 255), 2)
+    def draw_interface(self, frame, detected_cars, all_warnings, parking_spots=None, frame_id=None):
+        """인터페이스 그리기 (parking_spots/frame_id를 주면 해당 시점의 상태로 그림)"""
+        if parking_spots is None:
+            parking_spots = self.engine.parking_spots
+        if frame_id is None:
+            frame_id = self.frame_count
         
         # 색상별 차량 카운트
         blue_count = sum(1 for v in detected_cars if v['color'] == 'blue')
         yellow_count = sum(1 for v in detected_cars if v['color'] == 'yellow')
         white_count = sum(1 for v in detected_cars if v['color'] == 'white')
         
-        occupied_spots = sum(1 for spot in self.parking_spots if spot['occupied'])
+        occupied_spots = sum(1 for spot in parking_spots if spot['occupied'])
         
         info_lines = [
             "PARKING TRACKER WEB v1.0",
             f"Resolution: {self.resolution[0]}x{self.resolution[1]}",
             f"Total vehicles: {len(detected_cars)}",
             f"Blue: {blue_count}, Yellow: {yellow_count}, White: {white_count}",
-            f"Parking spots: {occupied_spots}/8 occupied",
+            f"Parking spots: {occupied_spots}/{len(parking_spots)} occupied",
             f"Active warnings: {len(all_warnings)}",
-            f"Frame: {self.frame_count}",
+            f"Frame: {frame_id}",
             f"FPS: {self.fps}"
         ]
         
-        for i, line in enumerate(info_lines):
-            color = (255, 255, 255) if i == 0 else (200, 200, 200)
-            cv2.putText(frame, line, (10, 25 + i * 22), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
-        
-        # 경고 상황이 있으면 화면 상단에 경고 메시지
-        if all_warnings:
-            cv2.rectangle(frame, (520, 5), (frame.shape[1] - 5, 60), (0, 0, 255), -1)
-            cv2.putText(frame, "⚠️  WARNING ZONE  ⚠️", (530, 35), 
-                    cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
-        
-        return frame
+        return self.engine.draw_interface(frame, detected_cars, all_warnings, parking_spots=parking_spots,
+                                          info_lines=info_lines, panel_size=(500, 200), line_height=22)
     
     def get_processed_frame(self):
-        """처리된 프레임 반환"""
-        with self.lock:
-            if self.processed_frame is not None:
-                return self.processed_frame.copy()
-            return None
+        """처리된 프레임 사본 반환"""
+        return self.broadcaster.copy_frame()
+    
+    def build_status(self, detected_cars, warnings, parking_spots, spot_event_seq, active=True, smoother=None):
+        """/status 본문 - 장면이 그대로면 프레임이 바뀌어도 같은 내용 (ETag가 유지되어 304를 받을 수 있음)
+
+        프레임 번호, 현재 시각, 단계별 통계처럼 매 프레임 바뀌는 값은 get_runtime_stats()에 있고,
+        경고 좌표/충돌 예상 시간 같은 세부 값은 /api/warnings에 있다.
+        """
+        # 색상별 차량 수 계산 (한 번 순회)
+        vehicle_counts = {'blue': 0, 'yellow': 0, 'white': 0}
+        for v in detected_cars:
+            if v['color'] in vehicle_counts:
+                vehicle_counts[v['color']] += 1
+        
+        smoother = smoother if smoother is not None else self.status_smoother
+        vehicles, warning_summaries = smoother.summarize(detected_cars, warnings)
+        
+        # 주차구역 점유 상태
+        parking_status = [{
+            'id': spot['id'],
+            'occupied': spot['occupied'],
+            'vehicle_id': spot['vehicle_id'],
+            'vehicle_color': spot['vehicle_color'],
+            'since': spot.get('since'),
+            'confidence': spot.get('confidence')  # 카메라 + 초음파 점유 신뢰도 (0~1)
+        } for spot in parking_spots]
+        
+        return {
+            'status': 'active' if active else 'inactive',
+            'resolution': f"{self.resolution[0]}x{self.resolution[1]}",
+            'fps': self.fps,
+            'total_vehicles': len(detected_cars),
+            'vehicle_counts': vehicle_counts,
+            # 위치/속도/거리는 떨림으로 본문이 바뀌지 않도록 일정 이상 바뀔 때만 갱신 (StatusSmoother)
+            'vehicles': vehicles,
+            'parking_status': parking_status,
+            'active_warnings': len(warnings),
+            'warnings': warning_summaries,
+            'gpio_available': GPIO_AVAILABLE,
+            'detection_idle': self.fusion.idle,
+            'layout': self.layout_watcher.get_status(),
+            'spot_event_seq': spot_event_seq
+        }
     
     def get_status(self):
-        """현재 상태 정보 반환"""
+        """현재 상태 정보 반환 (처리 중인 프레임이 없을 때 /status가 요청 시점에 만듦)"""
         with self.lock:
-            current_time = time.time()
-            is_active = (self.last_frame_time > 0 and 
-                        current_time - self.last_frame_time < 5)
-            
-            # 색상별 차량 수 계산
-            vehicle_counts = {
-                'blue': sum(1 for v in self.detected_vehicles if v['color'] == 'blue'),
-                'yellow': sum(1 for v in self.detected_vehicles if v['color'] == 'yellow'),
-                'white': sum(1 for v in self.detected_vehicles if v['color'] == 'white')
-            }
-            
-            # 주차구역 점유 상태
-            parking_status = []
-            for spot in self.parking_spots:
-                parking_status.append({
-                    'id': spot['id'],
-                    'occupied': spot['occupied'],
-                    'vehicle_id': spot['vehicle_id'],
-                    'vehicle_color': spot['vehicle_color']
-                })
-            
-            return {
-                'status': 'active' if is_active else 'inactive',
-                'resolution': f"{self.resolution[0]}x{self.resolution[1]}",
-                'fps': self.fps,
-                'frame_count': self.frame_count,
-                'total_vehicles': len(self.detected_vehicles),
-                'vehicle_counts': vehicle_counts,
-                'parking_status': parking_status,
-                'active_warnings': len(self.current_warnings),
-                'warnings': self.current_warnings,
-                'current_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-                'gpio_available': GPIO_AVAILABLE
-            }
+            detected_cars = self.detected_vehicles
+            warnings = self.current_warnings
+        # 요청 스레드에서 만들므로 처리 스레드의 StatusSmoother는 건드리지 않는다
+        return self.build_status(detected_cars, warnings, list(self.engine.parking_spots),
+                                 self.engine.spot_states.last_seq, active=self.is_active(),
+                                 smoother=StatusSmoother())
+    
+    def get_runtime_stats(self):
+        """매 프레임 바뀌는 카운터와 단계별 통계 (/status/runtime, 캐시하지 않음)"""
+        return {
+            'current_time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+            'frame_count': self.frame_count,
+            'frame_sequence': self.frame_sequence,
+            'hardware': self.hardware.get_stats(),
+            'detection_skipped': self.fusion.skipped_total,
+            'pipeline': self.pipeline.get_stats() if self.pipeline is not None else {},
+            'frame_ring': self.frame_ring.get_stats() if self.frame_ring is not None else {},
+            'stream_clients': self.broadcaster.subscribers,
+            'event_clients': self.event_hub.subscribers,
+            'stream_encodes': self.broadcaster.get_encode_counts()
+        }
     
     def stop(self):
         """처리 중지"""
         self.running = False
+        self.layout_watcher.stop()
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.broadcaster.close()
+        self.event_hub.close()
+        if self.history is not None:
+            self.history.close()
+        if self.sessions is not None:
+            self.sessions.close()
+        if self.recorder is not None:
+            self.recorder.close()
         if self.cap is not None:
             self.cap.release()
             self.cap = None
+        if self.frame_ring is not None and self.frame_ring_owned:
+            self.frame_ring.close()
+            self.frame_ring.unlink()
+            self.frame_ring = None
         
-        if GPIO_AVAILABLE:
-            GPIO.output(self.LED_PIN, GPIO.LOW)
-            GPIO.output(self.BUZZER_PIN, GPIO.LOW)
-            GPIO.cleanup()
+        self.hardware.close()  # LED/부저 끄고 GPIO 정리
         
         logger.info("주차장 추적 웹서버 중지")
 
-# 전역 추적기 객체
-parking_tracker = ParkingTrackerWebServer()
+# 전역 추적기 객체 (카메라 프로세스가 ParkingTrackerWebServer를 쓰려고 이 모듈을 임포트할 때는 만들지 않음)
+parking_tracker = ParkingTrackerWebServer() if multiprocessing.parent_process() is None else None
 
-def generate_frames():
-    """MJPEG 스트림용 프레임 생성기"""
-    while True:
-        frame = parking_tracker.get_processed_frame()
-        
-        if frame is None:
-            # 카메라가 없을 때 기본 이미지 생성
-            frame = create_no_camera_frame()
-        
-        # JPEG로 인코딩
-        ret, buffer = cv2.imencode('.jpg', frame, 
-                                 [cv2.IMWRITE_JPEG_QUALITY, 85])
-        
-        if ret:
-            frame_data = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_data + b'\r\n')
-        
-        time.sleep(0.033)  # ~30 FPS
+# 다중 카메라 관리자 (--cameras로 카메라 설정 파일을 주었을 때만 생성)
+camera_manager = None
+
+def generate_frames(fps=None, profile=DEFAULT_PROFILE, adaptive=False):
+    """MJPEG 스트림용 프레임 생성기 - 새 프레임만 전송 (fps를 주면 해당 속도로 제한)"""
+    return mjpeg_stream(parking_tracker.broadcaster, fps=fps, fallback_jpeg=get_no_camera_jpeg,
+                        profile=profile, adaptive=adaptive)
 
 def create_no_camera_frame():
     """카메라가 연결되지 않았을 때 표시할 프레임"""
@@ -663,6 +569,17 @@ def create_no_camera_frame():
     
     return frame
 
+_no_camera_jpeg = None
+
+def get_no_camera_jpeg():
+    """카메라 없음 프레임의 JPEG 바이트 (한 번만 인코딩)"""
+    global _no_camera_jpeg
+    if _no_camera_jpeg is None:
+        ret, buffer = cv2.imencode('.jpg', create_no_camera_frame(), 
+                                 [cv2.IMWRITE_JPEG_QUALITY, 85])
+        _no_camera_jpeg = buffer.tobytes()
+    return _no_camera_jpeg
+
 @app.route('/')
 def index():
     """메인 페이지"""
@@ -770,9 +687,9 @@ def index():
             }
             
             function updateStatus() {
-                fetch('/status')
-                    .then(response => response.json())
-                    .then(data => {
+                Promise.all([fetch('/status'), fetch('/status/runtime')])
+                    .then(responses => Promise.all(responses.map(response => response.json())))
+                    .then(([data, runtime]) => {
                         const statusDiv = document.getElementById('status-info');
                         
                         let html = '<div class="status">';
@@ -784,7 +701,7 @@ def index():
                                 <p>상태: ${data.status === 'active' ? '✅ 활성' : '❌ 비활성'}</p>
                                 <p>해상도: ${data.resolution}</p>
                                 <p>FPS: ${data.fps}</p>
-                                <p>프레임: ${data.frame_count}</p>
+                                <p>프레임: ${runtime.frame_count}</p>
                             </div>
                         `;
                         
@@ -820,7 +737,7 @@ def index():
                         `;
                         
                         html += '</div>';
-                        html += `<p style="text-align: center; margin-top: 15px;">최종 업데이트: ${data.current_time}</p>`;
+                        html += `<p style="text-align: center; margin-top: 15px;">최종 업데이트: ${runtime.current_time}</p>`;
                         
                         statusDiv.innerHTML = html;
                     })
@@ -841,31 +758,238 @@ def index():
 
 @app.route('/video_feed')
 def video_feed():
-    """비디오 스트리밍 엔드포인트"""
-    return Response(generate_frames(),
+    """비디오 스트리밍 엔드포인트
+
+    ?fps=5 - 전송 속도, ?profile=full|medium|thumb - 해상도 단계, ?adaptive=1 - 소켓이 밀리면 품질 자동 조절
+    """
+    fps = parse_stream_fps(request.args.get('fps'), max_fps=parking_tracker.fps)
+    profile = request.args.get('profile', DEFAULT_PROFILE)
+    adaptive = request.args.get('adaptive', '0').lower() in ('1', 'true', 'yes')
+    return Response(generate_frames(fps, profile, adaptive),
                    mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route('/events')
+def events():
+    """푸시 이벤트 스트림 (Server-Sent Events)
+
+    연결 직후 'snapshot'(주차구역 + 현재 경고)을 보내고, 이후에는 변화가 있을 때만
+    'spot'(구역 상태 변경)과 'warnings'(새로 생긴/사라진 경고) 이벤트를 보낸다.
+    재연결 시 Last-Event-ID 이후 이벤트가 남아 있으면 스냅샷 없이 이어서 보낸다.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    if last_event_id is None:
+        last_event_id = request.args.get('last_event_id', type=int)
+    stream = sse_stream(parking_tracker.event_hub, parking_tracker.get_event_snapshot,
+                        last_event_id=last_event_id)
+    return Response(stream, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def snapshot_response(name, build):
+    """미리 직렬화된 스냅샷 응답 (If-None-Match가 같으면 304)
+
+    처리 중인 프레임이 없으면 (카메라 정지 등) build()로 현재 상태를 만들어 응답한다.
+    """
+    snapshot = parking_tracker.snapshots.get(name)
+    if snapshot is None or not parking_tracker.is_active():
+        return jsonify(build())
+    
+    response = Response(snapshot.body, mimetype='application/json')
+    response.set_etag(snapshot.etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
 @app.route('/status')
 def get_status():
     """상태 API"""
-    return jsonify(parking_tracker.get_status())
+    return snapshot_response('status', parking_tracker.get_status)
+
+@app.route('/status/runtime')
+def get_runtime_status():
+    """매 프레임 바뀌는 처리 통계 API (프레임 수, 현재 시각, 파이프라인/프레임 링/하드웨어 통계)"""
+    return jsonify(parking_tracker.get_runtime_stats())
 
 @app.route('/api/parking_spots')
 def get_parking_spots():
     """주차구역 상세 정보 API"""
-    return jsonify(parking_tracker.parking_spots)
+    return snapshot_response('parking_spots', lambda: parking_tracker.engine.parking_spots)
+
+@app.route('/api/spot_events')
+def get_spot_events():
+    """주차구역 상태 변경 이벤트 API
+
+    ?since=<seq> - 그 이후 이벤트만 (마지막으로 받은 seq를 넘기면 새 변경만 받는다), ?limit=<개수>
+    """
+    since = request.args.get('since', default=0, type=int)
+    limit = request.args.get('limit', default=None, type=int)
+    events = parking_tracker.engine.spot_states.get_events(since=since, limit=limit)
+    return jsonify({
+        'events': events,
+        'last_seq': parking_tracker.engine.spot_states.last_seq
+    })
+
+# 조회 범위를 주지 않았을 때의 기본 기간 (초)
+HISTORY_DEFAULT_SPANS = {'minute': 3600, 'hour': 86400, 'day': 30 * 86400, 'raw': 86400}
+
+@app.route('/api/history')
+def get_history():
+    """점유 이력 API
+
+    ?from=<unix 초>&to=<unix 초> - 조회 구간 (기본: 단위별 최근 1시간/1일/30일)
+    ?resolution=minute|hour|day - 미리 집계된 구간별 평균/최대 점유 수, 진입/출차 수
+    ?resolution=raw - 상태 변경 원본 목록
+    ?spot=<구역 ID> - 특정 구역만 (기본: 주차장 전체)
+    """
+    if parking_tracker.history is None:
+        return jsonify({'error': '이력 저장소를 사용할 수 없다'}), 503
+    
+    resolution = request.args.get('resolution', 'hour')
+    if resolution not in RESOLUTIONS and resolution != 'raw':
+        return jsonify({'error': f"resolution은 {', '.join(RESOLUTIONS)}, raw 중 하나"}), 400
+    
+    end = request.args.get('to', default=time.time(), type=float)
+    start = request.args.get('from', default=end - HISTORY_DEFAULT_SPANS[resolution], type=float)
+    spot_id = request.args.get('spot', default=None, type=int)
+    
+    if resolution == 'raw':
+        data = parking_tracker.history.query_transitions(start, end, spot_id=spot_id)
+    else:
+        data = parking_tracker.history.query(start, end, resolution,
+                                             spot_id=spot_id if spot_id is not None else LOT)
+    
+    return jsonify({
+        'from': start,
+        'to': end,
+        'resolution': resolution,
+        'spot': spot_id,
+        'data': data
+    })
+
+@app.route('/api/sessions')
+def get_sessions():
+    """주차 세션(체류 시간) API
+
+    ?status=active|completed|all - 진행 중/종료/전체 (기본 all)
+    ?spot=<구역 ID>, ?vehicle=<차량 ID> - 구역/차량별 색인으로 조회
+    ?run=<실행 번호> - ?vehicle의 차량 ID를 찾을 서버 실행 (기본: 현재 실행, 차량 ID는 실행마다 1부터 다시 매겨짐)
+    ?from=<unix 초>&to=<unix 초> - 세션 시작 시각 범위, ?limit=<개수> (기본 100)
+    결과는 최신 순이며 각 세션에 duration(초, 진행 중이면 현재까지)이 포함된다
+    """
+    if parking_tracker.sessions is None:
+        return jsonify({'error': '세션 장부를 사용할 수 없다'}), 503
+    
+    status = request.args.get('status', 'all')
+    if status not in ('active', 'completed', 'all'):
+        return jsonify({'error': 'status는 active, completed, all 중 하나'}), 400
+    
+    sessions = parking_tracker.sessions.query(
+        spot_id=request.args.get('spot', default=None, type=int),
+        vehicle_id=request.args.get('vehicle', default=None, type=int),
+        start=request.args.get('from', default=None, type=float),
+        end=request.args.get('to', default=None, type=float),
+        status=status,
+        limit=request.args.get('limit', default=100, type=int),
+        run=request.args.get('run', default=None, type=int))
+    return jsonify({'sessions': sessions, 'run': parking_tracker.sessions.run})
+
+@app.route('/api/clips')
+def get_clips():
+    """경고 녹화 클립 목록 API (최신 순, ?limit=<개수>)"""
+    if parking_tracker.recorder is None:
+        return jsonify({'error': '녹화를 사용할 수 없다'}), 503
+    limit = request.args.get('limit', default=None, type=int)
+    return jsonify({
+        'clips': parking_tracker.recorder.list_clips(limit),
+        'recording': parking_tracker.recorder.is_recording()
+    })
+
+@app.route('/api/clips/<clip_id>')
+def get_clip_file(clip_id):
+    """경고 녹화 클립 영상 파일"""
+    clip = parking_tracker.recorder.get_clip(clip_id) if parking_tracker.recorder is not None else None
+    if clip is None:
+        return jsonify({'error': '클립을 찾을 수 없다'}), 404
+    return send_from_directory(CLIP_DIR, clip['file'])
+
+@app.route('/sensor/<int:index>/distance')
+def get_sensor_distance(index):
+    """초음파 센서의 필터링된 최신 거리 (작업 스레드가 주기적으로 측정한 값, 요청마다 측정하지 않음)"""
+    if index >= len(parking_tracker.ULTRASONIC_SENSORS):
+        return jsonify({'error': '센서를 찾을 수 없다'}), 404
+    reading = parking_tracker.hardware.get_reading(index)
+    if reading is None or reading['distance'] is None:
+        return jsonify(reading or {'sensor': index, 'distance': None, 'status': 'pending'}), 503
+    return jsonify(reading)
+
+@app.route('/api/sensors')
+def get_sensors():
+    """모든 초음파 센서의 최신 측정값"""
+    return jsonify({
+        'sensors': [reading or {'sensor': index, 'distance': None, 'status': 'pending'}
+                    for index, reading in enumerate(parking_tracker.hardware.get_readings())],
+        'hardware': parking_tracker.hardware.get_stats()
+    })
 
 @app.route('/api/warnings')
 def get_warnings():
     """현재 경고 상황 API"""
-    return jsonify(parking_tracker.current_warnings)
+    return snapshot_response('warnings', lambda: parking_tracker.current_warnings)
+
+@app.route('/cameras/status')
+def get_lot_status():
+    """주차장 전체 상태 (모든 카메라 합계 + 카메라별 요약)"""
+    if camera_manager is None:
+        return jsonify({'error': '다중 카메라 모드가 아니다 (--cameras로 시작)'}), 404
+    return jsonify(camera_manager.get_lot_status())
+
+@app.route('/cameras/<camera_id>/status')
+def get_camera_status(camera_id):
+    """카메라 하나의 상태 (카메라 프로세스가 직렬화한 JSON을 그대로 응답)"""
+    camera = camera_manager.get_camera(camera_id) if camera_manager is not None else None
+    if camera is None:
+        return jsonify({'error': '카메라를 찾을 수 없다'}), 404
+    if camera.status_body is None:
+        return jsonify(camera_manager.get_camera_status(camera_id)), 503
+    return Response(camera.status_body, mimetype='application/json')
+
+@app.route('/cameras/<camera_id>/video_feed')
+def camera_video_feed(camera_id):
+    """카메라 하나의 MJPEG 스트림 (/video_feed와 같은 fps/profile/adaptive 옵션)"""
+    camera = camera_manager.get_camera(camera_id) if camera_manager is not None else None
+    if camera is None:
+        return jsonify({'error': '카메라를 찾을 수 없다'}), 404
+    fps = parse_stream_fps(request.args.get('fps'), max_fps=camera.spec.get('fps', 20))
+    adaptive = request.args.get('adaptive', '0').lower() in ('1', 'true', 'yes')
+    return Response(mjpeg_stream(camera.broadcaster, fps=fps, fallback_jpeg=get_no_camera_jpeg,
+                                 profile=request.args.get('profile', DEFAULT_PROFILE), adaptive=adaptive),
+                    mimetype='multipart/x-mixed-replace; boundary=frame')
+
+def load_camera_specs(path):
+    """카메라 설정 파일 (JSON 목록) 읽기"""
+    with open(path, encoding='utf-8') as f:
+        specs = json.load(f)
+    if not isinstance(specs, list) or not all(isinstance(spec, dict) and 'id' in spec for spec in specs):
+        raise ValueError("카메라 설정은 'id'가 있는 객체들의 목록이어야 한다")
+    return specs
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='주차장 추적 웹서버')
+    parser.add_argument('--cameras', help='다중 카메라 설정 파일 (JSON). 주면 카메라마다 별도 프로세스에서 처리')
+    parser.add_argument('--source', help='카메라 번호 대신 재생할 녹화 영상 파일 또는 이미지 폴더 (단일 카메라 모드)')
+    args = parser.parse_args()
+    if args.source is not None:
+        parking_tracker.camera_index = parse_source(args.source)
+    
     try:
         logger.info("주차장 추적 웹서버 시작 중...")
         
+        if args.cameras:
+            # 다중 카메라 - 탐지는 카메라 프로세스들이, GPIO 경고는 이 프로세스의 추적기가 처리
+            camera_manager = CameraManager(load_camera_specs(args.cameras),
+                                           on_warnings=parking_tracker.handle_warning)
+            camera_manager.start()
+            logger.info(f"카메라 {len(camera_manager.cameras)}대 처리 프로세스 시작됨")
         # 추적 시스템 시작
-        if parking_tracker.start_processing():
+        elif parking_tracker.start_processing():
             logger.info("주차장 추적 시스템 시작됨")
         else:
             logger.warning("카메라를 찾을 수 없지만 서버는 시작함")
@@ -875,7 +999,9 @@ if __name__ == '__main__':
         
     except KeyboardInterrupt:
         logger.info("서버 종료 중...")
-        parking_tracker.stop()
     except Exception as e:
         logger.error(f"서버 에러: {e}")
-        parking_tracker.stop() 
\ No newline at end of file
+    finally:
+        if camera_manager is not None:
+            camera_manager.stop()
+        parking_tracker.stop()
\ No newline at end of file
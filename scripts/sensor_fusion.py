@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+카메라-초음파 점유 판정 결합
+초음파 센서마다 담당 주차구역을 정해 두고, 시간이 맞는 센서 측정값(cm)과 카메라 점유 상태를 합쳐
+구역별 점유 신뢰도(0~1)를 계산한다. 모든 구역이 높은 신뢰도로 안정되어 있으면
+차량 탐지를 몇 프레임에 한 번만 돌려도 되는지 판단한다
+"""
+
+import numpy as np
+
+from collision_check import SPEED_DEADBAND
+
+
+class SensorCoverage:
+    """초음파 센서 → 담당 주차구역 매핑 (센서/구역 배치가 바뀔 때만 다시 생성)
+
+    센서 위치(화면 좌표)에서 coverage_px 이내에 중심이 있는 구역을 그 센서가 담당한다.
+    센서 순서는 ultrasonic_positions 순서이며 하드웨어 센서 번호(ULTRASONIC_SENSORS 순서)와 같다.
+    """
+
+    def __init__(self, ultrasonic_positions, parking_spots, coverage_px=300):
+        self.signature = self.make_signature(ultrasonic_positions, parking_spots, coverage_px)
+
+        centers = np.array([spot['center'] for spot in parking_spots], dtype=np.float64).reshape(-1, 2)
+        self.spots_by_sensor = []
+        self.sensors_by_spot = {spot['id']: [] for spot in parking_spots}
+        for sensor, position in enumerate(ultrasonic_positions):
+            distances = np.sqrt(((centers - np.asarray(position, dtype=np.float64)) ** 2).sum(axis=1))
+            spot_ids = [parking_spots[index]['id'] for index in np.flatnonzero(distances <= coverage_px)]
+            self.spots_by_sensor.append(spot_ids)
+            for spot_id in spot_ids:
+                self.sensors_by_spot[spot_id].append(sensor)
+
+    @staticmethod
+    def make_signature(ultrasonic_positions, parking_spots, coverage_px):
+        """센서/구역 배치 변경 여부 비교용 시그니처"""
+        return (tuple(tuple(p) for p in ultrasonic_positions),
+                tuple((spot['id'], tuple(spot['center'])) for spot in parking_spots),
+                coverage_px)
+
+
+class OccupancyFusion:
+    """구역별 점유 신뢰도 + 탐지 생략 판단
+
+    카메라 신뢰도는 탐지 결과가 안정 상태와 일치한 시간이 stable_seconds에 가까울수록 0.5 → 1.0으로 오르고,
+    전환 대기 중(탐지 결과와 안정 상태가 다름)이면 0.25다.
+    담당 센서 측정값이 max_reading_age초 이내면 occupied_cm 미만을 '차 있음', 이상을 '비어 있음'으로 보고
+    카메라와 일치하면 신뢰도를 sensor_weight만큼 1 쪽으로, 어긋나면 0 쪽으로 옮긴다.
+    센서 하나가 여러 구역을 담당하므로 '차 있음'은 담당 구역 중 점유된 구역에만 일치로 센다.
+    """
+
+    def __init__(self, occupied_cm=50.0, sensor_weight=0.6, stable_seconds=3.0, max_reading_age=1.5,
+                 high_confidence=0.9, idle_interval=4, change_cm=10.0, still_speed=SPEED_DEADBAND):
+        self.occupied_cm = occupied_cm
+        self.sensor_weight = sensor_weight
+        self.stable_seconds = stable_seconds
+        self.max_reading_age = max_reading_age
+        self.high_confidence = high_confidence
+        self.idle_interval = idle_interval
+        self.change_cm = change_cm
+        self.still_speed = still_speed
+
+        self.agree_since = {}       # 구역 ID → 탐지 결과가 안정 상태와 계속 일치하기 시작한 시각
+        self.confidence = {}        # 구역 ID → 최근 신뢰도
+        self.idle = False           # 마지막 탐지 기준으로 탐지를 생략해도 되는 상태인지
+        self.reference = []         # 마지막 탐지 때의 센서 거리
+        self.skipped = 0
+        self.skipped_total = 0
+
+    def _sensor_distance(self, reading, timestamp):
+        """시간이 맞는 유효 측정값의 거리 (없으면 None)"""
+        if reading is None or reading['status'] != 'ok' or reading['distance'] is None:
+            return None
+        if abs(timestamp - reading['updated']) > self.max_reading_age:
+            return None
+        return reading['distance']
+
+    def update(self, parking_spots, readings, coverage, timestamp):
+        """구역 dict에 'confidence'/'sensor_agreement'를 기록하고 구역 ID → 신뢰도 반환
+
+        readings는 하드웨어 센서 번호 순서의 측정값 목록 (HardwareWorker.get_readings()).
+        """
+        near = []
+        for sensor in range(len(coverage.spots_by_sensor)):
+            distance = self._sensor_distance(readings[sensor] if sensor < len(readings) else None, timestamp)
+            near.append(None if distance is None else distance < self.occupied_cm)
+
+        for spot in parking_spots:
+            spot_id = spot['id']
+            if spot.get('detected', spot['occupied']) != spot['occupied']:
+                self.agree_since.pop(spot_id, None)
+                vision = 0.25
+            else:
+                since = self.agree_since.setdefault(spot_id, timestamp)
+                vision = 0.5 + 0.5 * min((timestamp - since) / self.stable_seconds, 1.0)
+
+            agreement = None
+            for sensor in coverage.sensors_by_spot.get(spot_id, []):
+                if near[sensor] is None:
+                    continue
+                if near[sensor] and not spot['occupied']:
+                    continue    # 같은 센서가 담당하는 다른 구역의 차량일 수 있음
+                matches = near[sensor] == spot['occupied']
+                agreement = matches if agreement is None else agreement and matches
+
+            if agreement is None:
+                confidence = vision
+            elif agreement:
+                confidence = vision + (1.0 - vision) * self.sensor_weight
+            else:
+                confidence = vision * (1.0 - self.sensor_weight)
+
+            spot['confidence'] = round(confidence, 3)
+            spot['sensor_agreement'] = agreement
+            self.confidence[spot_id] = spot['confidence']
+
+        for spot_id in [spot_id for spot_id in self.confidence if spot_id not in coverage.sensors_by_spot]:
+            self.confidence.pop(spot_id, None)
+            self.agree_since.pop(spot_id, None)
+        return dict(self.confidence)
+
+    def note_detection(self, vehicles, warnings, readings):
+        """전체 탐지를 마친 뒤 호출 - 다음 프레임들에서 탐지를 생략해도 되는지 결정
+
+        모든 구역 신뢰도가 high_confidence 이상이고, 경고가 없고, 모든 차량이 still_speed(px/s)보다
+        느릴 때만 생략 상태가 된다.
+        """
+        self.skipped = 0
+        self.reference = [reading['distance'] if reading is not None else None for reading in readings]
+        moving = any(np.hypot(*vehicle.get('velocity', (0.0, 0.0))) >= self.still_speed for vehicle in vehicles)
+        self.idle = (self.idle_interval > 1 and bool(self.confidence) and not warnings and not moving and
+                     min(self.confidence.values()) >= self.high_confidence)
+
+    def skip_detection(self, readings):
+        """이번 프레임 탐지를 생략할지 (생략 상태여도 idle_interval 프레임마다 한 번은 탐지하고,
+        센서 거리가 change_cm 이상 바뀌면 바로 탐지로 돌아간다)"""
+        if not self.idle or self.skipped >= self.idle_interval - 1:
+            return False
+        for reference, reading in zip(self.reference, readings):
+            distance = reading['distance'] if reading is not None else None
+            if (reference is None) != (distance is None) or (
+                    distance is not None and abs(distance - reference) >= self.change_cm):
+                self.idle = False
+                return False
+        self.skipped += 1
+        self.skipped_total += 1
+        return True
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+주차 세션 장부
+차량이 주차구역에 자리 잡으면(점유 확정) 세션을 열고 떠나면 닫아서 체류 시간을 기록한다.
+기록은 32바이트 고정 크기 레코드를 파일 끝에 덧붙이기만 하고,
+구역별/차량별/시작 시각 색인은 메모리에 유지한다 (시작 시 로그를 한 번 읽어 복원).
+추적기 차량 ID는 프로세스를 시작할 때마다 1부터 다시 매겨지므로 세션은 실행 번호(run)와 함께 구분한다
+"""
+
+import os
+import time
+import struct
+import bisect
+import threading
+
+# 종류(B), 패딩, 세션 ID(I), 구역 ID(i), 차량 ID(i, 없으면 -1), 시각(d), 색상(8s)
+RECORD = struct.Struct('<B3xIiid8s')
+OPEN = 1
+CLOSE = 2
+RUN = 3             # 장부를 연 실행의 시작 (세션 ID 자리에 실행 번호)
+INTERRUPTED = 4     # 실행이 끝날 때 닫히지 않은 세션을 그 실행의 마지막 기록 시각으로 닫음
+
+
+class SessionLedger:
+    """세션 장부 - 덧붙이기 전용 로그 + 메모리 색인
+
+    세션 ID는 1부터 열린 순서대로 증가하므로 sessions[session_id - 1]로 바로 찾는다.
+    시작 시각은 열린 순서대로 증가하므로 시간 범위 조회는 이분 탐색으로 해당 구간만 읽는다.
+
+    장부를 열 때마다 실행 번호(run)가 1씩 증가하고, 세션과 차량별 색인은 (실행 번호, 차량 ID)로 구분한다.
+    서버가 세션을 닫지 못하고 끝났으면 (정전/강제 종료) 다음 시작 시 그 세션을 이전 실행의
+    마지막 기록 시각으로 닫고 interrupted로 표시한다. 정상 종료(close())도 진행 중인 세션을
+    종료 시각으로 닫고 interrupted로 표시한다 - 차량이 아직 있으면 다음 실행에서 새 세션이 열린다.
+    """
+
+    def __init__(self, log_path):
+        self.log_path = log_path
+        self.lock = threading.Lock()
+
+        self.sessions = []      # 세션 ID - 1 → 세션 dict
+        self.starts = []        # 세션별 시작 시각 (sessions와 같은 순서)
+        self.active = {}        # 구역 ID → 진행 중인 세션 ID
+        self.by_spot = {}       # 구역 ID → 세션 ID 목록 (오래된 순)
+        self.by_vehicle = {}    # (실행 번호, 차량 ID) → 세션 ID 목록 (오래된 순)
+        self.run = 0            # 실행 번호 (RUN 레코드가 없는 이전 형식 로그는 0)
+        self.last_timestamp = None  # 현재 실행에서 마지막으로 기록한 시각
+
+        self._replay()
+        self.log = open(log_path, 'ab')
+
+        # 이전 실행이 닫지 못한 세션은 그 실행의 마지막 기록 시각으로 닫고 새 실행 시작
+        self._close_interrupted(self.last_timestamp)
+        self.run += 1
+        self._append(RUN, self.run, 0, None, time.time(), None)
+
+    def _replay(self):
+        """기존 로그를 읽어 색인 복원 (마지막 레코드가 잘려 있으면 잘라 냄)
+
+        INTERRUPTED 레코드 없이 다음 실행이 시작된 로그(강제 종료)면, 그 실행에 열려 있던
+        세션을 그 실행의 마지막 기록 시각으로 닫은 것으로 복원한다.
+        """
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, 'rb') as f:
+            data = f.read()
+
+        usable = len(data) - len(data) % RECORD.size
+        for kind, session_id, spot_id, vehicle_id, timestamp, color in RECORD.iter_unpack(data[:usable]):
+            vehicle_id = vehicle_id if vehicle_id >= 0 else None
+            color = color.rstrip(b'\0').decode('ascii', 'replace') or None
+            if kind == RUN:
+                for session in self._orphaned():
+                    self._index_close(session, self.last_timestamp, interrupted=True)
+                self.run = session_id
+            elif kind == OPEN:
+                self._index_open(spot_id, vehicle_id, color, timestamp)
+            elif kind in (CLOSE, INTERRUPTED) and 0 < session_id <= len(self.sessions):
+                self._index_close(self.sessions[session_id - 1], timestamp, interrupted=kind == INTERRUPTED)
+            self.last_timestamp = timestamp
+
+        if usable != len(data):
+            with open(self.log_path, 'r+b') as f:
+                f.truncate(usable)
+
+    def _orphaned(self):
+        """진행 중으로 남아 있는 세션 목록 (열린 순서)"""
+        return [self.sessions[session_id - 1] for session_id in sorted(self.active.values())]
+
+    def _close_interrupted(self, timestamp):
+        """진행 중인 세션을 모두 timestamp로 닫고 INTERRUPTED 레코드를 남김"""
+        for session in self._orphaned():
+            self._index_close(session, max(timestamp, session['start']), interrupted=True)
+            self._append(INTERRUPTED, session['session_id'], session['spot_id'], session['vehicle_id'],
+                         session['end'], session['vehicle_color'])
+
+    def _index_open(self, spot_id, vehicle_id, vehicle_color, timestamp):
+        session = {
+            'session_id': len(self.sessions) + 1,
+            'run': self.run,
+            'spot_id': spot_id,
+            'vehicle_id': vehicle_id,
+            'vehicle_color': vehicle_color,
+            'start': timestamp,
+            'end': None,
+            'interrupted': False
+        }
+        self.sessions.append(session)
+        self.starts.append(timestamp)
+        self.active[spot_id] = session['session_id']
+        self.by_spot.setdefault(spot_id, []).append(session['session_id'])
+        if vehicle_id is not None:
+            self.by_vehicle.setdefault((self.run, vehicle_id), []).append(session['session_id'])
+        return session
+
+    def _index_close(self, session, timestamp, interrupted=False):
+        session['end'] = timestamp
+        session['interrupted'] = interrupted
+        if self.active.get(session['spot_id']) == session['session_id']:
+            del self.active[session['spot_id']]
+
+    def _append(self, kind, session_id, spot_id, vehicle_id, timestamp, color):
+        color_bytes = (color or '').encode('ascii', 'replace')[:8]
+        self.log.write(RECORD.pack(kind, session_id, spot_id,
+                                   vehicle_id if vehicle_id is not None else -1, timestamp, color_bytes))
+        self.log.flush()
+        self.last_timestamp = timestamp
+
+    def open_session(self, spot_id, vehicle_id, vehicle_color, timestamp=None):
+        """구역에 세션 시작 (그 구역에 닫히지 않은 세션이 남아 있으면 이 시각으로 닫음)"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            if spot_id in self.active:
+                self._close_locked(spot_id, timestamp)
+            session = self._index_open(spot_id, vehicle_id, vehicle_color, timestamp)
+            self._append(OPEN, session['session_id'], spot_id, vehicle_id, timestamp, vehicle_color)
+            return dict(session)
+
+    def close_session(self, spot_id, timestamp=None):
+        """구역의 진행 중인 세션 종료 (없으면 None)"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self.lock:
+            return self._close_locked(spot_id, timestamp)
+
+    def _close_locked(self, spot_id, timestamp):
+        session_id = self.active.get(spot_id)
+        if session_id is None:
+            return None
+        session = self.sessions[session_id - 1]
+        self._index_close(session, timestamp)
+        self._append(CLOSE, session_id, spot_id, session['vehicle_id'], timestamp, session['vehicle_color'])
+        return dict(session)
+
+    def apply_event(self, event):
+        """주차구역 상태 변경 이벤트(SpotStateMachine)로 세션 열기/닫기"""
+        if event['new_state'] == 'occupied':
+            return self.open_session(event['spot_id'], event['vehicle_id'], event['vehicle_color'],
+                                     event['timestamp'])
+        return self.close_session(event['spot_id'], event['timestamp'])
+
+    def _with_duration(self, session, now):
+        result = dict(session)
+        end = session['end'] if session['end'] is not None else now
+        result['duration'] = round(end - session['start'], 1)
+        result['active'] = session['end'] is None
+        return result
+
+    def query(self, spot_id=None, vehicle_id=None, start=None, end=None, status='all', limit=100, run=None):
+        """조건에 맞는 세션 목록 (최신 순, 최대 limit개)
+
+        start/end는 세션 시작 시각 범위 [start, end). status는 'active', 'completed', 'all'.
+        구역/차량 조건이 있으면 해당 색인만, 없으면 시작 시각 범위만 읽는다.
+        차량 ID는 실행마다 다시 매겨지므로 run(기본: 현재 실행)의 차량만 찾는다.
+        """
+        now = time.time()
+        with self.lock:
+            if run is None:
+                run = self.run
+            if status == 'active' and spot_id is None and vehicle_id is None:
+                candidates = sorted(self.active.values())
+            elif spot_id is not None:
+                candidates = self.by_spot.get(spot_id, [])
+            elif vehicle_id is not None:
+                candidates = self.by_vehicle.get((run, vehicle_id), [])
+            else:
+                lo = bisect.bisect_left(self.starts, start) if start is not None else 0
+                hi = bisect.bisect_left(self.starts, end) if end is not None else len(self.starts)
+                candidates = range(lo + 1, hi + 1)
+
+            results = []
+            for session_id in reversed(candidates):
+                session = self.sessions[session_id - 1]
+                if vehicle_id is not None and (session['run'], session['vehicle_id']) != (run, vehicle_id):
+                    continue
+                if start is not None and session['start'] < start:
+                    if spot_id is not None or vehicle_id is not None:
+                        break   # 색인이 시작 시각 순이므로 더 오래된 세션은 볼 필요 없음
+                    continue
+                if end is not None and session['start'] >= end:
+                    continue
+                if status == 'active' and session['end'] is not None:
+                    continue
+                if status == 'completed' and session['end'] is None:
+                    continue
+                results.append(self._with_duration(session, now))
+                if len(results) >= limit:
+                    break
+            return results
+
+    def close(self):
+        """진행 중인 세션을 지금 시각으로 닫고 (interrupted) 로그 닫기"""
+        with self.lock:
+            self._close_interrupted(time.time())
+            self.log.close()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+주차장 배치 파일
+주차장 영역, 초음파 센서/차단기 위치, 색상 범위, 주차구역을 JSON 파일 하나(parking_layout.json)로 관리한다.
+읽을 때 형식을 검사하고, 파일이 바뀌면 다시 읽어서 마스크/구역 래스터/위험 위치 배열 같은 파생 데이터를
+처리 스레드 밖에서 한 번만 만들어 둔다. 처리 스레드는 프레임 사이에서 참조 교체로 한 번에 바꿔 끼운다
+"""
+
+import os
+import json
+import time
+import threading
+import logging
+
+from color_classifier import ColorClassifier
+from hazard_map import HazardMap
+from parking_roi import ParkingAreaROI
+from spot_map import SpotMap
+from sensor_fusion import SensorCoverage
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parking_layout.json')
+
+# 배치 파일 최상위 항목 (resolution은 좌표계 크기로 범위 검사에만 쓴다)
+LAYOUT_KEYS = ('parking_area', 'ultrasonic_positions', 'barrier_positions', 'color_ranges', 'parking_spots')
+OPTIONAL_KEYS = ('resolution',)
+# 주차구역 dict에서 배치 파일이 정하는 항목 (나머지는 점유 상태라 다시 읽어도 이어받는다)
+SPOT_GEOMETRY_KEYS = ('id', 'bbox', 'center', 'polygon')
+
+
+class LayoutError(ValueError):
+    """배치 파일을 읽을 수 없거나 형식이 잘못됨"""
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _point(value, where, resolution):
+    if not (isinstance(value, (list, tuple)) and len(value) == 2 and all(_is_int(v) for v in value)):
+        raise LayoutError(f"{where}: [x, y] 정수 좌표여야 한다 ({value!r})")
+    if resolution is not None and not (0 <= value[0] <= resolution[0] and 0 <= value[1] <= resolution[1]):
+        raise LayoutError(f"{where}: {list(value)}가 화면 {resolution[0]}x{resolution[1]} 밖에 있다")
+    return (value[0], value[1])
+
+
+def _points(value, where, resolution):
+    if not isinstance(value, list):
+        raise LayoutError(f"{where}: 좌표 목록이어야 한다")
+    return [_point(p, f"{where}[{i}]", resolution) for i, p in enumerate(value)]
+
+
+def _hsv(value, where):
+    if not (isinstance(value, list) and len(value) == 3 and all(_is_int(v) for v in value)):
+        raise LayoutError(f"{where}: [H, S, V] 정수 3개여야 한다 ({value!r})")
+    for channel, limit, v in zip('HSV', (180, 255, 255), value):
+        if not 0 <= v <= limit:
+            raise LayoutError(f"{where}: {channel} 값 {v}는 0~{limit} 범위여야 한다")
+    return list(value)
+
+
+def parse_layout(data):
+    """배치 dict 검사 후 탐지 엔진이 쓰는 형태로 변환
+
+    좌표는 튜플, 색상 범위는 (하한, 상한) 튜플, 주차구역은 점유 상태 필드가 붙은 dict 목록이 된다.
+    주차구역 center를 생략하면 bbox 중심을 쓴다.
+    """
+    if not isinstance(data, dict):
+        raise LayoutError("배치 파일 최상위는 객체여야 한다")
+    unknown = set(data) - set(LAYOUT_KEYS) - set(OPTIONAL_KEYS)
+    if unknown:
+        raise LayoutError(f"알 수 없는 항목: {', '.join(sorted(unknown))}")
+    missing = [key for key in LAYOUT_KEYS if key not in data]
+    if missing:
+        raise LayoutError(f"빠진 항목: {', '.join(missing)}")
+
+    resolution = data.get('resolution')
+    if resolution is not None:
+        if not (isinstance(resolution, list) and len(resolution) == 2 and
+                all(_is_int(v) and v > 0 for v in resolution)):
+            raise LayoutError("resolution: [너비, 높이] 양의 정수여야 한다")
+        resolution = tuple(resolution)
+
+    parking_area = _points(data['parking_area'], 'parking_area', resolution)
+    if len(parking_area) not in (0, 4):
+        raise LayoutError("parking_area: 꼭짓점 4개여야 한다 (빈 목록이면 화면 전체)")
+
+    color_ranges = data['color_ranges']
+    if not isinstance(color_ranges, dict) or not color_ranges:
+        raise LayoutError("color_ranges: 색상 이름 → [[H, S, V 하한], [H, S, V 상한]] 객체여야 한다")
+    if len(color_ranges) > ColorClassifier.MAX_COLORS:
+        raise LayoutError(f"color_ranges: 색상은 최대 {ColorClassifier.MAX_COLORS}개")
+    parsed_colors = {}
+    for name, bounds in color_ranges.items():
+        if not (isinstance(bounds, list) and len(bounds) == 2):
+            raise LayoutError(f"color_ranges.{name}: [하한, 상한]이어야 한다")
+        lower = _hsv(bounds[0], f"color_ranges.{name} 하한")
+        upper = _hsv(bounds[1], f"color_ranges.{name} 상한")
+        if any(low > high for low, high in zip(lower, upper)):
+            raise LayoutError(f"color_ranges.{name}: 하한이 상한보다 크다")
+        parsed_colors[name] = (lower, upper)
+
+    if not isinstance(data['parking_spots'], list):
+        raise LayoutError("parking_spots: 주차구역 목록이어야 한다")
+    spots = []
+    seen = set()
+    for i, spot in enumerate(data['parking_spots']):
+        where = f"parking_spots[{i}]"
+        if not isinstance(spot, dict):
+            raise LayoutError(f"{where}: 객체여야 한다")
+        unknown = set(spot) - set(SPOT_GEOMETRY_KEYS)
+        if unknown:
+            raise LayoutError(f"{where}: 알 수 없는 항목 {', '.join(sorted(unknown))}")
+        if not _is_int(spot.get('id')) or spot['id'] < 1:
+            # 0은 이력 저장소가 주차장 전체 집계에 쓰는 ID (history_store.LOT)
+            raise LayoutError(f"{where}: id는 1 이상의 정수여야 한다")
+        if spot['id'] in seen:
+            raise LayoutError(f"{where}: id {spot['id']}가 중복된다")
+        seen.add(spot['id'])
+        bbox = spot.get('bbox')
+        if not (isinstance(bbox, list) and len(bbox) == 4 and all(_is_int(v) for v in bbox) and
+                bbox[2] > 0 and bbox[3] > 0):
+            raise LayoutError(f"{where}: bbox는 [x, y, 너비, 높이] 정수여야 한다 (너비/높이 > 0)")
+        x, y, w, h = bbox
+        _point([x, y], f"{where}.bbox 좌상단", resolution)
+        _point([x + w, y + h], f"{where}.bbox 우하단", resolution)
+        if 'center' in spot:
+            center = _point(spot['center'], f"{where}.center", resolution)
+        else:
+            center = (x + w // 2, y + h // 2)
+        parsed = {'id': spot['id'], 'bbox': (x, y, w, h), 'center': center,
+                  'occupied': False, 'vehicle_id': None, 'vehicle_color': None}
+        if 'polygon' in spot:
+            parsed['polygon'] = _points(spot['polygon'], f"{where}.polygon", resolution)
+            if len(parsed['polygon']) < 3:
+                raise LayoutError(f"{where}.polygon: 꼭짓점이 3개 이상이어야 한다")
+        spots.append(parsed)
+
+    return {
+        'resolution': resolution,
+        'parking_area': parking_area,
+        'ultrasonic_positions': _points(data['ultrasonic_positions'], 'ultrasonic_positions', resolution),
+        'barrier_positions': _points(data['barrier_positions'], 'barrier_positions', resolution),
+        'color_ranges': parsed_colors,
+        'parking_spots': spots
+    }
+
+
+def load_layout(path, overrides=None):
+    """배치 파일 읽기 + 검사 (overrides의 항목은 파일 내용을 덮어씀). 실패하면 LayoutError"""
+    try:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+    except OSError as e:
+        raise LayoutError(f"배치 파일을 읽을 수 없다: {e}") from e
+    except ValueError as e:
+        raise LayoutError(f"배치 파일 JSON 형식 오류: {e}") from e
+    if overrides and isinstance(data, dict):
+        data = dict(data, **overrides)
+    return parse_layout(data)
+
+
+class PreparedLayout:
+    """검사를 마친 배치 + 그 배치로 미리 만든 파생 데이터
+
+    frame_shape를 알면 주차장 ROI 마스크와 구역 래스터까지, coverage_px를 주면 센서 담당 구역 매핑까지 만든다.
+    apply()는 탐지 엔진(DetectionEngine)의 배치와 캐시를 한 번에 교체하므로 처리 스레드가 프레임 사이에서 호출해야 한다.
+    캐시마다 시그니처가 새 배치와 같으므로 엔진의 get_*() 캐시 조회는 다시 만들지 않고 그대로 쓴다.
+    """
+
+    def __init__(self, layout, frame_shape=None, coverage_px=None):
+        self.layout = layout
+        self.frame_shape = frame_shape
+        self.color_classifier = ColorClassifier(layout['color_ranges'])
+        self.hazard_map = HazardMap(layout['ultrasonic_positions'], layout['barrier_positions'])
+        self.parking_roi = None
+        self.spot_map = None
+        if frame_shape is not None:
+            self.parking_roi = ParkingAreaROI(layout['parking_area'], frame_shape)
+            self.spot_map = SpotMap(layout['parking_spots'], frame_shape)
+        self.sensor_coverage = None
+        if coverage_px is not None:
+            self.sensor_coverage = SensorCoverage(layout['ultrasonic_positions'], layout['parking_spots'],
+                                                  coverage_px)
+
+    def apply(self, engine):
+        """탐지 엔진 배치 교체 (같은 ID 구역의 점유 상태는 이어받음) + 미리 만든 캐시로 바꿔 끼우기"""
+        engine.set_layout(self.layout)
+        engine.color_classifier = self.color_classifier
+        engine.hazard_map = self.hazard_map
+        if self.parking_roi is not None:
+            engine.parking_roi = self.parking_roi
+            engine.spot_map = self.spot_map
+        if self.sensor_coverage is not None:
+            engine.sensor_coverage = self.sensor_coverage
+
+
+class LayoutWatcher:
+    """배치 파일 변경 감시 (interval초마다 수정 시각/크기 확인)
+
+    바뀌면 다시 읽어 on_change(배치)를 감시 스레드에서 호출한다. 새 파일이 잘못되었으면 에러를 기록하고
+    이전 배치를 그대로 둔다 (저장 도중의 파일도 다음 확인 때 다시 시도).
+    """
+
+    def __init__(self, path, on_change=None, overrides=None, interval=1.0):
+        self.path = path
+        self.on_change = on_change
+        self.overrides = overrides
+        self.interval = interval
+        self.stamp = None
+        self.version = 0        # 성공적으로 읽은 횟수
+        self.loaded_at = None
+        self.last_error = None
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """지금 파일을 읽어 배치 반환 (실패하면 LayoutError, 감시 기준 시각도 갱신)"""
+        self.stamp = self._stat()
+        try:
+            layout = load_layout(self.path, self.overrides)
+        except LayoutError as e:
+            self.last_error = str(e)
+            raise
+        self.version += 1
+        self.loaded_at = time.time()
+        self.last_error = None
+        return layout
+
+    def check(self):
+        """파일이 바뀌었으면 다시 읽어 on_change 호출 (바꿨으면 True)"""
+        stamp = self._stat()
+        if stamp is None or stamp == self.stamp:
+            return False
+        try:
+            layout = self.load()
+        except LayoutError as e:
+            logger.error(f"배치 파일 오류 - 이전 배치 유지: {e}")
+            return False
+        logger.info(f"배치 파일 다시 읽음 ({self.version}번째): 주차구역 {len(layout['parking_spots'])}개")
+        if self.on_change is not None:
+            self.on_change(layout)
+        return True
+
+    def start(self):
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='layout-watcher', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"배치 파일 감시 에러: {e}")
+
+    def get_status(self):
+        return {
+            'path': self.path,
+            'version': self.version,
+            'loaded_at': self.loaded_at,
+            'error': self.last_error
+        }
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
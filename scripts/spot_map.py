@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+주차구역 인덱스 래스터
+프레임 크기의 정수 레이블 이미지에 각 픽셀이 속한 주차구역 번호를 미리 그려 두고,
+차량 중심점 → 주차구역 조회와 색상 마스크의 구역별 겹침 비율 계산에 사용한다
+"""
+
+import cv2
+import numpy as np
+
+NO_SPOT = -1
+
+
+class SpotMap:
+    """주차구역 레이블 래스터 (구역 배치나 프레임 크기가 바뀔 때만 다시 생성)
+
+    각 픽셀 값은 parking_spots 리스트의 인덱스이고, 어느 구역에도 속하지 않으면 NO_SPOT.
+    구역에 'polygon'이 있으면 다각형으로, 없으면 'bbox'로 그린다 (bbox는 경계 포함).
+    구역이 겹치면 리스트에서 앞선 구역이 우선한다.
+    """
+
+    def __init__(self, parking_spots, frame_shape):
+        self.signature = self.make_signature(parking_spots, frame_shape)
+        frame_h, frame_w = frame_shape[:2]
+
+        self.labels = np.full((frame_h, frame_w), NO_SPOT, dtype=np.int32)
+        # 뒤 구역부터 그려서 겹치는 픽셀은 앞 구역이 덮어쓰게 한다
+        for index in range(len(parking_spots) - 1, -1, -1):
+            spot = parking_spots[index]
+            if spot.get('polygon'):
+                pts = np.array(spot['polygon'], np.int32)
+                cv2.fillPoly(self.labels, [pts], index)
+            else:
+                x, y, w, h = spot['bbox']
+                self.labels[max(y, 0):max(y + h + 1, 0), max(x, 0):max(x + w + 1, 0)] = index
+
+        self.spot_count = len(parking_spots)
+        self.areas = np.bincount(self.labels[self.labels >= 0], minlength=self.spot_count)
+
+    @staticmethod
+    def make_signature(parking_spots, frame_shape):
+        """주차구역 배치 / 프레임 크기 변경 여부 비교용 시그니처 (점유 상태는 제외)"""
+        return (tuple((tuple(spot['bbox']), tuple(tuple(p) for p in spot.get('polygon') or ()))
+                      for spot in parking_spots),
+                tuple(frame_shape[:2]))
+
+    def lookup(self, points):
+        """점 (N, 2)마다 속한 구역 인덱스 배열 (프레임 밖이거나 구역 밖이면 NO_SPOT)"""
+        points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+        result = np.full(len(points), NO_SPOT, dtype=np.int64)
+        if len(points) == 0:
+            return result
+
+        frame_h, frame_w = self.labels.shape
+        x, y = points[:, 0], points[:, 1]
+        inside = (x >= 0) & (x < frame_w) & (y >= 0) & (y < frame_h)
+        result[inside] = self.labels[y[inside], x[inside]]
+        return result
+
+    def overlap_counts(self, mask, offset=(0, 0)):
+        """마스크(프레임 좌표 offset에 위치)의 0이 아닌 픽셀 수를 구역별로 센 배열 (spot_count,)"""
+        x0, y0 = offset
+        h, w = mask.shape[:2]
+        window = self.labels[y0:y0 + h, x0:x0 + w]
+        mask = mask[:window.shape[0], :window.shape[1]]
+
+        spot_labels = window[(mask > 0) & (window >= 0)]
+        return np.bincount(spot_labels, minlength=self.spot_count)[:self.spot_count]
+
+    def overlap_fractions(self, counts):
+        """구역별 픽셀 수를 구역 면적 대비 비율로 변환"""
+        return np.asarray(counts, dtype=np.float64) / np.maximum(self.areas, 1)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+주차구역 점유 상태 머신
+프레임마다 계산된 점유 여부를 구역별 히스테리시스로 안정화하고,
+상태가 실제로 바뀔 때만 변경 이벤트를 링 버퍼에 기록한다
+"""
+
+import time
+import threading
+from collections import deque
+
+FREE = 'free'
+OCCUPIED = 'occupied'
+
+
+class SpotStateMachine:
+    """구역별 안정 상태 (비어있음 ↔ 점유)
+
+    탐지 결과가 현재 안정 상태와 다르게 enter_frames(비어있음 → 점유) 또는
+    exit_frames(점유 → 비어있음) 프레임 연속으로 나오고, enter_seconds/exit_seconds를 주었다면
+    그 시간 이상 지속되어야 상태를 바꾼다. 한 프레임 탐지 누락으로는 상태가 바뀌지 않는다.
+
+    변경 이벤트는 event_capacity개까지 보관하며, 각 이벤트의 seq는 1부터 계속 증가한다.
+    """
+
+    def __init__(self, enter_frames=3, exit_frames=5, enter_seconds=0.0, exit_seconds=0.0,
+                 event_capacity=500):
+        self.enter_frames = enter_frames
+        self.exit_frames = exit_frames
+        self.enter_seconds = enter_seconds
+        self.exit_seconds = exit_seconds
+
+        self.lock = threading.Lock()
+        self.states = {}    # 구역 ID → 안정 상태 정보
+        self.events = deque(maxlen=event_capacity)
+        self.last_seq = 0
+
+    def _new_state(self):
+        return {
+            'state': FREE,
+            'vehicle_id': None,
+            'vehicle_color': None,
+            'pending_frames': 0,    # 탐지 결과가 안정 상태와 연속으로 다른 프레임 수
+            'pending_since': None,  # 그 불일치가 시작된 시각
+            'changed_at': None
+        }
+
+    def update(self, parking_spots, timestamp=None):
+        """탐지 결과(spot['occupied'] 등)를 반영하고 구역 dict를 안정 상태로 덮어쓴다
+
+        원래 탐지 결과는 spot['detected'], 마지막 상태 변경 시각은 spot['since']에 남긴다. 이번 호출에서 발생한 이벤트 목록을 반환한다.
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        new_events = []
+
+        with self.lock:
+            for spot in parking_spots:
+                state = self.states.get(spot['id'])
+                if state is None:
+                    state = self.states[spot['id']] = self._new_state()
+
+                detected = OCCUPIED if spot['occupied'] else FREE
+                spot['detected'] = spot['occupied']
+
+                if detected == state['state']:
+                    state['pending_frames'] = 0
+                    state['pending_since'] = None
+                    # 점유 유지 중 같은 구역의 차량 정보가 갱신되면 따라간다
+                    if detected == OCCUPIED and spot['vehicle_id'] is not None:
+                        state['vehicle_id'] = spot['vehicle_id']
+                        state['vehicle_color'] = spot['vehicle_color']
+                else:
+                    state['pending_frames'] += 1
+                    if state['pending_since'] is None:
+                        state['pending_since'] = timestamp
+
+                    if detected == OCCUPIED:
+                        frames, seconds = self.enter_frames, self.enter_seconds
+                    else:
+                        frames, seconds = self.exit_frames, self.exit_seconds
+
+                    if (state['pending_frames'] >= frames and
+                            timestamp - state['pending_since'] >= seconds):
+                        new_events.append(self._transition(spot, state, detected, timestamp))
+
+                spot['occupied'] = state['state'] == OCCUPIED
+                spot['vehicle_id'] = state['vehicle_id']
+                spot['vehicle_color'] = state['vehicle_color']
+                spot['since'] = state['changed_at']
+
+            # 배치에서 사라진 구역 정리
+            current_ids = {spot['id'] for spot in parking_spots}
+            for spot_id in [spot_id for spot_id in self.states if spot_id not in current_ids]:
+                del self.states[spot_id]
+
+        return new_events
+
+    def _transition(self, spot, state, new_state, timestamp):
+        """안정 상태 변경 및 이벤트 기록 (lock을 잡은 상태에서 호출)"""
+        old_state = state['state']
+        if new_state == OCCUPIED:
+            state['vehicle_id'], state['vehicle_color'] = spot['vehicle_id'], spot['vehicle_color']
+            vehicle_id, vehicle_color = state['vehicle_id'], state['vehicle_color']
+        else:
+            # 떠난 차량 정보를 이벤트에 남긴다
+            vehicle_id, vehicle_color = state['vehicle_id'], state['vehicle_color']
+            state['vehicle_id'] = state['vehicle_color'] = None
+
+        state['state'] = new_state
+        state['pending_frames'] = 0
+        state['pending_since'] = None
+        state['changed_at'] = timestamp
+
+        self.last_seq += 1
+        event = {
+            'seq': self.last_seq,
+            'spot_id': spot['id'],
+            'old_state': old_state,
+            'new_state': new_state,
+            'vehicle_id': vehicle_id,
+            'vehicle_color': vehicle_color,
+            'timestamp': timestamp
+        }
+        self.events.append(event)
+        return event
+
+    def get_events(self, since=0, limit=None):
+        """seq가 since보다 큰 이벤트 목록 (오래된 순)"""
+        with self.lock:
+            events = [event for event in self.events if event['seq'] > since]
+        if limit is not None:
+            events = events[:limit]
+        return events
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+상태 API 스냅샷
+처리 스레드가 프레임마다 상태를 한 번만 JSON으로 직렬화해서 공개하고,
+API 요청은 공개된 참조만 읽어 그대로 응답한다 (요청마다 잠금/재계산 없음)
+"""
+
+import json
+import hashlib
+
+from collision_check import SPEED_DEADBAND
+from event_hub import warning_key
+
+
+
+class StatusSmoother:
+    """상태 본문용 차량/경고 값 안정화 - 주차된 차량의 탐지 위치 떨림으로 본문(ETag)이 바뀌지 않게 한다
+
+    차량 위치와 경고 거리는 차량/경고별로 마지막에 보고한 값에서 position_step(px) 이상 벗어날 때만,
+    속도는 speed_step(px/s) 이상 바뀔 때만 새 값으로 바꾼다. SPEED_DEADBAND 미만 속도는 0이다.
+    격자 반올림과 달리 경계 근처에서 떨려도 값이 오가지 않는다. 처리 스레드에서만 호출한다.
+    """
+
+    def __init__(self, position_step=5, speed_step=10):
+        self.position_step = position_step
+        self.speed_step = speed_step
+        self.reported = {}      # (종류, 차량 ID/경고 키) → 마지막으로 보고한 값 (튜플)
+
+    def _stable(self, key, value, step, seen):
+        seen.add(key)
+        previous = self.reported.get(key)
+        if previous is not None and all(abs(new - old) < step for new, old in zip(value, previous)):
+            return list(previous)
+        self.reported[key] = tuple(int(round(v)) for v in value)
+        return list(self.reported[key])
+
+    def summarize(self, vehicles, warnings):
+        """(차량 요약 목록, 경고 요약 목록) - 이번에 없는 차량/경고의 기록은 지운다
+
+        경고 요약은 경고 키와 대상 ID, 거리만 담는다 (좌표, 충돌 예상 시간 등은 /api/warnings와 /events에 있다).
+        """
+        seen = set()
+        vehicle_summaries = []
+        for vehicle in vehicles:
+            vx, vy = vehicle.get('velocity', (0.0, 0.0))
+            if (vx * vx + vy * vy) ** 0.5 < SPEED_DEADBAND:
+                vx = vy = 0.0
+            vehicle_id = vehicle.get('id')
+            vehicle_summaries.append({
+                'id': vehicle_id,
+                'color': vehicle['color'],
+                'center': self._stable(('center', vehicle_id), vehicle['center'], self.position_step, seen),
+                'velocity': self._stable(('velocity', vehicle_id), (vx, vy), self.speed_step, seen)
+            })
+
+        warning_summaries = []
+        for warning in warnings:
+            key = warning_key(warning)
+            summary = {'key': key, 'type': warning['type']}
+            for field in ('vehicle_id', 'vehicle1_id', 'vehicle2_id', 'sensor_id', 'barrier_id'):
+                if field in warning:
+                    summary[field] = warning[field]
+            if warning.get('distance') is not None:
+                summary['distance'] = self._stable(('distance', key), (warning['distance'],),
+                                                   self.position_step, seen)[0]
+            warning_summaries.append(summary)
+
+        self.reported = {key: value for key, value in self.reported.items() if key in seen}
+        return vehicle_summaries, warning_summaries
+
+
+class JsonSnapshot:
+    """한 번 직렬화된 응답 본문과 ETag (생성 후 변경하지 않음)
+
+    ETag는 본문 해시이므로 내용이 같으면 같은 값이 된다.
+    """
+
+    __slots__ = ('body', 'etag')
+
+    def __init__(self, data):
+        self.body = json.dumps(data, separators=(',', ':'), sort_keys=True).encode('utf-8')
+        self.etag = hashlib.blake2b(self.body, digest_size=8).hexdigest()
+
+
+class SnapshotStore:
+    """이름별 최신 스냅샷 참조
+
+    publish()는 처리 스레드에서만 호출하고, get()은 참조를 읽기만 하므로 잠금이 필요 없다.
+    내용이 이전과 같으면 이전 스냅샷을 그대로 두어 ETag가 유지되게 한다
+    (조건부 요청이 304를 받을 수 있도록).
+    """
+
+    def __init__(self):
+        self.snapshots = {}
+
+    def publish(self, name, data):
+        snapshot = JsonSnapshot(data)
+        previous = self.snapshots.get(name)
+        if previous is not None and previous.etag == snapshot.etag:
+            return previous
+        # dict 항목 교체는 원자적이므로 읽는 쪽은 이전 또는 새 스냅샷 중 하나를 본다
+        self.snapshots[name] = snapshot
+        return snapshot
+
+    def get(self, name):
+        return self.snapshots.get(name)
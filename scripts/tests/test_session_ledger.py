@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+세션 장부 복원 테스트 (잘린 로그 꼬리, 서버 재시작/강제 종료)
+
+    cd scripts && python3 -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from session_ledger import SessionLedger, RECORD
+
+
+class SessionLedgerReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.log_path = os.path.join(self.tmp.name, 'sessions.log')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def crash(self, ledger):
+        """close() 없이 끝난 프로세스처럼 파일만 닫음"""
+        ledger.log.close()
+
+    def test_torn_tail_is_truncated(self):
+        ledger = SessionLedger(self.log_path)
+        ledger.open_session(1, 7, 'blue', timestamp=100.0)
+        ledger.close_session(1, timestamp=160.0)
+        ledger.open_session(2, 8, 'white', timestamp=170.0)
+        self.crash(ledger)
+        complete = os.path.getsize(self.log_path)
+
+        # 다음 레코드를 쓰다가 끊김
+        with open(self.log_path, 'ab') as f:
+            f.write(RECORD.pack(2, 2, 2, 8, 200.0, b'white')[:13])
+
+        ledger = SessionLedger(self.log_path)
+        first, second = ledger.sessions
+        self.assertEqual((first['start'], first['end'], first['interrupted']), (100.0, 160.0, False))
+        # 잘린 CLOSE는 버리고, 열려 있던 세션은 그 실행의 마지막 기록 시각으로 닫힘
+        self.assertEqual((second['start'], second['end'], second['interrupted']), (170.0, 170.0, True))
+        self.assertEqual(ledger.active, {})
+        # 잘린 꼬리는 잘라 내고 그 뒤에 INTERRUPTED + RUN 레코드만 덧붙임
+        self.assertEqual(os.path.getsize(self.log_path), complete + 2 * RECORD.size)
+        ledger.close()
+
+    def test_crash_closes_orphans_at_last_record(self):
+        ledger = SessionLedger(self.log_path)
+        ledger.open_session(1, 1, 'blue', timestamp=1000.0)
+        ledger.open_session(2, 2, 'yellow', timestamp=1010.0)
+        ledger.close_session(2, timestamp=1300.0)
+        self.crash(ledger)
+
+        ledger = SessionLedger(self.log_path)
+        self.assertEqual(ledger.run, 2)
+        orphan = ledger.sessions[0]
+        self.assertEqual((orphan['end'], orphan['interrupted']), (1300.0, True))
+
+        # 같은 구역에 새 차량이 와도 이전 세션의 종료 시각은 바뀌지 않음
+        ledger.open_session(1, 1, 'white', timestamp=5000.0)
+        self.assertEqual(ledger.sessions[0]['end'], 1300.0)
+        self.crash(ledger)
+
+        # 다시 읽어도 같은 결과 (INTERRUPTED 레코드로 기록되어 있음)
+        ledger = SessionLedger(self.log_path)
+        self.assertEqual((ledger.sessions[0]['end'], ledger.sessions[0]['interrupted']), (1300.0, True))
+        self.assertEqual((ledger.sessions[2]['run'], ledger.sessions[2]['end']), (2, 5000.0))
+        ledger.close()
+
+    def test_clean_close_marks_active_sessions_interrupted(self):
+        ledger = SessionLedger(self.log_path)
+        ledger.open_session(3, 4, 'blue', timestamp=100.0)
+        ledger.close()
+
+        ledger = SessionLedger(self.log_path)
+        session = ledger.sessions[0]
+        self.assertTrue(session['interrupted'])
+        self.assertGreater(session['end'], 100.0)
+        self.assertEqual(ledger.active, {})
+        ledger.close()
+
+    def test_vehicle_ids_are_scoped_to_run(self):
+        ledger = SessionLedger(self.log_path)
+        ledger.open_session(1, 1, 'blue', timestamp=100.0)
+        ledger.close_session(1, timestamp=200.0)
+        ledger.close()
+
+        # 재시작 후 추적기 ID가 다시 1부터 - 다른 차량
+        ledger = SessionLedger(self.log_path)
+        ledger.open_session(2, 1, 'yellow', timestamp=300.0)
+        current = ledger.query(vehicle_id=1)
+        self.assertEqual([(s['run'], s['spot_id']) for s in current], [(2, 2)])
+        previous = ledger.query(vehicle_id=1, run=1)
+        self.assertEqual([(s['run'], s['spot_id']) for s in previous], [(1, 1)])
+        ledger.close()
+
+    def test_legacy_log_without_run_records(self):
+        # RUN 레코드가 없는 이전 형식 로그 - 실행 0으로 읽고 열린 세션은 마지막 기록 시각으로 닫음
+        with open(self.log_path, 'wb') as f:
+            f.write(RECORD.pack(1, 1, 5, 3, 50.0, b'blue'))
+            f.write(RECORD.pack(1, 2, 6, 4, 80.0, b'white'))
+            f.write(RECORD.pack(2, 1, 5, 3, 90.0, b'blue'))
+
+        ledger = SessionLedger(self.log_path)
+        self.assertEqual([s['run'] for s in ledger.sessions], [0, 0])
+        self.assertEqual(ledger.run, 1)
+        self.assertEqual((ledger.sessions[1]['end'], ledger.sessions[1]['interrupted']), (90.0, True))
+        ledger.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+다중 초음파 센서 측정 스케줄
+여러 Trig/Echo 쌍을 한 번에 하나씩 돌아가며 측정하고(서로의 반사파를 받지 않도록 시차를 둠),
+센서별 최근 측정값 링 버퍼의 중앙값으로 튀는 값을 걸러 낸다
+"""
+
+import time
+import statistics
+from collections import deque
+
+
+class RangingScheduler:
+    """라운드 로빈 측정 순서/시각
+
+    센서마다 poll_interval초에 한 번 측정되도록 측정 시각을 sensor_count개 구간으로 나누고,
+    연속한 두 측정 사이는 최소 min_gap초를 둔다 (센서가 많으면 poll_interval이 그만큼 늘어남).
+    """
+
+    def __init__(self, sensor_count, poll_interval=0.5, min_gap=0.06):
+        self.sensor_count = sensor_count
+        self.slot = max(poll_interval / sensor_count, min_gap) if sensor_count else None
+        self.next_index = 0
+        self.next_time = time.monotonic()
+
+    def due_in(self, now):
+        """다음 측정까지 남은 초 (센서가 없으면 None)"""
+        if not self.sensor_count:
+            return None
+        return self.next_time - now
+
+    def take(self, now):
+        """이번에 측정할 센서 번호를 돌려주고 다음 측정 시각으로 넘어감"""
+        index = self.next_index
+        self.next_index = (index + 1) % self.sensor_count
+        # 밀렸으면 몰아서 측정하지 않고 지금부터 다시 간격을 잰다
+        self.next_time = max(self.next_time + self.slot, now)
+        return index
+
+
+class DistanceFilter:
+    """센서 하나의 측정값 링 버퍼 + 중앙값 필터
+
+    측정 범위(min_cm~max_cm)를 벗어나거나 Echo가 없던 측정은 버퍼에 넣지 않는다.
+    중앙값을 쓰므로 window개 중 절반 미만으로 튄 값은 결과에 영향을 주지 않으며,
+    중앙값에서 outlier_cm 이상 벗어난 측정은 outliers로 센다.
+    실패가 window번 연속되면 버퍼를 비우고 거리를 None으로 공개한다 (물체가 범위를 벗어났거나 센서 이상).
+    """
+
+    def __init__(self, sensor_id, window=5, min_cm=2.0, max_cm=400.0, outlier_cm=30.0):
+        self.sensor_id = sensor_id
+        self.window = window
+        self.min_cm = min_cm
+        self.max_cm = max_cm
+        self.outlier_cm = outlier_cm
+        self.values = deque(maxlen=window)
+        self.median = None
+        self.consecutive_failures = 0
+        self.failures = 0
+        self.outliers = 0
+        self.last_valid = None
+
+    def add(self, distance, timestamp):
+        """측정값 추가 후 공개용 스냅샷 dict 반환"""
+        if distance is None or not self.min_cm <= distance <= self.max_cm:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= self.window:
+                self.values.clear()
+                self.median = None
+        else:
+            if self.median is not None and abs(distance - self.median) > self.outlier_cm:
+                self.outliers += 1
+            self.consecutive_failures = 0
+            self.values.append(distance)
+            self.median = round(statistics.median(self.values), 2)
+            self.last_valid = timestamp
+
+        if self.median is not None:
+            status = 'ok'
+        elif self.consecutive_failures:
+            status = 'no_echo'
+        else:
+            status = 'pending'
+
+        return {
+            'sensor': self.sensor_id,
+            'distance': self.median,
+            'raw': distance,
+            'samples': len(self.values),
+            'status': status,
+            'timestamp': self.last_valid,
+            'updated': timestamp,
+            'failures': self.failures,
+            'outliers': self.outliers
+        }
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+차량 추적기
+트랙마다 등속도 칼만 필터로 다음 위치를 예측하고, 색상별 NumPy 거리 행렬에 대해
+전역 최적 할당(헝가리안 알고리즘)으로 ID를 이어 붙이며, 몇 프레임 동안 탐지되지 않아도 트랙을 유지한다
+"""
+
+import time
+
+import numpy as np
+
+# scipy가 있으면 C 구현을 사용하고, 없으면 NumPy 구현으로 대체
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_linear_sum_assignment
+except ImportError:
+    _scipy_linear_sum_assignment = None
+
+# 게이팅 밖의 쌍에 부여하는 비용 (inf 대신 유한값을 써서 포텐셜 계산이 깨지지 않게 함)
+GATED_COST = 1e9
+
+
+def _hungarian(cost):
+    """행 수 <= 열 수인 비용 행렬의 최소 비용 할당 (포텐셜 기반 O(n²m))"""
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=np.int64)    # p[j] = 열 j에 할당된 행 (1부터, 0은 미할당)
+    way = np.zeros(m + 1, dtype=np.int64)
+
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+
+            # 아직 방문하지 않은 열들의 축소 비용을 한 번에 갱신
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            better = free & (reduced < minv[1:])
+            minv[1:][better] = reduced[better]
+            way[1:][better] = j0
+
+            candidates = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+
+            used_cols = np.nonzero(used)[0]
+            u[p[used_cols]] += delta
+            v[used_cols] -= delta
+            minv[1:][free] -= delta
+
+            j0 = j1
+            if p[j0] == 0:
+                break
+
+        # 증가 경로를 따라 할당 갱신
+        while j0 != 0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+
+    cols = np.nonzero(p[1:])[0]
+    rows = p[1:][cols] - 1
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+def linear_sum_assignment(cost):
+    """비용 행렬의 최소 비용 할당 (행 인덱스 배열, 열 인덱스 배열) 반환"""
+    cost = np.asarray(cost, dtype=np.float64)
+    if cost.size == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    if _scipy_linear_sum_assignment is not None:
+        return _scipy_linear_sum_assignment(cost)
+
+    if cost.shape[0] <= cost.shape[1]:
+        return _hungarian(cost)
+
+    cols, rows = _hungarian(cost.T)
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+
+class VehicleTracker:
+    """등속도 칼만 필터 + 색상별 전역 최적 할당 기반 다중 차량 추적기
+
+    트랙 상태는 배열로 보관한다 (상태 [x, y, vx, vy] (N, 4), 공분산 (N, 4, 4),
+    미탐지 프레임 수 (N,), 탐지된 프레임 수 (N,), ID (N,)). 속도 단위는 px/s.
+    매칭은 직전 위치가 아니라 현재 시각으로 예측한 위치를 기준으로 하므로,
+    프레임이 밀려 차량이 tracking_distance 이상 움직여도 예측 경로 위에 있으면 ID가 유지된다.
+    탐지되지 않은 트랙은 예측만 진행하며 max_missed 프레임까지 유지된다.
+    """
+
+    def __init__(self, tracking_distance=100, max_missed=5, history_length=10,
+                 measurement_noise=5.0, acceleration_noise=300.0, initial_velocity_std=200.0):
+        self.tracking_distance = tracking_distance
+        self.max_missed = max_missed
+        self.history_length = history_length
+        self.next_id = 1
+
+        self.measurement_cov = np.eye(2) * measurement_noise ** 2
+        self.acceleration_var = acceleration_noise ** 2
+        self.initial_velocity_var = initial_velocity_std ** 2
+        self.last_update_time = None
+
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.colors = np.zeros(0, dtype=object)
+        self.state = np.zeros((0, 4), dtype=np.float64)
+        self.covariance = np.zeros((0, 4, 4), dtype=np.float64)
+        self.missed = np.zeros(0, dtype=np.int64)
+        self.hits = np.zeros(0, dtype=np.int64)
+        self.histories = []
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def positions(self):
+        """현재 (예측 또는 보정된) 위치 (N, 2)"""
+        return self.state[:, :2]
+
+    @property
+    def velocities(self):
+        """현재 추정 속도 (N, 2), px/s"""
+        return self.state[:, 2:]
+
+    def predict(self, dt):
+        """모든 트랙 상태를 dt초 뒤로 한 번에 예측"""
+        if dt <= 0 or len(self.ids) == 0:
+            return
+
+        F = np.eye(4)
+        F[0, 2] = F[1, 3] = dt
+
+        # 등가속도 잡음 모델의 프로세스 잡음
+        q = self.acceleration_var
+        dt2, dt3, dt4 = dt * dt, dt ** 3, dt ** 4
+        Q = np.array([[dt4 / 4, 0, dt3 / 2, 0],
+                      [0, dt4 / 4, 0, dt3 / 2],
+                      [dt3 / 2, 0, dt2, 0],
+                      [0, dt3 / 2, 0, dt2]]) * q
+
+        self.state = self.state @ F.T
+        self.covariance = F @ self.covariance @ F.T + Q
+
+    def _correct(self, track_idx, measurements):
+        """매칭된 트랙들의 상태를 관측 위치로 한 번에 보정 (위치만 관측하므로 H = [I 0])"""
+        P = self.covariance[track_idx]
+        innovation = measurements - self.state[track_idx, :2]
+        S = P[:, :2, :2] + self.measurement_cov
+        K = P[:, :, :2] @ np.linalg.inv(S)
+
+        self.state[track_idx] += np.einsum('nij,nj->ni', K, innovation)
+        self.covariance[track_idx] = P - K @ P[:, :2, :]
+
+    def update(self, detections, timestamp=None):
+        """현재 프레임 탐지 결과에 'id', 'track_history', 'hits', 'velocity'를 채워서 반환"""
+        if timestamp is None:
+            timestamp = time.monotonic()
+        if self.last_update_time is not None:
+            self.predict(timestamp - self.last_update_time)
+        self.last_update_time = timestamp
+
+        det_positions = np.array([d['center'] for d in detections], dtype=np.float64).reshape(-1, 2)
+        det_colors = np.array([d['color'] for d in detections], dtype=object)
+
+        det_to_track = np.full(len(detections), -1, dtype=np.int64)
+        track_matched = np.zeros(len(self.ids), dtype=bool)
+
+        for color in set(det_colors.tolist()):
+            det_idx = np.nonzero(det_colors == color)[0]
+            track_idx = np.nonzero(self.colors == color)[0]
+            if len(track_idx) == 0:
+                continue
+
+            # 색상별 탐지 × 예측 위치 거리 행렬 (벡터화)
+            diff = det_positions[det_idx, None, :] - self.positions[None, track_idx, :]
+            distances = np.sqrt((diff ** 2).sum(axis=2))
+
+            # 추적 거리 밖의 쌍은 할당되지 않도록 게이팅
+            gated = distances > self.tracking_distance
+            cost = np.where(gated, GATED_COST, distances)
+
+            rows, cols = linear_sum_assignment(cost)
+            valid = ~gated[rows, cols]
+            det_to_track[det_idx[rows[valid]]] = track_idx[cols[valid]]
+            track_matched[track_idx[cols[valid]]] = True
+
+        # 매칭된 트랙 보정
+        matched_dets = np.nonzero(det_to_track >= 0)[0]
+        matched_tracks = det_to_track[matched_dets]
+        if len(matched_tracks):
+            self._correct(matched_tracks, det_positions[matched_dets])
+        self.missed[matched_tracks] = 0
+        self.missed[~track_matched] += 1
+        self.hits[matched_tracks] += 1
+
+        for det_i, track_i in zip(matched_dets, matched_tracks):
+            history = self.histories[track_i] + [detections[det_i]['center']]
+            self.histories[track_i] = history[-self.history_length:]
+
+        # 오래 탐지되지 않은 트랙 제거
+        keep = self.missed <= self.max_missed
+        if not keep.all():
+            remap = np.full(len(keep), -1, dtype=np.int64)
+            remap[keep] = np.arange(int(keep.sum()))
+            det_to_track = np.where(det_to_track >= 0, remap[np.maximum(det_to_track, 0)], -1)
+            self._select_tracks(keep)
+
+        # 매칭되지 않은 탐지는 새 트랙으로 (속도 0, 속도 분산은 크게)
+        new_dets = np.nonzero(det_to_track < 0)[0]
+        if len(new_dets):
+            count = len(new_dets)
+            new_ids = np.arange(self.next_id, self.next_id + count, dtype=np.int64)
+            self.next_id += count
+            det_to_track[new_dets] = np.arange(len(self.ids), len(self.ids) + count)
+
+            new_state = np.zeros((count, 4))
+            new_state[:, :2] = det_positions[new_dets]
+            new_cov = np.zeros((count, 4, 4))
+            new_cov[:, :2, :2] = self.measurement_cov
+            new_cov[:, 2, 2] = new_cov[:, 3, 3] = self.initial_velocity_var
+
+            self.ids = np.concatenate([self.ids, new_ids])
+            self.colors = np.concatenate([self.colors, det_colors[new_dets]])
+            self.state = np.concatenate([self.state, new_state])
+            self.covariance = np.concatenate([self.covariance, new_cov])
+            self.missed = np.concatenate([self.missed, np.zeros(count, dtype=np.int64)])
+            self.hits = np.concatenate([self.hits, np.ones(count, dtype=np.int64)])
+            self.histories.extend([detections[i]['center']] for i in new_dets)
+
+        for det_i, vehicle in enumerate(detections):
+            track_i = det_to_track[det_i]
+            vehicle['id'] = int(self.ids[track_i])
+            vehicle['track_history'] = list(self.histories[track_i])
+            vehicle['hits'] = int(self.hits[track_i])  # 이 트랙이 탐지된 프레임 수 (속도 추정 신뢰도)
+            vehicle['velocity'] = (round(float(self.state[track_i, 2]), 1),
+                                   round(float(self.state[track_i, 3]), 1))
+
+        return detections
+
+    def get_tracks(self):
+        """모든 활성 트랙 정보 (미탐지 중인 트랙 포함)"""
+        return [{
+            'id': int(self.ids[i]),
+            'color': self.colors[i],
+            'predicted_center': (round(float(self.state[i, 0]), 1), round(float(self.state[i, 1]), 1)),
+            'velocity': (round(float(self.state[i, 2]), 1), round(float(self.state[i, 3]), 1)),
+            'missed_frames': int(self.missed[i]),
+            'hits': int(self.hits[i])
+        } for i in range(len(self.ids))]
+
+    def _select_tracks(self, keep):
+        """keep 마스크에 해당하는 트랙만 남김"""
+        self.ids = self.ids[keep]
+        self.colors = self.colors[keep]
+        self.state = self.state[keep]
+        self.covariance = self.covariance[keep]
+        self.missed = self.missed[keep]
+        self.hits = self.hits[keep]
+        self.histories = [h for h, k in zip(self.histories, keep) if k]
+
+    def reset(self):
+        """모든 트랙 제거 (ID는 계속 증가)"""
+        self._select_tracks(np.zeros(len(self.ids), dtype=bool))